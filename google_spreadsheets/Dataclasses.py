@@ -1,57 +1,136 @@
-from .other_utils import to_rgb
-from typing import Optional, Union, NamedTuple
+from . import a1
+from .other_utils import to_rgb, intern_color, Color, MAX_INTERNED_COLORS
+from array import array
+from typing import Optional, Union, NamedTuple, Any
 
 C = dict[str, float] | list[int, int, int] | tuple[int, int, int]
 
+EMPTY_COLOR = Color()
+DEFAULT_BG_COLOR = Color(red=1.0, green=1.0, blue=1.0)
+DEFAULT_FR_COLOR = Color(red=0, green=0, blue=0)
+DEFAULT_FONT_FAMILY = 'Arial'
+DEFAULT_FONT_SIZE = 10
+
 
 class BorderMixin:
     """
     style: can be SOLID, DASHED, DOTTED, DOUBLE
     width: can be 1, 2, 3
     color: background color can be hex color '#ffffff' or [255, 255, 255] or {red: 1, green: 1, blue: 1}
+
+    Borders are immutable and equal borders can be shared between cells
     """
+    __slots__ = ('style', 'width', 'color', '_hash')
 
     def __init__(self, style: str = str(), width: int = int(), color: C = None):
-        self.style = style
-        self.width = width
-        self.color = to_rgb(color) if color else {}
+        object.__setattr__(self, 'style', style)
+        object.__setattr__(self, 'width', width)
+        object.__setattr__(self, 'color', intern_color(to_rgb(color)) if color else EMPTY_COLOR)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{type(self).__name__} is immutable, create a new one instead')
+
+    def _key(self) -> tuple:
+        return self.style, self.width, self.color
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._key() == other._key()
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            object.__setattr__(self, '_hash', hash((type(self), self._key())))
+            return self._hash
+
+    def __reduce__(self):
+        return type(self), (self.style, self.width, self.color)
 
 
 class LeftBorder(BorderMixin):
+    __slots__ = ()
+
     def __init__(self, style: str = str(), width: int = int(), color=None):
         super().__init__(style=style, width=width, color=color)
 
 
 class RightBorder(BorderMixin):
+    __slots__ = ()
+
     def __init__(self, style: str = str(), width: int = int(), color=None):
         super().__init__(style=style, width=width, color=color)
 
 
 class TopBorder(BorderMixin):
+    __slots__ = ()
+
     def __init__(self, style: str = str(), width: int = int(), color=None):
         super().__init__(style=style, width=width, color=color)
 
 
 class BottomBorder(BorderMixin):
+    __slots__ = ()
+
     def __init__(self, style: str = str(), width: int = int(), color=None):
         super().__init__(style=style, width=width, color=color)
 
 
+_sides: dict[tuple, BorderMixin] = {}
+
+
+def _side(cls: type, side: Optional[BorderMixin], style: str, width: int, color) -> BorderMixin:
+    if side is not None:
+        return side
+    if not style and not width and not color:
+        key = (cls,)
+    else:
+        try:
+            key = (cls, style, width, tuple(sorted(to_rgb(color).items())) if color else ())
+            hash(key)
+        except TypeError:
+            return cls(style, width, color)
+    if (shared := _sides.get(key)) is None:
+        shared = cls(style, width, color)
+        if len(_sides) < MAX_INTERNED_COLORS:
+            _sides[key] = shared
+    return shared
+
+
 class Borders(BorderMixin):
     """
     If you want to set one or more specific borders
     you should create instance like Borders(params, left=LeftBorder(params)]
     """
+    __slots__ = ('top', 'bottom', 'left', 'right')
 
     def __init__(self, style: str = str(), width: int = int(), color=None, *,
                  left: Optional[LeftBorder] = None, right: Optional[RightBorder] = None,
                  top: Optional[TopBorder] = None, bottom: Optional[BottomBorder] = None):
         super().__init__(style=style, width=width, color=color)
 
-        self.top = TopBorder(style, width, color) if not top else top
-        self.bottom = BottomBorder(style, width, color) if not bottom else bottom
-        self.left = LeftBorder(style, width, color) if not left else left
-        self.right = RightBorder(style, width, color) if not right else right
+        object.__setattr__(self, 'top', _side(TopBorder, top, style, width, color))
+        object.__setattr__(self, 'bottom', _side(BottomBorder, bottom, style, width, color))
+        object.__setattr__(self, 'left', _side(LeftBorder, left, style, width, color))
+        object.__setattr__(self, 'right', _side(RightBorder, right, style, width, color))
+
+    def _key(self) -> tuple:
+        return self.style, self.width, self.color, self.top, self.bottom, self.left, self.right
+
+    def __reduce__(self):
+        return _borders_from_key, (self._key(),)
+
+
+def _borders_from_key(key: tuple) -> 'Borders':
+    style, width, color, top, bottom, left, right = key
+    return Borders(style, width, color, top=top, bottom=bottom, left=left, right=right)
+
+
+_borders: dict['Borders', 'Borders'] = {}
+
+
+def intern_borders(borders: Borders) -> Borders:
+    """Return shared Borders equal to the given one"""
+    return _borders.setdefault(borders, borders) if len(_borders) < MAX_INTERNED_COLORS else borders
 
 
 class Cell:
@@ -63,8 +142,14 @@ class Cell:
     fr_color: foreground color can be hex color '#ffffff' or [255, 255, 255] or {red: 1, green: 1, blue: 1}
     font_family: make a font
     font_size: make a size
+
+    Colors and borders of cells are shared immutable objects, assign new ones to change them
     """
     SUB = 65
+    __slots__ = (
+        'name', 'value', 'note', 'bg_color', 'fr_color', 'font_family', 'font_size', 'bold', 'italic',
+        'strikethrough', 'underline', 'borders', 'col_idx', 'row_idx', 'formatted_value',
+    )
 
     def __init__(
             self,
@@ -74,8 +159,8 @@ class Cell:
             *,
             bg_color: C = None,
             fr_color: C = None,
-            font_family: str = 'Arial',
-            font_size: int = 10,
+            font_family: str = DEFAULT_FONT_FAMILY,
+            font_size: int = DEFAULT_FONT_SIZE,
             bold: bool = False,
             italic: bool = False,
             strikethrough: bool = False,
@@ -89,15 +174,15 @@ class Cell:
                                                                         row_idx) if col_idx is not None and row_idx is not None else ''
         self.value = value
         self.note = note
-        self.bg_color = to_rgb(bg_color) if bg_color else {'red': 1.0, 'green': 1.0, 'blue': 1.0}
-        self.fr_color = to_rgb(fr_color) if fr_color else {'red': 0, 'green': 0, 'blue': 0}
+        self.bg_color = intern_color(to_rgb(bg_color)) if bg_color else DEFAULT_BG_COLOR
+        self.fr_color = intern_color(to_rgb(fr_color)) if fr_color else DEFAULT_FR_COLOR
         self.font_family = font_family
         self.font_size = font_size
         self.bold = bold
         self.italic = italic
         self.strikethrough = strikethrough
         self.underline = underline
-        self.borders = borders if borders is not None else Borders()
+        self.borders = borders if borders is not None else DEFAULT_BORDERS
         self.col_idx, self.row_idx = self.find_indexes(self.name) if (
                 col_idx is None or row_idx is None) else (col_idx, row_idx)
         self.formatted_value = formatted_value
@@ -108,58 +193,98 @@ class Cell:
 
     def to_json(self):
         new = {}
-        for k, v in self.__dict__.items():
-            print(k, v)
+        for k in self.__slots__:
+            v = getattr(self, k)
             if not (k.endswith('__') and k.startswith('__')) and not callable(v) and k != 'borders':
                 new[k] = v
         return new
 
     @staticmethod
     def sep_name(name: str):
-        col = ''
-        while not name.isdigit() and name:
-            col += name[0]
-            name = name[1:]
-        col = col if col else None
-        row = int(name) if name.isdigit() else None
-        return col, row
+        return a1.split_name(name)
 
     @staticmethod
     def find_indexes(name: str) -> tuple[int, int]:
-        col, row = Cell.sep_name(name)
-        if col:
-            if len(col) == 1:
-                col = ord(col) - 65
-            elif len(col) == 2:
-                temp = ord(col[0]) - 65 + 1
-                col = 26 * temp + ord(col[1]) - 65
-            else:
-                temp1 = ord(col[0]) - 65 + 1
-                temp2 = ord(col[1]) - 65 + 1
-                col = 26 ** 2 * temp1 + 26 * temp2 + ord(col[2]) - 65
-        return col, (row - 1 if row else row)
+        return a1.to_indexes(name)
 
     @staticmethod
     def from_indexes_to_name(col: int, row: int) -> str:
-        name = ''
+        return a1.to_name(col, row)
 
-        if col / 26 >= 53:
-            temp = int((col ** 1 / 26) // 27)
-            name += chr(64 + temp) if temp <= 25 else chr(65 + 25)
-            col -= (temp) * 26 ** 2 if temp <= 25 else temp * 26 ** 2
 
-        if col / 26 >= 27:
-            name += 'A'
-            col -= 26 ** 2
-
-        if col // 26 > 0:
-            temp = col // 26
-            name += chr(64 + temp)
-            col -= temp * 26
-        name += chr(64 + col + 1) + str(row + 1)
-        return name
+DEFAULT_BORDERS = Borders()
 
 
 class Sheet(NamedTuple):
     id: int
     title: str
+    row_count: Optional[int] = None
+    column_count: Optional[int] = None
+
+
+class Grid:
+    """
+    Compact column-oriented block of values
+    columns: one sequence per column with values from top to bottom, missing values are None.
+    Columns which hold only numbers are stored as array('d')
+    col_idx, row_idx: indexes of the top left value, so grid.name(0, 0) is the A1 name of the origin
+    """
+
+    def __init__(self, columns: list[list | array], col_idx: int = 0, row_idx: int = 0):
+        self.columns = columns
+        self.col_idx = col_idx
+        self.row_idx = row_idx
+
+    def __repr__(self):
+        rows, cols = self.shape
+        return f'Grid(origin={self.name(0, 0)!r}, rows={rows}, cols={cols})'
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, item: tuple[int, int]) -> Any:
+        row, col = item
+        return self.columns[col][row]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (len(self.columns[0]) if self.columns else 0), len(self.columns)
+
+    def name(self, row: int, col: int) -> str:
+        """A1 name of the value at the given position inside the grid"""
+        return Cell.from_indexes_to_name(self.col_idx + col, self.row_idx + row)
+
+    def column(self, key: int | str) -> list | array:
+        """Column by position inside the grid or by letter of the sheet column"""
+        if isinstance(key, str):
+            key = a1.letters_to_column(key) - self.col_idx
+        return self.columns[key]
+
+    def row(self, idx: int) -> list:
+        return [column[idx] for column in self.columns]
+
+    def rows(self):
+        return zip(*self.columns)
+
+    def to_numpy(self):
+        """2D numpy array, float when every column is numeric and object otherwise"""
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError('Grid.to_numpy requires numpy, install google_spreadsheets[numpy]') from None
+        if self.columns and all(isinstance(column, array) for column in self.columns):
+            return np.column_stack([np.frombuffer(column, dtype=np.float64) for column in self.columns])
+        result = np.empty(self.shape, dtype=object)
+        for idx, column in enumerate(self.columns):
+            result[:, idx] = list(column)
+        return result
+
+    def to_pandas(self):
+        """DataFrame indexed by sheet row numbers with sheet column letters as columns"""
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError('Grid.to_pandas requires pandas, install google_spreadsheets[pandas]') from None
+        rows = self.shape[0]
+        data = {a1.column_to_letters(self.col_idx + idx): column for idx, column in enumerate(self.columns)}
+        return pd.DataFrame(data, index=range(self.row_idx + 1, self.row_idx + rows + 1))
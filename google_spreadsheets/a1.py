@@ -0,0 +1,103 @@
+from typing import Iterable, Optional
+
+# the last column of a sheet is ZZZ
+MAX_COLUMNS = 18278
+_DIGITS = '0123456789'
+
+
+def _letters(col: int) -> str:
+    letters = ''
+    col += 1
+    while col:
+        col, rest = divmod(col - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def _table() -> tuple[str, ...]:
+    one = [chr(65 + idx) for idx in range(26)]
+    two = [first + second for first in one for second in one]
+    return tuple(one + two + [first + rest for first in one for rest in two])
+
+
+_LETTERS = _table()
+_COLUMNS = dict(zip(_LETTERS, range(MAX_COLUMNS)))
+
+
+def column_to_letters(col: int) -> str:
+    """0 -> 'A', 25 -> 'Z', 26 -> 'AA'"""
+    if 0 <= col < MAX_COLUMNS:
+        return _LETTERS[col]
+    if col < 0:
+        raise ValueError(f'Column index must not be negative, got {col}')
+    return _letters(col)
+
+
+def letters_to_column(letters: str) -> int:
+    """'A' -> 0, 'Z' -> 25, 'AA' -> 26"""
+    try:
+        return _COLUMNS[letters]
+    except KeyError:
+        pass
+    letters = letters.upper()
+    if not letters or not letters.isascii() or not letters.isalpha():
+        raise ValueError(f'Column must consist of latin letters, got {letters!r}')
+    col = 0
+    for char in letters:
+        col = col * 26 + ord(char) - 64
+    return col - 1
+
+
+def split_name(name: str) -> tuple[Optional[str], Optional[int]]:
+    """'AB12' -> ('AB', 12), missing parts are None"""
+    col = name.rstrip(_DIGITS)
+    row = name[len(col):]
+    return col or None, int(row) if row else None
+
+
+def to_indexes(name: str) -> tuple[Optional[int], Optional[int]]:
+    """'B3' -> (1, 2), missing parts are None"""
+    letters = name.rstrip(_DIGITS)
+    digits = name[len(letters):]
+    col = _COLUMNS.get(letters)
+    if col is None and letters:
+        col = letters_to_column(letters)
+    row = int(digits) if digits else None
+    return col, (row - 1 if row else row)
+
+
+def to_name(col: int, row: int) -> str:
+    """(1, 2) -> 'B3'"""
+    return column_to_letters(col) + str(row + 1)
+
+
+def names_to_indexes(names: Iterable[str]) -> tuple[list[int], list[int]]:
+    """Convert names to two parallel lists of column and row indexes"""
+    cols = []
+    rows = []
+    for name in names:
+        col, row = to_indexes(name)
+        cols.append(col)
+        rows.append(row)
+    return cols, rows
+
+
+def indexes_to_names(cols: Iterable[int], rows: Iterable[int]) -> list[str]:
+    """Convert parallel column and row indexes to names"""
+    return [to_name(col, row) for col, row in zip(cols, rows)]
+
+
+def range_to_indexes(range_: str) -> tuple[int, int, int, int]:
+    """'B2:D5' or 'Sheet1!B2:D5' -> (1, 1, 3, 4), both corners inclusive"""
+    range_ = range_.rpartition('!')[2]
+    from_, _, to = range_.partition(':')
+    col, row = to_indexes(from_.upper())
+    end_col, end_row = to_indexes((to or from_).upper())
+    return col, row, end_col, end_row
+
+
+def range_to_names(from_: str, to: Optional[str] = None) -> list[list[str]]:
+    """Names of all cells of the range row by row, range_to_names('A1', 'B2') -> [['A1', 'B1'], ['A2', 'B2']]"""
+    col, row, end_col, end_row = range_to_indexes(f'{from_}:{to}' if to else from_)
+    letters = [column_to_letters(idx) for idx in range(col, end_col + 1)]
+    return [[letter + str(idx + 1) for letter in letters] for idx in range(row, end_row + 1)]
@@ -1,176 +1,398 @@
-from typing import Iterator, Literal
+import threading
+import time
+from typing import TYPE_CHECKING, Iterator, Literal, Callable
 
-import httplib2
-import apiclient.discovery
-from oauth2client.service_account import ServiceAccountCredentials
 from .interface import *
-from .Dataclasses import Cell
-from .utils import from_cells_to_google_format, from_google_format_to_cell, sort_cells, \
-    to_rows_format, parse_sheets, find_sheet
+from .Dataclasses import Cell, Grid, Sheet
+from .transport import HttpPool, build_service, get_resource, service_account_credentials
+from .codec import Body, EncodedBody, JsonCodec, get_codec
+from .scheduler import RequestScheduler, Kind, get_scheduler
+from .mirror import SheetMirror
+from .frames import FRAME_CHUNK_CELLS, frame_columns, frame_ranges, columns_to_frame
+from .metadata import SheetMetadata, SHEETS_FIELDS
+from .view import CellView
+from .instrumentation import Instrumentation, NOOP, execute as execute_instrumented, measure, measure_iter, \
+    request_types
+from .batch import Batch, PendingResponse, PartialWriteError, MAX_BATCH_BYTES
+from .encoder import ParallelEncoder
+from . import a1
+from .utils import from_google_format_to_cell, from_google_format_to_grid, \
+    has_row_data, rows_of, add_sheet_request, unmerge_cells_request, append_dimension_request, insert_range_request, merge_cells_request, \
+    append_chunks, update_cells_chunks, values_range, grid_fields, find_range
+
+if TYPE_CHECKING:
+    from .buffer import AppendBuffer
+    from .cache import ReadCache
+
+# progress(sent, total, elapsed_seconds) is called after every chunk of update_cells and append
+Progress = Callable[[int, int, float], None]
+# default number of threads of copy_all_to_spreadsheet
+COPY_WORKERS = 4
+# default number of rows fetched by one request of iter_rows
+ROWS_WINDOW = 5000
 
 
 class GoogleSheets(GoogleSheetsInterface):
-    def __init__(self, creds: dict, spreadsheetId: str):
-        credentials = ServiceAccountCredentials._from_parsed_json_keyfile(
-            creds,
-            [
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive',
-                'https://www.googleapis.com/auth/drive.file',
-            ]
-        )
-        self.httpAuth = credentials.authorize(httplib2.Http())
-        self.sheets_v4 = apiclient.discovery.build('sheets', 'v4', http=self.httpAuth)
+    """Instances can be shared between threads, every thread sends requests over its own connection.
+    batch() is also per thread: calls made by other threads are not queued into it"""
+
+    def __init__(self, creds: dict, spreadsheetId: str, scheduler: Optional[RequestScheduler] = None,
+                 transport: Optional[HttpPool] = None, metadata_ttl: Optional[float] = None,
+                 instrumentation: Optional[Instrumentation] = None, codec: str | JsonCodec = 'auto',
+                 gzip_threshold: Optional[int] = None, cache: Optional['ReadCache'] = None):
+        """scheduler: rate limiter and retry policy of requests,
+        by default clients of the same service account share one
+        transport: pool of connections, by default the client creates its own
+        metadata_ttl: seconds the list of sheets is trusted for, by default until metadata.invalidate()
+        instrumentation: receiver of per call measurements, e.g. MetricsCollector, by default nothing is measured
+        codec: JSON codec of bodies, 'json', 'orjson' or 'auto' for orjson when it is installed
+        gzip_threshold: request bodies of at least so many bytes are sent gzip encoded, by default none are.
+        Responses are always asked gzip encoded
+        cache: ReadCache serving get_values and get_all_sheets of an unchanged spreadsheet without downloading them"""
+        self._creds = creds
+        self._transport = transport
+        self._transport_lock = threading.Lock()
         self.spreadsheetId = spreadsheetId
-        self._sheets = None
+        self.scheduler = scheduler if scheduler is not None else get_scheduler(creds.get('client_email', ''))
+        self.metadata = SheetMetadata(self._fetch_sheets, ttl=metadata_ttl)
+        self.instrumentation = instrumentation if instrumentation is not None else NOOP
+        self.codec = get_codec(codec)
+        self.gzip_threshold = gzip_threshold
+        self.cache = cache
+        self._local = threading.local()
 
     @property
-    def sheets(self):
-        if self._sheets is None:
-            self._sheets = self.get_all_sheets()
-        return self._sheets
+    def transport(self) -> HttpPool:
+        """Credentials and connections are created on the first request"""
+        if self._transport is None:
+            with self._transport_lock:
+                if self._transport is None:
+                    self._transport = HttpPool(service_account_credentials(self._creds))
+        return self._transport
 
-    def add_sheet(self, title: str) -> dict:
-        sheet_body = {
-            'addSheet': {
-                'properties': {
-                    'title': title
-                }
-            }
-        }
-        response = self.sheets_v4.spreadsheets().batchUpdate(
+    @property
+    def sheets_v4(self):
+        """Sheets v4 service bound to the authorized Http of the current thread, so its requests are executed
+        with the credentials of the client without http=. Built on the first use in every thread,
+        methods of the client use shared resources instead"""
+        service = getattr(self._local, 'sheets_v4', None)
+        if service is None:
+            service = self._local.sheets_v4 = build_service('sheets', 'v4', self.httpAuth, self.codec,
+                                                            self.gzip_threshold)
+        return service
+
+    def _resource(self, *path: str):
+        """Shared resource of Sheets v4, e.g. _resource('spreadsheets', 'values')"""
+        return get_resource('sheets', 'v4', *path, codec=self.codec, gzip_threshold=self.gzip_threshold)
+
+    @property
+    def httpAuth(self):
+        """Authorized Http of the current thread"""
+        return self.transport.http()
+
+    @property
+    def _batch(self) -> Optional[Batch]:
+        return getattr(self._local, 'batch', None)
+
+    @_batch.setter
+    def _batch(self, batch: Optional[Batch]):
+        self._local.batch = batch
+
+    @property
+    def sheets(self) -> list[Sheet]:
+        return self.metadata.sheets
+
+    def batch(self, max_bytes: int = MAX_BATCH_BYTES, max_requests: Optional[int] = None) -> Batch:
+        """Queue mutating calls made inside the 'with' block and send them on exit or on flush()
+        While the batch is active mutating methods return PendingResponse instead of response"""
+        return Batch(self, max_bytes=max_bytes, max_requests=max_requests)
+
+    def _execute(self, request, kind: Kind = 'read', http=None, types: tuple[str, ...] = (), encode: float = 0.0):
+        """types: kinds of batchUpdate requests, encode: seconds spent building the request, both for instrumentation"""
+        http = http if http is not None else self.transport.http()
+        try:
+            if not self.instrumentation.enabled:
+                return self.scheduler.execute(request, kind, http=http)
+            return execute_instrumented(self.scheduler, self.instrumentation, request, kind, types, encode, http=http)
+        finally:
+            if kind == 'write' and self.cache is not None:
+                # the spreadsheet has a new version, even if the write failed after being applied
+                self.cache.forget_version(self.spreadsheetId)
+
+    def _cached(self, key: str, fetch: Callable[[], dict]) -> dict:
+        """fetch() or its response stored by the cache at the current version of the spreadsheet"""
+        if self.cache is None:
+            return fetch()
+        version = self.cache.version(self.spreadsheetId, self._fetch_version)
+        response = self.cache.get(self.spreadsheetId, key, version)
+        if response is None:
+            # stored at the version checked before the read: if the spreadsheet changed in between,
+            # the next check sees a newer version and reads it again
+            response = fetch()
+            self.cache.put(self.spreadsheetId, key, version, response)
+        return response
+
+    def _fetch_version(self) -> dict:
+        from .cache import VERSION_FIELDS
+        files = get_resource('drive', 'v3', 'files', codec=self.codec, gzip_threshold=self.gzip_threshold)
+        return self._execute(files.get(fileId=self.spreadsheetId, fields=VERSION_FIELDS, supportsAllDrives=True))
+
+    def _batch_update(self, requests: list[dict]) -> dict | PendingResponse:
+        if self._batch is not None:
+            return self._batch.add(requests)
+        return self._send_batch_update(requests)
+
+    def _send_batch_update(self, requests: list[dict] | bytes, http=None) -> dict:
+        """requests: list of requests, or a body of updateCells requests serialized by ParallelEncoder"""
+        started = time.perf_counter()
+        encoded = isinstance(requests, bytes)
+        request = self._resource('spreadsheets').batchUpdate(
             spreadsheetId=self.spreadsheetId,
-            body={'requests': [sheet_body]}
-        ).execute()
+            body=EncodedBody(requests) if encoded else Body(requests=requests),
+        )
+        if self.instrumentation.enabled:
+            response = self._execute(request, 'write', http=http,
+                                     types=('updateCells',) if encoded else request_types(requests),
+                                     encode=time.perf_counter() - started)
+        else:
+            response = self._execute(request, 'write', http=http)
+        if not encoded:
+            # updateCells does not change metadata
+            self.metadata.apply(requests, response)
         return response
 
-    def unmerge_cells(self, from_cell: Cell, to_cell: Cell, sheet_id: int):
-        sri = from_cell.row_idx
-        eri = to_cell.row_idx + 1
-        sci = from_cell.col_idx
-        eci = to_cell.col_idx + 1
-        body = {
-            'unmergeCells': {
-                'range': {
-                    'sheetId': sheet_id,
-                    'startRowIndex': sri,
-                    'endRowIndex': eri,
-                    'startColumnIndex': sci,
-                    'endColumnIndex': eci
-                }
-            }
+    def _send_chunks(self, chunks: Iterable[tuple[list[dict] | bytes, int]], max_workers: int = 1,
+                     progress: Optional[Progress] = None, total: Optional[int] = None) -> dict:
+        """Send every chunk as its own batchUpdate and join the replies in chunk order
+        Chunks are sent one by one unless max_workers > 1
+        chunks can be a stream, like the one of ParallelEncoder, then total is the number of its cells
+        and every chunk is sent as soon as it comes"""
+        if self._batch is not None:
+            return self._batch.add_chunks(requests for requests, _ in chunks)
+        if total is None:
+            chunks = list(chunks)
+            total = sum(cells for _, cells in chunks)
+        responses: list[Optional[dict]] = []
+        sent = 0
+        started = time.perf_counter()
+
+        def done(idx: int, cells: int, response: dict):
+            nonlocal sent
+            responses[idx] = response
+            sent += cells
+            if progress is not None:
+                progress(sent, total, time.perf_counter() - started)
+
+        try:
+            if max_workers <= 1 or isinstance(chunks, list) and len(chunks) == 1:
+                for idx, (requests, cells) in enumerate(chunks):
+                    responses.append(None)
+                    done(idx, cells, self._send_batch_update(requests))
+            else:
+                from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {}
+                    try:
+                        for idx, (requests, cells) in enumerate(chunks):
+                            responses.append(None)
+                            futures[executor.submit(self._send_batch_update, requests)] = idx, cells
+                            # a stream is taken no faster than the chunks are sent
+                            while len(futures) >= max_workers:
+                                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                                for future in finished:
+                                    done(*futures.pop(future), future.result())
+                        while futures:
+                            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                            for future in finished:
+                                done(*futures.pop(future), future.result())
+                    except BaseException:
+                        for future in futures:
+                            future.cancel()
+                        raise
+        except Exception as exc:
+            if not sent:
+                raise
+            if isinstance(chunks, list):
+                # chunks which were not reached
+                responses.extend([None] * (len(chunks) - len(responses)))
+            raise PartialWriteError(f'{sent} of {total} cells were written before the error: {exc!r}',
+                                    responses, sent) from exc
+
+        return {
+            'spreadsheetId': self.spreadsheetId,
+            'replies': [reply for response in responses for reply in response.get('replies', [])],
         }
-        response = self.sheets_v4.spreadsheets().batchUpdate(
-            spreadsheetId=self.spreadsheetId,
-            body={'requests': [body]}
-        ).execute()
+
+    def add_sheet(self, title: str) -> dict:
+        response = self._batch_update([add_sheet_request(title)])
+        return response
+
+    def unmerge_cells(self, from_cell: Cell, to_cell: Cell, sheet_id: int):
+        response = self._batch_update([unmerge_cells_request(from_cell, to_cell, sheet_id)])
         return response
 
     def append_dimension(self, dimension: Literal['ROWS', 'COLUMNS', 'DIMENSION_UNSPECIFIED'], sheet_id: int,
                          length: int):
-        body = {
-            'appendDimension': {
-                'sheetId': sheet_id,
-                'dimension': dimension,
-                'length': length,
-            }
-        }
-        response = self.sheets_v4.spreadsheets().batchUpdate(
-            spreadsheetId=self.spreadsheetId,
-            body={'requests': [body]}
-        ).execute()
+        response = self._batch_update([append_dimension_request(dimension, sheet_id, length)])
         return response
 
     def insert_range(self, from_cell: Cell, to_cell: Cell, shift_dimension: Literal['ROWS', 'COLUMNS'], sheet_id: int):
-        sri = from_cell.row_idx
-        eri = to_cell.row_idx + 1
-        sci = from_cell.col_idx
-        eci = to_cell.col_idx + 1
-        body = {
-            'insertRange': {
-                'range': {
-                    'sheetId': sheet_id,
-                    'startRowIndex': sri,
-                    'endRowIndex': eri,
-                    'startColumnIndex': sci,
-                    'endColumnIndex': eci
-                },
-                'shiftDimension': shift_dimension
-            }
-        }
-        response = self.sheets_v4.spreadsheets().batchUpdate(
-            spreadsheetId=self.spreadsheetId,
-            body={'requests': [body]}
-        ).execute()
+        response = self._batch_update([insert_range_request(from_cell, to_cell, shift_dimension, sheet_id)])
         return response
 
     def merge_cells(self, from_cell: Cell, to_cell: Cell, sheet_id: int) -> dict:
+        response = self._batch_update([merge_cells_request(from_cell, to_cell, sheet_id)])
+        return response
 
-        sri = from_cell.row_idx
-        eri = to_cell.row_idx + 1
-        sci = from_cell.col_idx
-        eci = to_cell.col_idx + 1
-
-        body = {
-            'mergeCells': {
-                'range': {
-                    'sheetId': sheet_id,
-                    'startRowIndex': sri,
-                    'endRowIndex': eri,
-                    'startColumnIndex': sci,
-                    'endColumnIndex': eci
-                },
-                'mergeType': 'MERGE_ALL'
-            }
-        }
-        response = self.sheets_v4.spreadsheets().batchUpdate(
-            spreadsheetId=self.spreadsheetId,
-            body={'requests': [body]}
-        ).execute()
+    def append(self, cells: Iterable[Iterable[Cell]], sheet_id: int = 0, chunk_size: Optional[int] = None,
+               chunk_bytes: Optional[int] = MAX_BATCH_BYTES, progress: Optional[Progress] = None) -> dict:
+        """REDO must have view [[], []]
+        Rows are split into chunks of at most chunk_size cells and chunk_bytes of JSON,
+        chunks are sent one after another to keep the order of rows"""
+        chunks = measure(self.instrumentation, 'append', 'encode', append_chunks, cells, sheet_id, chunk_size,
+                         chunk_bytes, count=_chunk_cells)
+        response = self._send_chunks(chunks, progress=progress)
         return response
 
-    def append(self, cells: Iterable[Iterable[Cell]], sheet_id: int = 0) -> dict:
-        """REDO must have view [[], []]"""
-        rows = []
-        for row in cells:
-            rows.append({'values': from_cells_to_google_format(row)})
-        body = {
-            'appendCells': {
-                'sheetId': sheet_id,
-                'rows': rows,
-                'fields': '*'
-            }
-        }
+    def get_values(self, sheet_name: str = None, sheet_id: int = None, from_: Optional[str | Cell] = None,
+                   to: Optional[str | Cell] = None, values_only: bool = False,
+                   fields: Optional[str] = None, as_: Literal['cells', 'grid', 'view'] = 'cells') -> Iterator[Cell] | Grid | CellView:
+        """values_only: fetch only values and formatted values, format attributes of Cells stay default
+        fields: custom fields mask for spreadsheets.get, overrides values_only
+        as_: 'cells' yields Cell per value, 'grid' returns compact column-oriented Grid of computed values,
+        'view' returns CellView building a Cell only when its position is accessed"""
+        fields = grid_fields(as_, values_only, fields)
+        if sheet_name is None:
+            sheet_name = self.metadata.find(id=sheet_id).title
+        range_, from_ = values_range(sheet_name, from_, to)
 
-        response = self.sheets_v4.spreadsheets().batchUpdate(
+        ranges = [range_]
+        response = self._cached(f'values|{range_}|{fields}', lambda: self._execute(self._resource('spreadsheets').get(
             spreadsheetId=self.spreadsheetId,
-            body={'requests': [body]}
-        ).execute()
-        return response
+            ranges=ranges,
+            includeGridData=True,
+            fields=fields,
+        )))
+        if as_ == 'grid':
+            return measure(self.instrumentation, 'get_values', 'decode', from_google_format_to_grid, response, from_,
+                           count=lambda grid: grid.shape[0] * grid.shape[1])
+        if as_ == 'view':
+            return CellView.from_response(response, from_)
+        return measure_iter(self.instrumentation, 'get_values', 'decode', from_google_format_to_cell(response, from_))
 
-    def get_values(self, sheet_name: str = None, sheet_id: int = None, from_: Optional[str | Cell] = None,
-                   to: Optional[str | Cell] = None) -> Iterator[Cell]:
+    def iter_rows(self, sheet_name: str = None, sheet_id: int = None, window: int = ROWS_WINDOW,
+                  values_only: bool = False, fields: Optional[str] = None,
+                  prefetch: bool = True) -> Iterator[list[Cell]]:
+        """Yield rows of the sheet as lists of Cells, fetching window rows per request
+        While the caller processes a window the next one is fetched in background if prefetch is True,
+        so at most two windows are held in memory. Reading stops at the end of the sheet grid
+        or at the first window without any data. Empty rows are skipped.
+        The grid size is fetched before reading, so rows and columns added by other writers are not missed"""
+        if window < 1:
+            raise ValueError('window must be positive')
+        fields = grid_fields('cells', values_only, fields)
+        self.metadata.refresh()
+        sheet = self.metadata.find(id=sheet_id, title=sheet_name)
+        row_count = sheet.row_count
+        last_col = a1.column_to_letters(sheet.column_count - 1) if sheet.column_count else 'ZZZ'
 
-        if sheet_name is None:
-            sheet_name = find_sheet(self.sheets, id=sheet_id).title
+        def fetch(start: int) -> Optional[dict]:
+            if row_count is not None and start >= row_count:
+                return None
+            end = start + window if row_count is None else min(start + window, row_count)
+            range_, _ = values_range(sheet.title, f'A{start + 1}', f'{last_col}{end}')
+            return self._execute(self._resource('spreadsheets').get(
+                spreadsheetId=self.spreadsheetId,
+                ranges=[range_],
+                includeGridData=True,
+                fields=fields,
+            ))
 
-        if not from_:
-            from_ = 'A1'
+        executor = None
+        if prefetch:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            start = 0
+            response = fetch(start)
+            while response is not None and has_row_data(response):
+                following = executor.submit(fetch, start + window) if executor is not None else None
+                yield from rows_of(measure_iter(self.instrumentation, 'iter_rows', 'decode',
+                                                from_google_format_to_cell(response, f'A{start + 1}')))
+                start += window
+                response = following.result() if following is not None else fetch(start)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
 
-        if not to:
-            to = 'ZZZ'
-        if isinstance(from_, Cell):
-            from_ = from_.name
-        if isinstance(to, Cell):
-            to = to.name
+    def mirror(self, sheet_name: str = None, sheet_id: int = None, from_: Optional[str | Cell] = None,
+               to: Optional[str | Cell] = None) -> SheetMirror:
+        """Load the range into SheetMirror, its commit() writes back only what was changed"""
+        sheet = self.metadata.find(id=sheet_id, title=sheet_name)
+        return SheetMirror(self, sheet.id, self.get_values(sheet.title, from_=from_, to=to))
 
-        ranges = ['{0}!{1}:{2}'.format(sheet_name, from_, to)]
-        response = self.sheets_v4.spreadsheets().get(
+    def append_buffer(self, sheet_id: int = 0, **kwargs) -> 'AppendBuffer':
+        """AppendBuffer appending rows pushed by many threads in combined appendCells requests,
+        kwargs are its thresholds, see AppendBuffer. Close it to send the rest"""
+        from .buffer import AppendBuffer
+        return AppendBuffer(self, sheet_id, **kwargs)
+
+    def write_frame(self, frame, sheet_name: str = None, sheet_id: int = None, start: str = 'A1',
+                    header: bool = True, index: bool = False,
+                    value_input_option: Literal['USER_ENTERED', 'RAW'] = 'USER_ENTERED',
+                    chunk_cells: int = FRAME_CHUNK_CELLS, progress: Optional[Progress] = None) -> dict:
+        """Write a DataFrame or a mapping name -> column through the values API without building Cells
+        Columns are converted as a whole by frame_columns and sent as majorDimension COLUMNS,
+        chunk_cells values per request. USER_ENTERED parses formulas and dates, RAW stores strings as they are.
+        Not queued by batch(), the values API is not a part of batchUpdate"""
+        if sheet_name is None:
+            sheet_name = self.metadata.find(id=sheet_id).title
+        columns = measure(self.instrumentation, 'write_frame', 'encode', frame_columns, frame, header=header,
+                          index=index, count=lambda columns: sum(len(column) for column in columns))
+        ranges = frame_ranges(columns, sheet_name, start, chunk_cells)
+        total = sum(len(column) for column in columns)
+        responses = []
+        sent = 0
+        started = time.perf_counter()
+        try:
+            for value_range in ranges:
+                responses.append(self._execute(self._resource('spreadsheets', 'values').batchUpdate(
+                    spreadsheetId=self.spreadsheetId,
+                    body=Body(valueInputOption=value_input_option, data=[value_range]),
+                ), 'write'))
+                sent += sum(len(column) for column in value_range['values'])
+                if progress is not None:
+                    progress(sent, total, time.perf_counter() - started)
+        except Exception as exc:
+            if not sent:
+                raise
+            raise PartialWriteError(f'{sent} of {total} cells were written before the error: {exc!r}',
+                                    responses, sent) from exc
+        # the sheet grows to fit the frame, so its grid size is fetched again
+        self.metadata.invalidate()
+        return {
+            'spreadsheetId': self.spreadsheetId,
+            'totalUpdatedCells': sum(response.get('totalUpdatedCells', 0) for response in responses),
+            'responses': [item for response in responses for item in response.get('responses', [])],
+        }
+
+    def read_frame(self, sheet_name: str = None, sheet_id: int = None, range_: Optional[str] = None,
+                   header: bool = True, parse_dates: Iterable[str] = ()):
+        """DataFrame of the range (e.g. 'A1:T1000', the whole sheet by default) read through the values API
+        Columns of numbers come as float64 with NaN for blanks, of booleans as bool, others as object.
+        Dates come as formatted strings, names in parse_dates are converted by pandas.to_datetime"""
+        if sheet_name is None:
+            sheet_name = self.metadata.find(id=sheet_id).title
+        response = self._execute(self._resource('spreadsheets', 'values').get(
             spreadsheetId=self.spreadsheetId,
-            ranges=ranges,
-            includeGridData=True
-        ).execute()
-        return from_google_format_to_cell(response, from_)
+            range=f'{sheet_name}!{range_}' if range_ else sheet_name,
+            majorDimension='COLUMNS',
+            valueRenderOption='UNFORMATTED_VALUE',
+            dateTimeRenderOption='FORMATTED_STRING',
+        ))
+        col_idx = a1.to_indexes(find_range(response['range'])[0])[0] if '!' in response.get('range', '') else 0
+        return measure(self.instrumentation, 'read_frame', 'decode', columns_to_frame, response.get('values', []),
+                       header=header, parse_dates=parse_dates, col_idx=col_idx, count=lambda frame: frame.size)
 
     def create_spreadsheet(self, title: str) -> dict:
         spreadsheet = {
@@ -178,80 +400,80 @@ class GoogleSheets(GoogleSheetsInterface):
                 'title': title,
             }
         }
-        response = self.sheets_v4.spreadsheets().create(body=spreadsheet,
-                                                        fields='fileId').execute()
+        response = self._execute(self._resource('spreadsheets').create(body=spreadsheet,
+                                                                      fields='fileId'), 'write')
         return response
 
     def _provide_access(self):
-        drive_v2 = apiclient.discovery.build('drive', 'v2', http=self.httpAuth)
-        response = drive_v2.files().list().execute()
+        files = get_resource('drive', 'v2', 'files', codec=self.codec, gzip_threshold=self.gzip_threshold)
+        response = self._execute(files.list())
         return response
 
-    def update_cells(self, cells: Iterable[Cell], sheet_id: int = 0) -> list:
+    def update_cells(self, cells: Iterable[Cell], sheet_id: int = 0, chunk_size: Optional[int] = None,
+                     chunk_bytes: Optional[int] = MAX_BATCH_BYTES, max_workers: int = 1,
+                     progress: Optional[Progress] = None, encoder: Optional[ParallelEncoder] = None) -> dict:
+        """Requests are split into chunks of at most chunk_size cells and chunk_bytes of JSON
+        Chunks write separate cells, so with max_workers > 1 they are sent concurrently
+        If a chunk fails after others were written PartialWriteError is raised
+        encoder: encode the requests on its processes, chunks are sent while the rest is encoded.
+        Not used inside batch()"""
         if not cells:
             raise Exception('"cells" must not be empty')
-        responses = []
-        cells = sort_cells(cells)
-        rows = to_rows_format(cells)
-        requests = []
-        for row, columnIndex, rowIndex in rows:
-            body = {
-                'updateCells': {
-                    'rows': [row],
-                    'fields': '*',
-                    'start': {
-                        'sheetId': sheet_id,
-                        'rowIndex': rowIndex,
-                        'columnIndex': columnIndex,
-                    },
-                }
-            }
-            cells = cells[len(row):]
-            requests.append(body)
-        response = self.sheets_v4.spreadsheets().batchUpdate(
-            spreadsheetId=self.spreadsheetId,
-            body={'requests': requests},
-        ).execute()
-        # responses.append(response)
+        if encoder is not None and self._batch is None:
+            chunks, total = measure(self.instrumentation, 'update_cells', 'encode', encoder.encode, cells, sheet_id,
+                                    chunk_size, chunk_bytes, count=lambda result: result[1])
+            try:
+                return self._send_chunks(chunks, max_workers=max_workers, progress=progress, total=total)
+            finally:
+                # blocks still being encoded are cancelled when a chunk failed
+                chunks.close()
+        chunks = measure(self.instrumentation, 'update_cells', 'encode', update_cells_chunks, cells, sheet_id,
+                         chunk_size, chunk_bytes, count=_chunk_cells)
+        response = self._send_chunks(chunks, max_workers=max_workers, progress=progress)
         return response
 
     def copy_to_spreadsheet(self, another_spreadsheet_id: str, sheet_name: Optional[str] = None,
                             sheet_id: int = int()) -> list[dict]:
 
         if sheet_name:
-            sheet_id = find_sheet(self.sheets, title=sheet_name)
+            sheet_id = self.metadata.find(title=sheet_name).id
 
         body = {
             'destinationSpreadsheetId': another_spreadsheet_id
         }
 
-        response = self.sheets_v4.spreadsheets().sheets().copyTo(
+        response = self._execute(self._resource('spreadsheets', 'sheets').copyTo(
             spreadsheetId=self.spreadsheetId,
             sheetId=sheet_id,
             body=body,
-        ).execute()
+        ), 'write')
         return response
 
-    def copy_all_to_spreadsheet(self, another_spreadsheet_id: str) -> list[dict]:
+    def copy_all_to_spreadsheet(self, another_spreadsheet_id: str, max_workers: int = COPY_WORKERS) -> list[dict]:
+        """Sheets are copied concurrently by max_workers threads, responses are in order of sheets"""
+        sheet_ids = [sheet.id for sheet in self.sheets]
+        if max_workers <= 1:
+            return [self.copy_to_spreadsheet(another_spreadsheet_id, sheet_id=sheet_id) for sheet_id in sheet_ids]
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(
+                lambda sheet_id: self.copy_to_spreadsheet(another_spreadsheet_id, sheet_id=sheet_id), sheet_ids
+            ))
 
-        body = {
-            'destinationSpreadsheetId': another_spreadsheet_id
-        }
-        responses = []
-        for sheet_id in self.sheets.values():
-            response = self.sheets_v4.spreadsheets().sheets().copyTo(
-                spreadsheetId=self.spreadsheetId,
-                sheetId=sheet_id,
-                body=body,
-            ).execute()
-            responses.append(response)
-        return responses
-
-    def get_all_sheets(self):
-        response = self.sheets_v4.spreadsheets().get(
-            spreadsheetId=self.spreadsheetId
-        ).execute()
-        return parse_sheets(response)
+    def _fetch_sheets(self) -> dict:
+        return self._cached(f'sheets|{SHEETS_FIELDS}', lambda: self._execute(self._resource('spreadsheets').get(
+            spreadsheetId=self.spreadsheetId,
+            fields=SHEETS_FIELDS,
+        )))
+
+    def get_all_sheets(self) -> list[Sheet]:
+        """Sheets fetched from the API, or from the read cache if the spreadsheet is unchanged,
+        the cache of metadata is refreshed with them"""
+        return self.metadata.refresh()
+
+
+def _chunk_cells(chunks: list[tuple[list[dict], int]]) -> int:
+    return sum(cells for _, cells in chunks)
 
 # TODO https://developers.google.com/drive/api/v2/reference/permissions#resource
 # TODO https://developers.google.com/sheets/api/reference/rest/v4/spreadsheets/request#updatecellsrequest
@@ -0,0 +1,395 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Iterator, Literal, Optional, Iterable, Any
+from urllib.parse import quote
+
+from .interface import GoogleSheetsInterface
+from .Dataclasses import Cell, Grid, Sheet
+from .scheduler import RequestScheduler, Kind, get_scheduler
+from .transport import SCOPES, service_account_credentials
+from .codec import GZIP_USER_AGENT, JsonCodec, get_codec, gzip_body
+from .batch import PartialWriteError, MAX_BATCH_BYTES
+from .metadata import SheetMetadata, SHEETS_FIELDS
+from .view import CellView
+from .frames import FRAME_CHUNK_CELLS, frame_columns, frame_ranges, columns_to_frame
+from . import a1
+from .utils import from_google_format_to_cell, from_google_format_to_grid, has_row_data, rows_of, find_range, \
+    add_sheet_request, unmerge_cells_request, append_dimension_request, insert_range_request, merge_cells_request, \
+    append_chunks, update_cells_chunks, values_range, grid_fields
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+SHEETS_URL = 'https://sheets.googleapis.com/v4/spreadsheets'
+DRIVE_URL = 'https://www.googleapis.com/drive/v2/files'
+# token is refreshed this many seconds before it expires
+TOKEN_MARGIN = 60
+
+
+class Response(dict):
+    """Headers of a failed response, mimics httplib2.Response for RequestScheduler"""
+
+    def __init__(self, status: int, headers: dict):
+        super().__init__((key.lower(), value) for key, value in headers.items())
+        self.status = status
+
+
+class HttpError(Exception):
+    def __init__(self, resp: Response, content: bytes, uri: str):
+        super().__init__(f'<HttpError {resp.status} when requesting {uri}: {content[:500]!r}>')
+        self.resp = resp
+        self.content = content
+        self.uri = uri
+
+
+class AsyncCredentials:
+    """Access token of a service account refreshed without blocking the event loop
+    Concurrent requests wait for one refresh instead of starting their own"""
+
+    def __init__(self, creds: dict, scopes: Iterable[str] = SCOPES):
+        self._credentials = service_account_credentials(creds, list(scopes))
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def token(self, session: 'aiohttp.ClientSession') -> str:
+        if self._token is not None and time.monotonic() < self._expires_at:
+            return self._token
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._token is None or time.monotonic() >= self._expires_at:
+                await self._refresh(session)
+        return self._token
+
+    @property
+    def email(self) -> str:
+        return self._credentials.service_account_email
+
+    def invalidate(self, token: Optional[str] = None):
+        """Drop the token, or only the given one, so a token already refreshed by another request is kept"""
+        if token is None or token == self._token:
+            self._token = None
+
+    async def _refresh(self, session: 'aiohttp.ClientSession'):
+        # signing the assertion is local and cheap, only the exchange goes over the network
+        body = self._credentials._generate_refresh_request_body()
+        headers = {'content-type': 'application/x-www-form-urlencoded'}
+        async with session.post(self._credentials.token_uri, data=body, headers=headers) as resp:
+            content = await resp.read()
+            if resp.status != 200:
+                raise HttpError(Response(resp.status, dict(resp.headers)), content, self._credentials.token_uri)
+        data = json.loads(content)
+        self._token = data['access_token']
+        self._expires_at = time.monotonic() + int(data.get('expires_in', 3600)) - TOKEN_MARGIN
+
+
+class AsyncGoogleSheets(GoogleSheetsInterface):
+    """
+    Coroutine version of GoogleSheets over aiohttp, requires google_spreadsheets[async]
+
+    async with AsyncGoogleSheets(creds, spreadsheet_id) as sheets:
+        cells = await sheets.get_values('Sheet1')
+
+    session: aiohttp.ClientSession to share a connection pool between clients, it is not closed by the client.
+    By default the client creates its own pool of at most limit connections
+    credentials: AsyncCredentials to share a token between clients, creds are not used then
+    metadata_ttl: seconds the list of sheets is trusted for, by default until metadata.invalidate()
+    codec: JSON codec of bodies, 'json', 'orjson' or 'auto' for orjson when it is installed
+    gzip_threshold: request bodies of at least so many bytes are sent gzip encoded, by default none are
+    """
+
+    def __init__(self, creds: Optional[dict], spreadsheetId: str, session: Optional['aiohttp.ClientSession'] = None,
+                 credentials: Optional[AsyncCredentials] = None, scheduler: Optional[RequestScheduler] = None,
+                 limit: int = 100, metadata_ttl: Optional[float] = None, codec: str | JsonCodec = 'auto',
+                 gzip_threshold: Optional[int] = None):
+        if aiohttp is None:
+            raise ImportError('AsyncGoogleSheets requires aiohttp, install google_spreadsheets[async]')
+        self.credentials = credentials if credentials is not None else AsyncCredentials(creds)
+        self.spreadsheetId = spreadsheetId
+        self.scheduler = scheduler if scheduler is not None else get_scheduler(self.credentials.email)
+        self._session = session
+        self._own_session = session is None
+        self._limit = limit
+        self.metadata = SheetMetadata(ttl=metadata_ttl)
+        self.codec = get_codec(codec)
+        self.gzip_threshold = gzip_threshold
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> 'aiohttp.ClientSession':
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self._limit))
+        return self._session
+
+    async def _request(self, method: str, url: str, kind: Kind = 'read', params: Any = None,
+                       body: Optional[dict] = None) -> dict:
+        data = None
+        headers = {'user-agent': f'{aiohttp.http.SERVER_SOFTWARE} {GZIP_USER_AGENT}'}
+        if body is not None:
+            data = self.codec.dumps(body)
+            headers['content-type'] = 'application/json'
+            compressed = gzip_body(data, self.gzip_threshold)
+            if compressed is not None:
+                data = compressed
+                headers['content-encoding'] = 'gzip'
+
+        async def send():
+            # a rejected token is refreshed and the request sent once more, as the authorized Http does
+            for attempt in range(2):
+                token = await self.credentials.token(self.session)
+                try:
+                    async with self.session.request(method, url, params=params, data=data,
+                                                    headers={**headers, 'authorization': f'Bearer {token}'}) as resp:
+                        content = await resp.read()
+                        status = resp.status
+                        resp_headers = dict(resp.headers)
+                except aiohttp.ClientConnectionError as exc:
+                    raise ConnectionError(str(exc)) from exc
+                if status == 401:
+                    self.credentials.invalidate(token)
+                    if attempt == 0:
+                        continue
+                if status >= 300:
+                    raise HttpError(Response(status, resp_headers), content, url)
+                return self.codec.load_body(content) if content else {}
+
+        return await self.scheduler.execute_async(send, kind)
+
+    async def _send_batch_update(self, requests: list[dict]) -> dict:
+        response = await self._request('POST', f'{SHEETS_URL}/{self.spreadsheetId}:batchUpdate', 'write',
+                                       body={'requests': requests})
+        self.metadata.apply(requests, response)
+        return response
+
+    async def _send_chunks(self, chunks: list[tuple[list[dict], int]], max_workers: int = 1,
+                           progress=None) -> dict:
+        total = sum(cells for _, cells in chunks)
+        responses: list[Optional[dict]] = [None] * len(chunks)
+        sent = 0
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def send(idx: int):
+            nonlocal sent
+            async with semaphore:
+                responses[idx] = await self._send_batch_update(chunks[idx][0])
+            sent += chunks[idx][1]
+            if progress is not None:
+                progress(sent, total, time.perf_counter() - started)
+
+        try:
+            if max_workers <= 1:
+                for idx in range(len(chunks)):
+                    await send(idx)
+            else:
+                tasks = [asyncio.ensure_future(send(idx)) for idx in range(len(chunks))]
+                try:
+                    await asyncio.gather(*tasks)
+                except BaseException:
+                    # chunks not sent yet are not started and those in flight are awaited,
+                    # so responses and sent hold every chunk known to be applied
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    raise
+        except Exception as exc:
+            if not sent:
+                raise
+            raise PartialWriteError(f'{sent} of {total} cells were written before the error: {exc!r}',
+                                    responses, sent) from exc
+
+        return {
+            'spreadsheetId': self.spreadsheetId,
+            'replies': [reply for response in responses if response for reply in response.get('replies', [])],
+        }
+
+    async def get_sheets(self) -> list[Sheet]:
+        if self.metadata.stale:
+            return await self.get_all_sheets()
+        return self.metadata.sheets
+
+    async def find_sheet(self, id: int = None, title: str = None) -> Sheet:
+        if self.metadata.stale:
+            await self.get_all_sheets()
+        return self.metadata.find(id=id, title=title)
+
+    async def add_sheet(self, title: str) -> dict:
+        return await self._send_batch_update([add_sheet_request(title)])
+
+    async def unmerge_cells(self, from_cell: Cell, to_cell: Cell, sheet_id: int) -> dict:
+        return await self._send_batch_update([unmerge_cells_request(from_cell, to_cell, sheet_id)])
+
+    async def append_dimension(self, dimension: Literal['ROWS', 'COLUMNS', 'DIMENSION_UNSPECIFIED'], sheet_id: int,
+                               length: int) -> dict:
+        return await self._send_batch_update([append_dimension_request(dimension, sheet_id, length)])
+
+    async def insert_range(self, from_cell: Cell, to_cell: Cell, shift_dimension: Literal['ROWS', 'COLUMNS'],
+                           sheet_id: int) -> dict:
+        return await self._send_batch_update([insert_range_request(from_cell, to_cell, shift_dimension, sheet_id)])
+
+    async def merge_cells(self, from_cell: Cell, to_cell: Cell, sheet_id: int) -> dict:
+        return await self._send_batch_update([merge_cells_request(from_cell, to_cell, sheet_id)])
+
+    async def append(self, cells: Iterable[Iterable[Cell]], sheet_id: int = 0, chunk_size: Optional[int] = None,
+                     chunk_bytes: Optional[int] = MAX_BATCH_BYTES, progress=None) -> dict:
+        chunks = append_chunks(cells, sheet_id, chunk_size, chunk_bytes)
+        return await self._send_chunks(chunks, progress=progress)
+
+    async def update_cells(self, cells: Iterable[Cell], sheet_id: int = 0, chunk_size: Optional[int] = None,
+                           chunk_bytes: Optional[int] = MAX_BATCH_BYTES, max_workers: int = 1,
+                           progress=None) -> dict:
+        if not cells:
+            raise Exception('"cells" must not be empty')
+        chunks = update_cells_chunks(cells, sheet_id, chunk_size, chunk_bytes)
+        return await self._send_chunks(chunks, max_workers=max_workers, progress=progress)
+
+    async def get_values(self, sheet_name: str = None, sheet_id: int = None, from_: Optional[str | Cell] = None,
+                         to: Optional[str | Cell] = None, values_only: bool = False,
+                         fields: Optional[str] = None,
+                         as_: Literal['cells', 'grid', 'view'] = 'cells') -> Iterator[Cell] | Grid | CellView:
+        fields = grid_fields(as_, values_only, fields)
+        if sheet_name is None:
+            sheet_name = (await self.find_sheet(id=sheet_id)).title
+        range_, from_ = values_range(sheet_name, from_, to)
+        params = [('ranges', range_), ('includeGridData', 'true')]
+        if fields is not None:
+            params.append(('fields', fields))
+        response = await self._request('GET', f'{SHEETS_URL}/{self.spreadsheetId}', params=params)
+        if as_ == 'grid':
+            return from_google_format_to_grid(response, from_)
+        if as_ == 'view':
+            return CellView.from_response(response, from_)
+        return from_google_format_to_cell(response, from_)
+
+    async def iter_rows(self, sheet_name: str = None, sheet_id: int = None, window: int = 5000,
+                        values_only: bool = False, fields: Optional[str] = None,
+                        prefetch: bool = True) -> AsyncIterator[list[Cell]]:
+        """Async generator of rows of the sheet as lists of Cells, window rows per request
+        The next window is fetched while the caller processes one if prefetch is True, see GoogleSheets.iter_rows"""
+        if window < 1:
+            raise ValueError('window must be positive')
+        fields = grid_fields('cells', values_only, fields)
+        # the grid size is fetched before reading, rows added by other writers are missing from the cached one
+        await self.get_all_sheets()
+        sheet = self.metadata.find(id=sheet_id, title=sheet_name)
+        row_count = sheet.row_count
+        last_col = a1.column_to_letters(sheet.column_count - 1) if sheet.column_count else 'ZZZ'
+
+        async def fetch(start: int) -> Optional[dict]:
+            if row_count is not None and start >= row_count:
+                return None
+            end = start + window if row_count is None else min(start + window, row_count)
+            range_, _ = values_range(sheet.title, f'A{start + 1}', f'{last_col}{end}')
+            params = [('ranges', range_), ('includeGridData', 'true')]
+            if fields is not None:
+                params.append(('fields', fields))
+            return await self._request('GET', f'{SHEETS_URL}/{self.spreadsheetId}', params=params)
+
+        following = None
+        try:
+            start = 0
+            response = await fetch(start)
+            while response is not None and has_row_data(response):
+                following = asyncio.ensure_future(fetch(start + window)) if prefetch else None
+                for row in rows_of(from_google_format_to_cell(response, f'A{start + 1}')):
+                    yield row
+                start += window
+                response = await following if following is not None else await fetch(start)
+                following = None
+        finally:
+            if following is not None:
+                following.cancel()
+
+    async def write_frame(self, frame, sheet_name: str = None, sheet_id: int = None, start: str = 'A1',
+                          header: bool = True, index: bool = False,
+                          value_input_option: Literal['USER_ENTERED', 'RAW'] = 'USER_ENTERED',
+                          chunk_cells: int = FRAME_CHUNK_CELLS, progress=None) -> dict:
+        """Write a DataFrame or a mapping name -> column through the values API, see GoogleSheets.write_frame"""
+        if sheet_name is None:
+            sheet_name = (await self.find_sheet(id=sheet_id)).title
+        columns = frame_columns(frame, header=header, index=index)
+        total = sum(len(column) for column in columns)
+        responses = []
+        sent = 0
+        started = time.perf_counter()
+        try:
+            for value_range in frame_ranges(columns, sheet_name, start, chunk_cells):
+                responses.append(await self._request(
+                    'POST', f'{SHEETS_URL}/{self.spreadsheetId}/values:batchUpdate', 'write',
+                    body={'valueInputOption': value_input_option, 'data': [value_range]},
+                ))
+                sent += sum(len(column) for column in value_range['values'])
+                if progress is not None:
+                    progress(sent, total, time.perf_counter() - started)
+        except Exception as exc:
+            if not sent:
+                raise
+            raise PartialWriteError(f'{sent} of {total} cells were written before the error: {exc!r}',
+                                    responses, sent) from exc
+        # the sheet grows to fit the frame, so its grid size is fetched again
+        self.metadata.invalidate()
+        return {
+            'spreadsheetId': self.spreadsheetId,
+            'totalUpdatedCells': sum(response.get('totalUpdatedCells', 0) for response in responses),
+            'responses': [item for response in responses for item in response.get('responses', [])],
+        }
+
+    async def read_frame(self, sheet_name: str = None, sheet_id: int = None, range_: Optional[str] = None,
+                         header: bool = True, parse_dates: Iterable[str] = ()):
+        """DataFrame of the range read through the values API, see GoogleSheets.read_frame"""
+        if sheet_name is None:
+            sheet_name = (await self.find_sheet(id=sheet_id)).title
+        range_ = f'{sheet_name}!{range_}' if range_ else sheet_name
+        response = await self._request('GET', f'{SHEETS_URL}/{self.spreadsheetId}/values/{quote(range_, safe="")}',
+                                       params={
+                                           'majorDimension': 'COLUMNS',
+                                           'valueRenderOption': 'UNFORMATTED_VALUE',
+                                           'dateTimeRenderOption': 'FORMATTED_STRING',
+                                       })
+        col_idx = a1.to_indexes(find_range(response['range'])[0])[0] if '!' in response.get('range', '') else 0
+        return columns_to_frame(response.get('values', []), header=header, parse_dates=parse_dates, col_idx=col_idx)
+
+    async def create_spreadsheet(self, title: str) -> dict:
+        spreadsheet = {
+            'properties': {
+                'title': title,
+            }
+        }
+        return await self._request('POST', SHEETS_URL, 'write', body=spreadsheet)
+
+    async def _provide_access(self) -> dict:
+        return await self._request('GET', DRIVE_URL)
+
+    async def copy_to_spreadsheet(self, another_spreadsheet_id: str, sheet_name: Optional[str] = None,
+                                  sheet_id: int = int()) -> dict:
+        if sheet_name:
+            sheet_id = (await self.find_sheet(title=sheet_name)).id
+        body = {
+            'destinationSpreadsheetId': another_spreadsheet_id
+        }
+        return await self._request('POST', f'{SHEETS_URL}/{self.spreadsheetId}/sheets/{sheet_id}:copyTo', 'write',
+                                   body=body)
+
+    async def copy_all_to_spreadsheet(self, another_spreadsheet_id: str) -> list[dict]:
+        sheets = await self.get_sheets()
+        return list(await asyncio.gather(*(
+            self.copy_to_spreadsheet(another_spreadsheet_id, sheet_id=sheet.id) for sheet in sheets
+        )))
+
+    async def get_all_sheets(self) -> list[Sheet]:
+        response = await self._request('GET', f'{SHEETS_URL}/{self.spreadsheetId}', params={'fields': SHEETS_FIELDS})
+        return self.metadata.load(response)
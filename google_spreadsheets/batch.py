@@ -0,0 +1,203 @@
+import json
+from typing import Callable, Iterable, Optional, Any
+
+# Google recommends keeping a single request payload under 2 MB
+MAX_BATCH_BYTES = 2 * 1024 * 1024
+
+
+class PartialWriteError(Exception):
+    """Raised when a chunked write fails after some of its chunks were sent
+    responses: response of every chunk in order, None for chunks which failed or were not sent
+    sent: number of cells or rows written by the successful chunks"""
+
+    def __init__(self, message: str, responses: list[Optional[dict]], sent: int):
+        super().__init__(message)
+        self.responses = responses
+        self.sent = sent
+
+
+def chunk_items(items: list[Any], counts: list[int], max_cells: Optional[int] = None,
+                max_bytes: Optional[int] = None, sizes: Optional[list[int]] = None) -> list[tuple[list[Any], int]]:
+    """Split items into chunks holding at most max_cells cells and max_bytes of JSON
+    counts: number of cells in every item. An item exceeding the budget forms a chunk alone
+    sizes: JSON bytes of every item if already known, items are serialized to measure them otherwise
+    Return list of (items, cells) pairs"""
+    if max_cells is None and max_bytes is None:
+        return [(items, sum(counts))]
+    chunks = []
+    chunk = []
+    chunk_cells = chunk_bytes = 0
+    for idx, (item, count) in enumerate(zip(items, counts)):
+        if max_bytes is None:
+            size = 0
+        elif sizes is not None:
+            size = sizes[idx]
+        else:
+            size = len(json.dumps(item, separators=(',', ':')))
+        too_many = max_cells is not None and chunk_cells + count > max_cells
+        too_big = max_bytes is not None and chunk_bytes + size > max_bytes
+        if chunk and (too_many or too_big):
+            chunks.append((chunk, chunk_cells))
+            chunk = []
+            chunk_cells = chunk_bytes = 0
+        chunk.append(item)
+        chunk_cells += count
+        chunk_bytes += size
+    if chunk:
+        chunks.append((chunk, chunk_cells))
+    return chunks
+
+
+class PendingResponse:
+    """Placeholder returned by mutating methods while a batch is active.
+    After flush it holds the same dict the method would have returned: {'spreadsheetId': ..., 'replies': [...]}"""
+
+    def __init__(self, requests: list[dict]):
+        self.requests = requests
+        self._response: Optional[dict] = None
+        self._callbacks: list[Callable[[dict], Any]] = []
+
+    @property
+    def done(self) -> bool:
+        return self._response is not None
+
+    def result(self) -> dict:
+        if self._response is None:
+            raise Exception('Batch has not been flushed yet')
+        return self._response
+
+    def add_done_callback(self, callback: Callable[[dict], Any]):
+        """Call callback(response) once the call is flushed, right away if it already was.
+        Not called if the flush fails"""
+        if self.done:
+            callback(self.result())
+        else:
+            self._callbacks.append(callback)
+
+    def __repr__(self):
+        state = 'done' if self.done else 'pending'
+        return f'{type(self).__name__}(requests={len(self.requests)}, {state})'
+
+
+class ChunkedResponse(PendingResponse):
+    """PendingResponse of a chunked call, e.g. update_cells, whose chunks were queued as separate calls.
+    It is done when every chunk is flushed, its replies are those of the chunks in order"""
+
+    def __init__(self, parts: list[PendingResponse]):
+        super().__init__([request for part in parts for request in part.requests])
+        self.parts = parts
+
+    @property
+    def done(self) -> bool:
+        return all(part.done for part in self.parts)
+
+    def result(self) -> dict:
+        if self._response is None:
+            responses = [part.result() for part in self.parts]
+            self._response = {
+                'spreadsheetId': responses[0]['spreadsheetId'],
+                'replies': [reply for response in responses for reply in response['replies']],
+            }
+        return self._response
+
+
+class Batch:
+    """
+    Collects the request bodies of mutating calls and sends them in as few batchUpdate calls as possible
+
+    with sheets.batch() as b:
+        sheets.merge_cells(...)
+        sheets.insert_range(...)
+    b.responses  # one response per call, in call order
+
+    A call is never split between two batchUpdate calls, so its replies always come from one response.
+    A call which alone exceeds max_bytes is sent by itself. Chunked calls (update_cells, append) are queued
+    chunk by chunk instead, so their chunks are grouped with others without exceeding max_bytes.
+    """
+
+    def __init__(self, sheets, max_bytes: int = MAX_BATCH_BYTES, max_requests: Optional[int] = None):
+        self._sheets = sheets
+        self.max_bytes = max_bytes
+        self.max_requests = max_requests
+        # (chunk, its JSON bytes, the call it belongs to)
+        self._queue: list[tuple[PendingResponse, int, PendingResponse]] = []
+        self.responses: list[dict] = []
+
+    def __enter__(self):
+        if self._sheets._batch is not None:
+            raise Exception('Another batch is already active')
+        self._sheets._batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._sheets._batch = None
+        if exc_type is None:
+            self.flush()
+        else:
+            self._queue.clear()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def add(self, requests: list[dict]) -> PendingResponse:
+        pending = PendingResponse(requests)
+        self._queue.append((pending, _size(requests), pending))
+        return pending
+
+    def add_chunks(self, chunks: Iterable[list[dict]]) -> PendingResponse:
+        """Queue every chunk of one call on its own, the returned response joins their replies"""
+        parts = [PendingResponse(requests) for requests in chunks]
+        if len(parts) <= 1:
+            return self.add(parts[0].requests if parts else [])
+        call = ChunkedResponse(parts)
+        self._queue.extend((part, _size(part.requests), call) for part in parts)
+        return call
+
+    def _groups(self) -> list[list[tuple[PendingResponse, int, PendingResponse]]]:
+        groups = []
+        group = []
+        group_size = group_count = 0
+        for item in self._queue:
+            pending, size, _ = item
+            count = len(pending.requests)
+            too_big = group_size + size > self.max_bytes
+            too_many = self.max_requests is not None and group_count + count > self.max_requests
+            if group and (too_big or too_many):
+                groups.append(group)
+                group = []
+                group_size = group_count = 0
+            group.append(item)
+            group_size += size
+            group_count += count
+        if group:
+            groups.append(group)
+        return groups
+
+    def flush(self) -> list[dict]:
+        """Send queued requests and return the responses of the flushed calls in call order
+        A chunked call is flushed with its last chunk"""
+        flushed = []
+        for group in self._groups():
+            requests = [request for pending, _, _ in group for request in pending.requests]
+            response = self._sheets._send_batch_update(requests)
+            replies = response.get('replies', [])
+            start = 0
+            for pending, _, call in group:
+                end = start + len(pending.requests)
+                pending._response = {
+                    'spreadsheetId': response.get('spreadsheetId'),
+                    'replies': replies[start:end],
+                }
+                if call.done:
+                    flushed.append(call.result())
+                    self.responses.append(call.result())
+                    for callback in call._callbacks:
+                        callback(call.result())
+                start = end
+            # keep the calls of unsent groups queued if a later group fails
+            del self._queue[:len(group)]
+        return flushed
+
+
+def _size(requests: list[dict]) -> int:
+    return len(json.dumps(requests, separators=(',', ':')))
@@ -0,0 +1,426 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+from . import a1
+from .Dataclasses import Cell, Borders
+from .codec import JsonCodec, get_codec
+from .emulator import SheetsEmulator, UNLIMITED
+from .scheduler import RequestScheduler
+from .instrumentation import MetricsCollector
+from .encoder import ParallelEncoder
+from .utils import from_cells_to_google_format, from_google_format_to_cell, update_cells_chunks
+from .batch import MAX_BATCH_BYTES
+
+# cells of a scenario at scale 1
+CELLS = 100_000
+COLUMNS = 20
+STYLES = [
+    {},
+    {'bold': True},
+    {'bg_color': '#ffeeaa'},
+    {'borders': Borders('SOLID', 1, '#000000'), 'font_size': 12},
+]
+
+
+def make_cells(count: int, columns: int = COLUMNS, seed: int = 0) -> list[Cell]:
+    """Cells of a dense block with strings, numbers, formulas and blanks in a few styles"""
+    rnd = random.Random(seed)
+    values = ['text', 1.5, 42, '=A1', None]
+    return [Cell(col_idx=idx % columns, row_idx=idx // columns, value=rnd.choice(values), **STYLES[idx % len(STYLES)])
+            for idx in range(count)]
+
+
+class Scenario:
+    """Benchmark of one operation: setup() builds its input once, run(input) is timed repeat times
+    and returns a dict of numbers to report, e.g. bytes sent. teardown(input) releases what setup() started"""
+
+    def __init__(self, name: str, items: int, setup: Callable[[], object], run: Callable[[object], dict],
+                 teardown: Optional[Callable[[object], None]] = None):
+        self.name = name
+        self.items = items
+        self.setup = setup
+        self.run = run
+        self.teardown = teardown
+
+    def measure(self, repeat: int) -> dict:
+        state = self.setup()
+        best = None
+        extra = {}
+        try:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                extra = self.run(state) or {}
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+        finally:
+            if self.teardown is not None:
+                self.teardown(state)
+        return {'seconds': round(best, 6), 'items': self.items, 'per_second': round(self.items / best, 1), **extra}
+
+
+def scenarios(scale: float = 1.0, latency: float = 0.0, bandwidth: Optional[float] = None,
+              codec: str | JsonCodec = 'auto', gzip: bool = True,
+              gzip_threshold: Optional[int] = None, processes: Optional[int] = None) -> list[Scenario]:
+    """bandwidth, gzip: of the emulator, codec, gzip_threshold: of the client,
+    processes: of ParallelEncoder of the parallel scenario"""
+    count = max(COLUMNS, int(CELLS * scale))
+    codec = get_codec(codec)
+
+    def emulated(cells: int, latency: float) -> tuple[SheetsEmulator, object]:
+        emulator = SheetsEmulator(latency=latency, bandwidth=bandwidth, gzip=gzip)
+        sheets = emulator.client(emulator.create('benchmark', rows=cells // COLUMNS + 1, columns=COLUMNS),
+                                 codec=codec, gzip_threshold=gzip_threshold)
+        return emulator, sheets
+
+    def encode(cells):
+        values = from_cells_to_google_format(cells)
+        return {'bytes': len(json.dumps(values, separators=(',', ':')))}
+
+    def memory(_):
+        # Cells of default styles as in make_cells, peak of traced allocations while they are alive
+        tracemalloc.start()
+        try:
+            cells = [Cell(col_idx=idx % COLUMNS, row_idx=idx // COLUMNS, value=idx) for idx in range(count)]
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {'peak_mb': round(peak / 2 ** 20, 1), 'bytes_per_cell': round(peak / len(cells))}
+
+    def a1_setup():
+        # columns of every width up to ZZZ, rows up to a million
+        rnd = random.Random(2)
+        cols = [rnd.randrange(18278) for _ in range(count)]
+        rows = [rnd.randrange(1_000_000) for _ in range(count)]
+        return cols, rows, a1.indexes_to_names(cols, rows)
+
+    def a1_cells(state):
+        # one Cell method call per name, as code converting cell by cell does
+        _, _, names = state
+        for name in names:
+            Cell.from_indexes_to_name(*Cell.find_indexes(name))
+        return {}
+
+    def a1_bulk(state):
+        cols, rows, names = state
+        a1.names_to_indexes(names)
+        a1.indexes_to_names(cols, rows)
+        return {}
+
+    def import_(_):
+        # a fresh interpreter, imports of this one are cached
+        code = ('import time; started = time.perf_counter(); import google_spreadsheets.api; '
+                'imported = time.perf_counter(); '
+                'from google_spreadsheets.transport import get_resource; '
+                'get_resource("sheets", "v4", "spreadsheets"); '
+                'print(imported - started, time.perf_counter() - imported)')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=root).stdout
+        imported, service = map(float, output.split())
+        return {'import_seconds': round(imported, 4), 'service_seconds': round(service, 4)}
+
+    constructions = max(100, count // 100)
+
+    def construct(_):
+        from .api import GoogleSheets
+        creds = {'client_email': 'benchmark@example.iam.gserviceaccount.com'}
+        for idx in range(constructions):
+            GoogleSheets(creds, f'spreadsheet-{idx}')
+        return {}
+
+    def plan_setup():
+        cells = make_cells(count)
+        random.Random(1).shuffle(cells)
+        return cells
+
+    def plan(cells):
+        chunks = update_cells_chunks(cells, 0, None, MAX_BATCH_BYTES)
+        return {'requests': sum(len(requests) for requests, _ in chunks), 'chunks': len(chunks)}
+
+    def decode_setup():
+        emulator, sheets = emulated(count, 0.0)
+        sheets.update_cells(make_cells(count), 0)
+        return sheets._execute(sheets._resource('spreadsheets').get(
+            spreadsheetId=sheets.spreadsheetId, ranges=['Sheet1!A1:ZZZ'], includeGridData=True))
+
+    def decode(response):
+        return {'cells': sum(1 for _ in from_google_format_to_cell(response, 'A1'))}
+
+    def dumps_setup():
+        return update_cells_chunks(make_cells(count), 0, None, None)[0][0]
+
+    def dumps(requests):
+        return {'bytes': len(codec.dumps({'requests': requests}))}
+
+    def loads_setup():
+        return codec.dumps(decode_setup())
+
+    def loads(content):
+        codec.load_body(content)
+        return {'bytes': len(content)}
+
+    def read_setup():
+        emulator, sheets = emulated(count, latency)
+        sheets.update_cells(make_cells(count), 0)
+        emulator.reset_stats()
+        return emulator, sheets
+
+    def read(state, values_only: bool = True):
+        emulator, sheets = state
+        emulator.reset_stats()
+        list(sheets.get_values('Sheet1', values_only=values_only))
+        return {'requests': emulator.stats['requests'], 'response_bytes': emulator.stats['response_bytes']}
+
+    def read_full(state):
+        # the whole includeGridData payload with formats, the baseline of values_only
+        return read(state, values_only=False)
+
+    def write_setup():
+        return emulated(count, latency) + (make_cells(count),)
+
+    def write(state):
+        emulator, sheets, cells = state
+        emulator.reset_stats()
+        sheets.update_cells(cells, 0)
+        return {'requests': emulator.stats['requests'], 'request_bytes': emulator.stats['request_bytes']}
+
+    def parallel_setup():
+        # processes are started before the timed runs, as a long lived encoder would have them
+        encoder = ParallelEncoder(processes, codec=codec)
+        state = write_setup() + (encoder,)
+        try:
+            parallel(state)
+        except BaseException:
+            encoder.close()
+            raise
+        return state
+
+    def parallel(state):
+        emulator, sheets, cells, encoder = state
+        emulator.reset_stats()
+        sheets.update_cells(cells, 0, encoder=encoder)
+        return {'requests': emulator.stats['requests'], 'processes': encoder.processes}
+
+    def frame_setup():
+        # count rows of COLUMNS columns: floats with NaN, ints, strings and datetimes
+        import numpy as np
+        import pandas as pd
+        rnd = np.random.default_rng(0)
+        columns = {}
+        for idx in range(COLUMNS):
+            kind = idx % 4
+            if kind == 0:
+                column = rnd.random(count)
+                column[::10] = np.nan
+            elif kind == 1:
+                column = rnd.integers(0, 1000, count)
+            elif kind == 2:
+                column = np.array([f'name {row}' for row in range(count)], dtype=object)
+            else:
+                column = pd.date_range('2020-01-01', periods=count, freq='h')
+            columns[f'c{idx}'] = column
+        emulator, sheets = emulated((count + 1) * COLUMNS, latency)
+        # the conversion of the client is reported apart from the time the emulator takes
+        sheets.instrumentation = MetricsCollector()
+        return emulator, sheets, pd.DataFrame(columns)
+
+    def converted(sheets) -> float:
+        seconds = sum(stats['seconds'] for stats in sheets.instrumentation.summary()['conversions'].values())
+        sheets.instrumentation.reset()
+        return round(seconds, 3)
+
+    def write_frame(state):
+        emulator, sheets, frame = state
+        emulator.reset_stats()
+        sheets.instrumentation.reset()
+        sheets.write_frame(frame, 'Sheet1')
+        return {'requests': emulator.stats['requests'], 'request_bytes': emulator.stats['request_bytes'],
+                'convert_seconds': converted(sheets)}
+
+    def read_frame_setup():
+        state = frame_setup()
+        write_frame(state)
+        return state
+
+    def read_frame(state):
+        emulator, sheets, _ = state
+        emulator.reset_stats()
+        sheets.instrumentation.reset()
+        frame = sheets.read_frame('Sheet1')
+        return {'rows': len(frame), 'response_bytes': emulator.stats['response_bytes'],
+                'convert_seconds': converted(sheets)}
+
+    calls = max(10, count // 1000)
+
+    def batch_setup():
+        return emulated(COLUMNS * calls * 2, latency)
+
+    def mutate(sheets):
+        for idx in range(calls):
+            sheets.merge_cells(Cell(col_idx=0, row_idx=idx * 2), Cell(col_idx=1, row_idx=idx * 2 + 1), 0)
+            sheets.unmerge_cells(Cell(col_idx=0, row_idx=idx * 2), Cell(col_idx=1, row_idx=idx * 2 + 1), 0)
+
+    def unbatched(state):
+        emulator, sheets = state
+        emulator.reset_stats()
+        mutate(sheets)
+        return {'requests': emulator.stats['requests']}
+
+    def batched(state):
+        emulator, sheets = state
+        emulator.reset_stats()
+        with sheets.batch():
+            mutate(sheets)
+        return {'requests': emulator.stats['requests']}
+
+    def fanout_setup():
+        emulator = SheetsEmulator(latency=latency, bandwidth=bandwidth, gzip=gzip)
+        ids = [emulator.create(f'fanout {idx}', rows=10, columns=COLUMNS) for idx in range(calls)]
+        pool = emulator.pool(codec=codec, gzip_threshold=gzip_threshold)
+        pool.map(lambda client, _: client.update_cells(make_cells(COLUMNS * 10), 0), ids).raise_errors()
+        return emulator, pool, {spreadsheet_id: ['Sheet1!A1:T10'] for spreadsheet_id in ids}
+
+    def fanout(state):
+        emulator, pool, ranges = state
+        emulator.reset_stats()
+        pool.read_many(ranges).raise_errors()
+        return {'requests': emulator.stats['requests']}
+
+    def throttled_setup():
+        # offline: the emulator answers 429 over its quota and the scheduler's backoff only moves a shared clock
+        now = [0.0]
+
+        def clock() -> float:
+            return now[0]
+
+        def sleep(seconds: float):
+            now[0] += seconds
+
+        emulator = SheetsEmulator(reads_per_minute=calls // 2, gzip=gzip, clock=clock, sleep=sleep)
+        scheduler = RequestScheduler(UNLIMITED, UNLIMITED, max_retries=10, clock=clock, sleep=sleep)
+        sheets = emulator.client(emulator.create('throttled', rows=10, columns=COLUMNS), scheduler=scheduler,
+                                 codec=codec, gzip_threshold=gzip_threshold)
+        return emulator, sheets, now
+
+    def throttled(state):
+        emulator, sheets, now = state
+        emulator.reset_stats()
+        retries = sheets.scheduler.stats().retries
+        started = now[0]
+        emulator.inject(429, times=3, retry_after=2.0)
+        for _ in range(calls):
+            list(sheets.get_values('Sheet1', values_only=True))
+        return {'requests': emulator.stats['requests'], 'errors': emulator.stats['errors'],
+                'retries': sheets.scheduler.stats().retries - retries, 'emulated_seconds': round(now[0] - started, 1)}
+
+    frames = []
+    if importlib.util.find_spec('pandas') is not None:
+        # DataFrame scenarios require google_spreadsheets[pandas]
+        frames = [
+            Scenario('write_frame', count * COLUMNS, frame_setup, write_frame),
+            Scenario('read_frame', count * COLUMNS, read_frame_setup, read_frame),
+        ]
+
+    return [
+        Scenario('import', 1, lambda: None, import_),
+        Scenario('construct', constructions, lambda: None, construct),
+        Scenario('encode', count, lambda: make_cells(count), encode),
+        Scenario('memory', count, lambda: None, memory),
+        Scenario('a1_cells', count, a1_setup, a1_cells),
+        Scenario('a1_bulk', count, a1_setup, a1_bulk),
+        Scenario('plan', count, plan_setup, plan),
+        Scenario('decode', count, decode_setup, decode),
+        Scenario('dumps', count, dumps_setup, dumps),
+        Scenario('loads', count, loads_setup, loads),
+        Scenario('read', count, read_setup, read),
+        Scenario('read_full', count, read_setup, read_full),
+        Scenario('write', count, write_setup, write),
+        Scenario('parallel', count, parallel_setup, parallel, lambda state: state[-1].close()),
+        *frames,
+        Scenario('unbatched', calls * 2, batch_setup, unbatched),
+        Scenario('batched', calls * 2, batch_setup, batched),
+        Scenario('fanout', calls, fanout_setup, fanout),
+        Scenario('throttled', calls, throttled_setup, throttled),
+    ]
+
+
+def revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def last_record(path: str) -> Optional[dict]:
+    try:
+        with open(path) as file:
+            lines = [line for line in file if line.strip()]
+    except FileNotFoundError:
+        return None
+    return json.loads(lines[-1]) if lines else None
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(
+        prog='python -m google_spreadsheets.benchmarks',
+        description='Benchmarks of GoogleSheets against the in-process emulator of Sheets API',
+    )
+    parser.add_argument('--scale', type=float, default=1.0, help=f'multiplier of {CELLS} cells of a scenario')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every emulated request')
+    parser.add_argument('--bandwidth', type=float, help='bytes per second of emulated request and response bodies')
+    parser.add_argument('--codec', default='auto', help='JSON codec of the client: json, orjson or auto')
+    parser.add_argument('--no-gzip', action='store_true', help='emulated responses are not compressed')
+    parser.add_argument('--gzip-threshold', type=int, help='bytes from which request bodies are compressed')
+    parser.add_argument('--processes', type=int, help='processes of the parallel scenario, all cores by default')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every scenario, the best one is reported')
+    parser.add_argument('--only', help='comma separated names of scenarios')
+    parser.add_argument('--output', help='JSON lines file the results are appended to and compared with')
+    args = parser.parse_args(argv)
+
+    only = set(args.only.split(',')) if args.only else None
+    previous = last_record(args.output) if args.output else None
+    results = {}
+    codec = get_codec(args.codec)
+    for scenario in scenarios(args.scale, args.latency, args.bandwidth, codec, not args.no_gzip,
+                              args.gzip_threshold, args.processes):
+        if only is not None and scenario.name not in only:
+            continue
+        result = results[scenario.name] = scenario.measure(args.repeat)
+        line = f'{scenario.name:<12} {result["seconds"]:>10.4f}s {result["per_second"]:>14,.0f}/s'
+        before = (previous or {}).get('results', {}).get(scenario.name)
+        if before and before.get('items') == result['items']:
+            line += f'  x{before["seconds"] / result["seconds"]:.2f} vs {previous.get("revision")}'
+        extra = {key: value for key, value in result.items() if key not in ('seconds', 'items', 'per_second')}
+        print(line, json.dumps(extra) if extra else '')
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': revision(),
+        'python': platform.python_version(),
+        'scale': args.scale,
+        'latency': args.latency,
+        'bandwidth': args.bandwidth,
+        'codec': codec.name,
+        'gzip': not args.no_gzip,
+        'gzip_threshold': args.gzip_threshold,
+        'processes': args.processes,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+    return record
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,247 @@
+import threading
+import time
+from collections import deque
+from queue import Full
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from .Dataclasses import Cell
+from .batch import MAX_BATCH_BYTES
+from .utils import append_row, append_cells_request, fields_of
+
+# defaults of AppendBuffer
+BUFFER_ROWS = 10_000
+FLUSH_ROWS = 1000
+FLUSH_INTERVAL = 1.0
+
+
+class AppendStats(NamedTuple):
+    pushed: int  # rows pushed so far
+    sent: int  # rows appended to the sheet
+    failed: int  # rows of flushes which failed
+    queued: int  # rows waiting to be sent
+    flushes: int
+    rows_per_second: float  # sent rows per second since the first push
+    mean_flush: float  # seconds a flush took on average, i.e. latency of one appendCells batchUpdate
+    max_flush: float
+    blocked: int  # pushes which waited for space in the queue
+    blocked_seconds: float
+
+
+class _Row(NamedTuple):
+    data: dict
+    cells: int
+    size: int
+    fields: frozenset[str]
+
+
+class AppendBuffer:
+    """
+    Rows pushed by many threads, appended to the sheet by a background thread in few appendCells requests
+
+    with sheets.append_buffer(sheet_id) as buffer:
+        for event in events:
+            buffer.push([Cell(value=event.time), Cell(value=event.name)])
+
+    Rows are encoded by the pushing thread and queued. The flusher sends one batchUpdate when flush_rows rows
+    or flush_bytes of JSON are queued, or when the oldest row waited flush_interval seconds, so rows keep
+    their push order. At most max_rows rows are queued, push() blocks until the flusher makes space.
+    A failed flush is passed to on_error(exc, rows) and its rows are dropped, by default the error
+    is raised by the next push(), flush() or close(). Retriable errors are retried by the scheduler first
+    """
+
+    def __init__(self, sheets, sheet_id: int = 0, max_rows: int = BUFFER_ROWS, flush_rows: int = FLUSH_ROWS,
+                 flush_bytes: int = MAX_BATCH_BYTES, flush_interval: float = FLUSH_INTERVAL,
+                 on_error: Optional[Callable[[Exception, list[dict]], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_rows < 1 or flush_rows < 1:
+            raise ValueError('max_rows and flush_rows must be positive')
+        self._sheets = sheets
+        self.sheet_id = sheet_id
+        self.max_rows = max_rows
+        self.flush_rows = min(flush_rows, max_rows)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.on_error = on_error
+        self._clock = clock
+        self._codec = sheets.codec
+        self._queue: deque[tuple[_Row, float]] = deque()
+        self._queued_bytes = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._closed = False
+        self._error: Optional[Exception] = None
+        # rows pushed and rows done (sent or failed), flush() waits for the latter to reach the former
+        self._pushed = 0
+        self._done = 0
+        self._flush_to = 0
+        self._sent = self._failed = self._flushes = self._blocked = 0
+        self._flush_seconds = self._max_flush = self._blocked_seconds = 0.0
+        self._started: Optional[float] = None
+        self._thread = threading.Thread(target=self._run, name='AppendBuffer', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def stats(self) -> AppendStats:
+        with self._lock:
+            elapsed = self._clock() - self._started if self._started is not None else 0.0
+            return AppendStats(
+                self._pushed, self._sent, self._failed, len(self._queue), self._flushes,
+                self._sent / elapsed if elapsed > 0 else 0.0,
+                self._flush_seconds / self._flushes if self._flushes else 0.0, self._max_flush,
+                self._blocked, self._blocked_seconds,
+            )
+
+    def _encode(self, cells: Iterable[Cell]) -> _Row:
+        data, count = append_row(cells)
+        size = len(self._codec.dumps(data))
+        return _Row(data, count, size, frozenset(fields_of(data['values'])))
+
+    def push(self, cells: Iterable[Cell], block: bool = True, timeout: Optional[float] = None):
+        """Queue a row, waiting for space at most timeout seconds (forever if None) unless block is False
+        queue.Full is raised if there is no space in time"""
+        self._put(self._encode(cells), block, timeout)
+
+    def _put(self, row: _Row, block: bool, timeout: Optional[float]):
+        with self._changed:
+            self._raise_error()
+            if self._closed:
+                raise Exception('AppendBuffer is closed')
+            if len(self._queue) >= self.max_rows:
+                if not block:
+                    raise Full
+                started = self._clock()
+                deadline = None if timeout is None else started + timeout
+                while len(self._queue) >= self.max_rows:
+                    remaining = None if deadline is None else deadline - self._clock()
+                    if remaining is not None and remaining <= 0:
+                        raise Full
+                    self._changed.wait(remaining)
+                    self._raise_error()
+                    if self._closed:
+                        raise Exception('AppendBuffer is closed')
+                self._blocked += 1
+                self._blocked_seconds += self._clock() - started
+            now = self._clock()
+            if self._started is None:
+                self._started = now
+            self._queue.append((row, now))
+            self._queued_bytes += row.size
+            self._pushed += 1
+            if len(self._queue) == 1 or len(self._queue) >= self.flush_rows \
+                    or self._queued_bytes >= self.flush_bytes:
+                self._changed.notify_all()
+
+    def push_many(self, rows: Iterable[Iterable[Cell]], timeout: Optional[float] = None):
+        for cells in rows:
+            self.push(cells, timeout=timeout)
+
+    async def push_async(self, cells: Iterable[Cell], timeout: Optional[float] = None):
+        """push() for coroutines, waiting for space in a thread of the event loop's executor"""
+        import asyncio
+        row = self._encode(cells)
+        try:
+            self._put(row, False, None)
+        except Full:
+            await asyncio.get_running_loop().run_in_executor(None, lambda: self._put(row, True, timeout))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Send every row pushed so far and wait for it, False if timeout passed first"""
+        with self._changed:
+            target = self._pushed
+            self._flush_to = max(self._flush_to, target)
+            self._changed.notify_all()
+            deadline = None if timeout is None else self._clock() + timeout
+            while self._done < target:
+                remaining = None if deadline is None else deadline - self._clock()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            self._raise_error()
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush the queued rows and stop the flusher, pushing after close raises"""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        self._thread.join(timeout)
+        with self._changed:
+            self._raise_error()
+
+    def _raise_error(self):
+        # called holding the lock, the error of a flush is raised once
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _due(self) -> bool:
+        if not self._queue:
+            return False
+        return (self._closed or self._done < self._flush_to or len(self._queue) >= self.flush_rows
+                or self._queued_bytes >= self.flush_bytes
+                or self._clock() - self._queue[0][1] >= self.flush_interval)
+
+    def _take(self) -> list[_Row]:
+        rows = []
+        size = 0
+        while self._queue and len(rows) < self.flush_rows:
+            row = self._queue[0][0]
+            if rows and size + row.size > self.flush_bytes:
+                break
+            self._queue.popleft()
+            self._queued_bytes -= row.size
+            size += row.size
+            rows.append(row)
+        return rows
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while not self._due():
+                    if self._closed and not self._queue:
+                        return
+                    wait = None
+                    if self._queue:
+                        wait = max(0.0, self.flush_interval - (self._clock() - self._queue[0][1]))
+                    self._changed.wait(wait)
+                rows = self._take()
+                # producers blocked on a full queue can go on while the rows are sent
+                self._changed.notify_all()
+            self._send(rows)
+
+    def _send(self, rows: list[_Row]):
+        fields = set().union(*(row.fields for row in rows))
+        request = append_cells_request([row.data for row in rows], self.sheet_id, fields)
+        started = self._clock()
+        error = failure = None
+        try:
+            self._sheets._send_batch_update([request])
+        except Exception as exc:
+            error = failure = exc
+        elapsed = self._clock() - started
+        if failure is not None and self.on_error is not None:
+            try:
+                self.on_error(failure, [row.data for row in rows])
+                error = None
+            except Exception as exc:
+                error = exc
+        with self._changed:
+            self._flushes += 1
+            self._flush_seconds += elapsed
+            self._max_flush = max(self._max_flush, elapsed)
+            if failure is None:
+                self._sent += len(rows)
+            else:
+                self._failed += len(rows)
+            if error is not None and self._error is None:
+                self._error = error
+            self._done += len(rows)
+            self._changed.notify_all()
@@ -0,0 +1,163 @@
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, NamedTuple, Optional
+
+from .codec import JsonCodec, get_codec
+
+# fields of Drive v3 files.get every change of a spreadsheet updates
+VERSION_FIELDS = 'version,modifiedTime'
+# default limits of ReadCache
+CACHE_BYTES = 256 * 1024 * 1024
+CACHE_AGE = 7 * 24 * 3600.0
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    spreadsheet_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    version TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored REAL NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (spreadsheet_id, key)
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+'''
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int  # lookups without an entry of the current version, stale ones included
+    stale: int  # lookups which found an entry of an older version
+    checks: int  # versions fetched from Drive
+    evictions: int
+    entries: int
+    bytes: int  # compressed size of stored responses
+
+
+def version_of(file: dict) -> str:
+    """Version key of Drive files.get response with VERSION_FIELDS"""
+    return f'{file.get("version", "")}@{file.get("modifiedTime", "")}'
+
+
+class ReadCache:
+    """
+    Persistent cache of read responses of GoogleSheets, validated by the version of the spreadsheet
+
+    cache = ReadCache('~/.cache/sheets.sqlite')
+    sheets = GoogleSheets(creds, spreadsheet_id, cache=cache)
+
+    Entries are keyed by spreadsheet, kind of the read, range and fields mask and stored with the version
+    of the spreadsheet (Drive version and modifiedTime) they were read at. Before a read the client fetches
+    the version, a small Drive request, and the response is served from the cache if it was stored at
+    that version. Any change of the spreadsheet, by anyone, changes its version.
+    The service account needs read access to Drive metadata of the file, the default scopes give it.
+
+    path: SQLite file shared by processes, ':memory:' for a cache of the process only
+    max_bytes: compressed size of responses above which the least recently used are evicted
+    max_age: seconds after which an entry is evicted, None for no limit
+    version_ttl: seconds a fetched version is trusted for, so a burst of reads checks it once.
+    Writes of clients using the cache forget the version of their spreadsheet
+    """
+
+    def __init__(self, path: str = ':memory:', max_bytes: Optional[int] = CACHE_BYTES,
+                 max_age: Optional[float] = CACHE_AGE, version_ttl: float = 0.0,
+                 codec: str | JsonCodec = 'auto', clock: Callable[[], float] = time.time):
+        if path != ':memory:':
+            import os
+            path = os.path.expanduser(path)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.version_ttl = version_ttl
+        self.codec = get_codec(codec)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+        self._versions: dict[str, tuple[str, float]] = {}
+        self._hits = self._misses = self._stale = self._checks = self._evictions = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+            return CacheStats(self._hits, self._misses, self._stale, self._checks, self._evictions, entries, size)
+
+    def version(self, spreadsheet_id: str, fetch: Callable[[], dict]) -> str:
+        """Current version of the spreadsheet, fetch returns Drive files.get response with VERSION_FIELDS"""
+        if self.version_ttl > 0:
+            known = self._versions.get(spreadsheet_id)
+            if known is not None and self._clock() - known[1] < self.version_ttl:
+                return known[0]
+        version = version_of(fetch())
+        with self._lock:
+            self._checks += 1
+            self._versions[spreadsheet_id] = (version, self._clock())
+        return version
+
+    def forget_version(self, spreadsheet_id: str):
+        self._versions.pop(spreadsheet_id, None)
+
+    def get(self, spreadsheet_id: str, key: str, version: str) -> Optional[Any]:
+        """Response stored at the version, None if there is none"""
+        with self._lock:
+            row = self._db.execute('SELECT version, body, stored FROM responses WHERE spreadsheet_id = ? AND key = ?',
+                                   (spreadsheet_id, key)).fetchone()
+            expired = row is not None and self.max_age is not None and self._clock() - row[2] >= self.max_age
+            if row is None or row[0] != version or expired:
+                self._misses += 1
+                self._stale += row is not None and row[0] != version
+                return None
+            self._hits += 1
+            self._db.execute('UPDATE responses SET used = ? WHERE spreadsheet_id = ? AND key = ?',
+                             (self._clock(), spreadsheet_id, key))
+            body = row[1]
+        return self.codec.load_body(zlib.decompress(body))
+
+    def put(self, spreadsheet_id: str, key: str, version: str, response: Any):
+        """Store the response read at the version, replacing the entry of another version"""
+        body = zlib.compress(self.codec.dumps(response), 1)
+        if self.max_bytes is not None and len(body) > self.max_bytes:
+            return
+        now = self._clock()
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (spreadsheet_id, key, version, body, len(body), now, now))
+            self._evict(now)
+
+    def _evict(self, now: float):
+        evicted = 0
+        if self.max_age is not None:
+            evicted += self._db.execute('DELETE FROM responses WHERE stored <= ?', (now - self.max_age,)).rowcount
+        if self.max_bytes is not None:
+            total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_bytes:
+                # least recently used first, until the rest fits
+                doomed = []
+                for spreadsheet_id, key, size in self._db.execute(
+                        'SELECT spreadsheet_id, key, size FROM responses ORDER BY used'):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((spreadsheet_id, key))
+                    total -= size
+                self._db.executemany('DELETE FROM responses WHERE spreadsheet_id = ? AND key = ?', doomed)
+                evicted += len(doomed)
+        self._evictions += evicted
+
+    def invalidate(self, spreadsheet_id: Optional[str] = None):
+        """Drop entries of the spreadsheet, or all of them"""
+        with self._lock:
+            if spreadsheet_id is None:
+                self._db.execute('DELETE FROM responses')
+                self._versions.clear()
+            else:
+                self._db.execute('DELETE FROM responses WHERE spreadsheet_id = ?', (spreadsheet_id,))
+                self._versions.pop(spreadsheet_id, None)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,122 @@
+import gc
+import gzip
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+# marker of the user agent Google APIs require along with accept-encoding to compress responses
+GZIP_USER_AGENT = '(gzip)'
+# bodies are compressed fast, the level barely changes the size of repetitive JSON of cells
+GZIP_LEVEL = 1
+# bodies from which parsing pauses the garbage collector
+GC_PAUSE_BYTES = 1 << 20
+
+_gc_lock = threading.Lock()
+_gc_pauses = 0
+
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """
+    Pause the cyclic garbage collector, nested and from several threads at once
+    Parsing a response with grid data creates millions of dicts and lists, every few hundreds of them
+    trigger a collection which traverses the ones created so far, so parsing takes about 3 times longer.
+    Parsed JSON has no reference cycles, so nothing collectable is missed
+    """
+    global _gc_pauses
+    with _gc_lock:
+        # when the application disabled it, it is not ours to enable
+        paused = _gc_pauses > 0 or gc.isenabled()
+        if paused:
+            _gc_pauses += 1
+            gc.disable()
+    try:
+        yield
+    finally:
+        if paused:
+            with _gc_lock:
+                _gc_pauses -= 1
+                if _gc_pauses == 0:
+                    gc.enable()
+
+
+class JsonCodec:
+    """JSON of the standard library, compact and with UTF-8 kept as is"""
+    name = 'json'
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    def loads(self, data: bytes | str) -> Any:
+        # json detects the encoding of bytes itself, so the body is not decoded to str first
+        return json.loads(data)
+
+    def load_body(self, body: bytes | str) -> Any:
+        """loads() of a response body, large ones are parsed with the garbage collector paused"""
+        if len(body) < GC_PAUSE_BYTES:
+            return self.loads(body)
+        with gc_paused():
+            return self.loads(body)
+
+
+class OrjsonCodec(JsonCodec):
+    """orjson, several times faster than json for both ways, requires google_spreadsheets[orjson]"""
+    name = 'orjson'
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError('OrjsonCodec requires orjson, install google_spreadsheets[orjson]') from None
+        self.dumps = orjson.dumps
+        self.loads = orjson.loads
+
+
+class Body(dict):
+    """
+    Request body for methods of googleapiclient services
+    They cast every argument to str for query parameters and throw the result away for the body,
+    which for a plain dict means repr() of every request, slower than serializing the body to JSON
+    """
+
+    def __str__(self):
+        return f'<Body of {len(self)} keys>'
+
+
+class EncodedBody(Body):
+    """Request body already serialized to JSON, sent by SheetsModel as it is"""
+
+    def __init__(self, data: bytes):
+        super().__init__()
+        self.data = data
+
+    def __str__(self):
+        return f'<EncodedBody of {len(self.data)} bytes>'
+
+
+CODECS = {'json': JsonCodec, 'orjson': OrjsonCodec}
+_codecs: dict[str, JsonCodec] = {}
+
+
+def get_codec(codec: str | JsonCodec = 'auto') -> JsonCodec:
+    """Codec by name, 'auto' is orjson when it is installed and json otherwise"""
+    if isinstance(codec, JsonCodec):
+        return codec
+    if codec == 'auto':
+        try:
+            return get_codec('orjson')
+        except ImportError:
+            return get_codec('json')
+    if codec not in _codecs:
+        if codec not in CODECS:
+            raise ValueError(f'Unknown JSON codec {codec!r}, expected one of {", ".join(CODECS)} or auto')
+        _codecs[codec] = CODECS[codec]()
+    return _codecs[codec]
+
+
+def gzip_body(body: bytes, threshold: Optional[int]) -> Optional[bytes]:
+    """Compressed body when it has at least threshold bytes, None when it is sent as it is"""
+    if threshold is None or len(body) < threshold:
+        return None
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
@@ -0,0 +1,926 @@
+import copy
+import datetime
+import gzip
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Iterable, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from . import a1
+from .codec import GZIP_LEVEL, GZIP_USER_AGENT, get_codec
+from .scheduler import RequestScheduler
+from .transport import HttpPool
+
+# strings parsed as numbers by USER_ENTERED
+_NUMBER = re.compile(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?')
+DEFAULT_ROWS = 1000
+DEFAULT_COLUMNS = 26
+# requests per minute of a client of the emulator, high enough to never wait
+UNLIMITED = 10 ** 9
+
+_ROUTES = [
+    ('POST', re.compile(r'^/v4/spreadsheets$'), 'spreadsheets.create'),
+    ('GET', re.compile(r'^/v4/spreadsheets/([^/:]+)$'), 'spreadsheets.get'),
+    ('POST', re.compile(r'^/v4/spreadsheets/([^/:]+):batchUpdate$'), 'spreadsheets.batchUpdate'),
+    ('POST', re.compile(r'^/v4/spreadsheets/([^/:]+)/values:batchUpdate$'), 'spreadsheets.values.batchUpdate'),
+    ('GET', re.compile(r'^/v4/spreadsheets/([^/:]+)/values:batchGet$'), 'spreadsheets.values.batchGet'),
+    ('POST', re.compile(r'^/v4/spreadsheets/([^/:]+)/values/(.+):append$'), 'spreadsheets.values.append'),
+    ('POST', re.compile(r'^/v4/spreadsheets/([^/:]+)/values/(.+):clear$'), 'spreadsheets.values.clear'),
+    ('GET', re.compile(r'^/v4/spreadsheets/([^/:]+)/values/(.+)$'), 'spreadsheets.values.get'),
+    ('PUT', re.compile(r'^/v4/spreadsheets/([^/:]+)/values/(.+)$'), 'spreadsheets.values.update'),
+    ('POST', re.compile(r'^/v4/spreadsheets/([^/:]+)/sheets/(\d+):copyTo$'), 'spreadsheets.sheets.copyTo'),
+    ('GET', re.compile(r'^/drive/v2/files$'), 'drive.files.list'),
+    ('GET', re.compile(r'^/drive/v3/files/([^/]+)$'), 'drive.files.get'),
+]
+# writes which do not change the spreadsheet of their path, copyTo changes the destination
+_NOT_TOUCHING = frozenset({'spreadsheets.create', 'spreadsheets.sheets.copyTo'})
+_STATUSES = {
+    200: ('OK', 'OK'), 400: ('Bad Request', 'INVALID_ARGUMENT'), 403: ('Forbidden', 'PERMISSION_DENIED'),
+    404: ('Not Found', 'NOT_FOUND'), 429: ('Too Many Requests', 'RESOURCE_EXHAUSTED'),
+    500: ('Internal Server Error', 'INTERNAL'), 503: ('Service Unavailable', 'UNAVAILABLE'),
+}
+
+
+class EmulatorResponse(dict):
+    """Headers of a response with status and reason, mimics httplib2.Response"""
+
+    def __init__(self, status: int, headers: Optional[dict] = None):
+        super().__init__(headers or {})
+        self['status'] = str(status)
+        self.status = status
+        self.reason = _STATUSES.get(status, ('Error', 'UNKNOWN'))[0]
+
+
+class ApiError(Exception):
+    """Error answered by the emulator instead of a result"""
+
+    def __init__(self, status: int, message: str, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class EmulatorCredentials:
+    """Credentials which leave the Http as it is, the emulator does not check tokens"""
+    service_account_email = 'emulator@localhost'
+
+    def authorize(self, http):
+        return http
+
+
+class Fault:
+    """Error answered to the next times requests of the route (all routes if None)
+    status None drops the connection instead of answering"""
+
+    def __init__(self, status: Optional[int], times: int = 1, route: Optional[str] = None,
+                 message: str = 'Injected error', retry_after: Optional[float] = None):
+        self.status = status
+        self.times = times
+        self.route = route
+        self.message = message
+        self.retry_after = retry_after
+
+
+def parse_fields(mask: str) -> Optional[dict]:
+    """Tree of a fields mask of a partial response, 'a.b,c(d,e)' -> {'a': {'b': None}, 'c': {'d': None, 'e': None}}
+    None means the whole object"""
+    mask = mask.replace(' ', '')
+    tree, pos = _parse_fields(mask, 0)
+    if pos != len(mask):
+        raise ApiError(400, f'Invalid field selection {mask!r}')
+    return tree
+
+
+_FIELD = re.compile(r'[\w*]+(?:\.[\w*]+)*')
+
+
+def _parse_fields(mask: str, pos: int) -> tuple[Optional[dict], int]:
+    tree: Optional[dict] = {}
+    while pos < len(mask) and mask[pos] != ')':
+        match = _FIELD.match(mask, pos)
+        if match is None:
+            raise ApiError(400, f'Invalid field selection {mask!r}')
+        pos = match.end()
+        sub = None
+        if pos < len(mask) and mask[pos] == '(':
+            sub, pos = _parse_fields(mask, pos + 1)
+            if pos >= len(mask):
+                raise ApiError(400, f'Invalid field selection {mask!r}')
+            pos += 1
+        keys = match.group().split('.')
+        for key in reversed(keys[1:]):
+            sub = None if key == '*' else {key: sub}
+        tree = None if keys[0] == '*' else _merge_fields(tree, {keys[0]: sub})
+        if pos < len(mask) and mask[pos] == ',':
+            pos += 1
+    return tree, pos
+
+
+def _merge_fields(left: Optional[dict], right: Optional[dict]) -> Optional[dict]:
+    if left is None or right is None:
+        return None
+    merged = dict(left)
+    for key, sub in right.items():
+        merged[key] = _merge_fields(merged[key], sub) if key in merged else sub
+    return merged
+
+
+def select_fields(obj: Any, tree: Optional[dict]) -> Any:
+    """Part of obj selected by a tree of parse_fields"""
+    if tree is None:
+        return obj
+    if isinstance(obj, list):
+        return [select_fields(item, tree) for item in obj]
+    if isinstance(obj, dict):
+        return {key: select_fields(obj[key], sub) for key, sub in tree.items() if key in obj}
+    return obj
+
+
+def _get_path(data: dict, keys: list[str]) -> tuple[bool, Any]:
+    for key in keys:
+        if not isinstance(data, dict) or key not in data:
+            return False, None
+        data = data[key]
+    return True, data
+
+
+def apply_mask(target: dict, source: dict, fields: str) -> dict:
+    """target updated by source under a fields mask of a request: paths present in source are set,
+    missing ones are cleared. '*' replaces the whole object"""
+    if fields.strip() == '*':
+        return copy.deepcopy(source)
+    for path in (path.strip() for path in fields.split(',')):
+        if not path:
+            continue
+        keys = path.split('.')
+        present, value = _get_path(source, keys)
+        if present:
+            node = target
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+            node[keys[-1]] = copy.deepcopy(value)
+            continue
+        parents = [target]
+        for key in keys[:-1]:
+            if not isinstance(parents[-1].get(key), dict):
+                break
+            parents.append(parents[-1][key])
+        else:
+            parents[-1].pop(keys[-1], None)
+            for node, key in zip(reversed(parents[:-1]), reversed(keys[:-1])):
+                if node[key]:
+                    break
+                del node[key]
+    return target
+
+
+def _number_text(value: float) -> str:
+    return str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+
+
+class _Sheet:
+    __slots__ = ('properties', 'cells', 'merges')
+
+    def __init__(self, properties: dict):
+        self.properties = properties
+        # row index -> column index -> CellData
+        self.cells: dict[int, dict[int, dict]] = {}
+        self.merges: list[dict] = []
+
+    @property
+    def id(self) -> int:
+        return self.properties['sheetId']
+
+    @property
+    def rows(self) -> int:
+        return self.properties['gridProperties']['rowCount']
+
+    @property
+    def columns(self) -> int:
+        return self.properties['gridProperties']['columnCount']
+
+    def resize(self, rows: Optional[int] = None, columns: Optional[int] = None):
+        grid = self.properties['gridProperties']
+        if rows is not None:
+            grid['rowCount'] = rows
+        if columns is not None:
+            grid['columnCount'] = columns
+
+    def last_row(self) -> int:
+        """Index of the last row holding any data, -1 for an empty sheet"""
+        return max((row for row, cells in self.cells.items() if cells), default=-1)
+
+    def check(self, row: int, col: int):
+        if row >= self.rows or col >= self.columns:
+            raise ApiError(400, f'Range ({self.properties["title"]}!{a1.to_name(col, row)}) exceeds grid limits. '
+                                f'Max rows: {self.rows}, max columns: {self.columns}')
+
+    def write(self, row: int, col: int, data: dict, fields: str):
+        cells = self.cells.setdefault(row, {})
+        cell = apply_mask(cells.get(col, {}), data, fields)
+        if cell:
+            cells[col] = cell
+        else:
+            cells.pop(col, None)
+
+
+class _Spreadsheet:
+    def __init__(self, spreadsheet_id: str, title: str):
+        self.id = spreadsheet_id
+        self.properties = {'title': title, 'locale': 'en_US', 'timeZone': 'Etc/GMT'}
+        self.sheets: list[_Sheet] = []
+        self._next_id = 0
+        self.version = 1
+        self.modified_time = _now()
+
+    def touch(self):
+        """Record a change as Drive does for every change of the file"""
+        self.version += 1
+        self.modified_time = _now()
+
+    def add_sheet(self, properties: Optional[dict] = None) -> _Sheet:
+        properties = copy.deepcopy(properties or {})
+        if 'sheetId' not in properties:
+            self._next_id = max([self._next_id] + [sheet.id + 1 for sheet in self.sheets])
+            properties['sheetId'] = self._next_id
+        elif any(sheet.id == properties['sheetId'] for sheet in self.sheets):
+            raise ApiError(400, f'Sheet with id {properties["sheetId"]} already exists')
+        properties.setdefault('title', f'Sheet{len(self.sheets) + 1}')
+        if any(sheet.properties['title'] == properties['title'] for sheet in self.sheets):
+            raise ApiError(400, f'A sheet with the name "{properties["title"]}" already exists. '
+                                f'Please enter another name.')
+        properties.setdefault('index', len(self.sheets))
+        properties.setdefault('sheetType', 'GRID')
+        grid = properties.setdefault('gridProperties', {})
+        grid.setdefault('rowCount', DEFAULT_ROWS)
+        grid.setdefault('columnCount', DEFAULT_COLUMNS)
+        sheet = _Sheet(properties)
+        self.sheets.insert(min(properties['index'], len(self.sheets)), sheet)
+        self._reindex()
+        return sheet
+
+    def _reindex(self):
+        for idx, sheet in enumerate(self.sheets):
+            sheet.properties['index'] = idx
+
+    def sheet(self, sheet_id: Optional[int] = None, title: Optional[str] = None) -> _Sheet:
+        for sheet in self.sheets:
+            if sheet_id is not None and sheet.id == sheet_id or title is not None and sheet.properties['title'] == title:
+                return sheet
+        if title is not None:
+            raise ApiError(400, f'Unable to parse range: {title}')
+        raise ApiError(400, f'No grid with id: {sheet_id}')
+
+    def parse_range(self, range_: str, clamp: bool = True) -> tuple[_Sheet, int, int, int, int]:
+        """Sheet and [row, col, end_row, end_col) of an A1 range, open ends go to the edge of the grid"""
+        title, _, cells = range_.rpartition('!')
+        if not title:
+            title, cells = cells, ''
+            if not any(sheet.properties['title'] == title for sheet in self.sheets):
+                # a range without a sheet refers to the first sheet
+                title, cells = self.sheets[0].properties['title'], range_
+        if len(title) > 1 and title[0] == title[-1] == "'":
+            title = title[1:-1].replace("''", "'")
+        sheet = self.sheet(title=title)
+        start, _, end = cells.partition(':')
+        try:
+            col, row = a1.split_name(start.upper()) if start else (None, None)
+            end_col, end_row = a1.split_name(end.upper()) if end else (col, row) if start else (None, None)
+            col = a1.letters_to_column(col) if col else 0
+            row = row - 1 if row else 0
+            end_col = a1.letters_to_column(end_col) + 1 if end_col else sheet.columns
+            end_row = end_row if end_row else sheet.rows
+        except ValueError:
+            raise ApiError(400, f'Unable to parse range: {range_}') from None
+        if clamp:
+            end_row = min(end_row, sheet.rows)
+            end_col = min(end_col, sheet.columns)
+        return sheet, row, col, end_row, end_col
+
+    def range_name(self, sheet: _Sheet, row: int, col: int, end_row: int, end_col: int) -> str:
+        title = sheet.properties['title']
+        if not re.fullmatch(r'\w+', title):
+            title = "'{0}'".format(title.replace("'", "''"))
+        return f'{title}!{a1.to_name(col, row)}:{a1.to_name(end_col - 1, end_row - 1)}'
+
+
+class SheetsEmulator:
+    """
+    In-process stand-in for the part of Sheets v4 REST API used by GoogleSheets, for tests and benchmarks
+
+    emulator = SheetsEmulator(latency=0.05)
+    sheets = emulator.client(emulator.create('Report'))
+
+    It plugs in at the HTTP layer: the emulator has httplib2.Http's request(), so requests built by
+    googleapiclient are answered with the JSON the API would answer. Supported: spreadsheets.create/get
+    (ranges, includeGridData, fields), batchUpdate with addSheet, deleteSheet, duplicateSheet,
+    updateSheetProperties, updateCells, appendCells, appendDimension, insertDimension, deleteDimension,
+    insertRange, mergeCells, unmergeCells, values get/batchGet/update/batchUpdate/append/clear, sheets.copyTo
+    and Drive v3 files.get with version and modifiedTime, which change on every write.
+    Formulas are stored but not evaluated. Requests of one batchUpdate are applied one by one,
+    so unlike the API a failing request leaves the earlier ones applied.
+
+    latency: seconds added to every request, bandwidth: bytes per second of request and response bodies
+    as they are sent, i.e. compressed when gzip is on: request bodies with content-encoding gzip are accepted
+    and responses are compressed for clients asking for it as the API does (accept-encoding and '(gzip)' in
+    user agent), then decompressed as httplib2 would do. Bodies are parsed and built by the fastest codec
+    reads_per_minute, writes_per_minute: quotas answered with 429 when exceeded, None for no limit
+    error_rate: share of requests failing with 503, random with the given seed
+    Faults for particular requests are added by inject()
+    """
+
+    def __init__(self, latency: float = 0.0, bandwidth: Optional[float] = None,
+                 reads_per_minute: Optional[int] = None, writes_per_minute: Optional[int] = None,
+                 error_rate: float = 0.0, seed: Optional[int] = None, gzip: bool = True,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], Any] = time.sleep):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.quotas = {'read': reads_per_minute, 'write': writes_per_minute}
+        self.error_rate = error_rate
+        self.gzip = gzip
+        self._codec = get_codec()
+        import random
+        self._random = random.Random(seed)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.RLock()
+        self._spreadsheets: dict[str, _Spreadsheet] = {}
+        self._calls: dict[str, deque] = {'read': deque(), 'write': deque()}
+        self._faults: list[Fault] = []
+        self._created = 0
+        self.routes: Counter = Counter()
+        self.stats: Counter = Counter()
+
+    def reset_stats(self):
+        with self._lock:
+            self.routes.clear()
+            self.stats.clear()
+
+    def create(self, title: str = 'Untitled spreadsheet', sheets: Iterable[str] = ('Sheet1',),
+               rows: int = DEFAULT_ROWS, columns: int = DEFAULT_COLUMNS) -> str:
+        """Create a spreadsheet directly, return its id"""
+        with self._lock:
+            spreadsheet = self._new_spreadsheet(title)
+            for idx, sheet_title in enumerate(sheets):
+                spreadsheet.add_sheet({'sheetId': idx, 'title': sheet_title,
+                                       'gridProperties': {'rowCount': rows, 'columnCount': columns}})
+            return spreadsheet.id
+
+    def _new_spreadsheet(self, title: str) -> _Spreadsheet:
+        self._created += 1
+        spreadsheet = _Spreadsheet(f'emulated-{self._created:06d}', title)
+        self._spreadsheets[spreadsheet.id] = spreadsheet
+        return spreadsheet
+
+    def inject(self, status: Optional[int], times: int = 1, route: Optional[str] = None,
+               message: str = 'Injected error', retry_after: Optional[float] = None) -> Fault:
+        """Answer the next times requests of the route, e.g. 'spreadsheets.batchUpdate', with an error"""
+        fault = Fault(status, times, route, message, retry_after)
+        with self._lock:
+            self._faults.append(fault)
+        return fault
+
+    def transport(self) -> HttpPool:
+        """HttpPool whose every thread talks to the emulator"""
+        return HttpPool(EmulatorCredentials(), http_factory=lambda: self)
+
+    def client(self, spreadsheet_id: str, scheduler: Optional[RequestScheduler] = None, **kwargs):
+        """GoogleSheets talking to the emulator, by default with a scheduler which never waits for tokens"""
+        from .api import GoogleSheets
+        if scheduler is None:
+            scheduler = RequestScheduler(UNLIMITED, UNLIMITED, base_delay=0.01, max_delay=0.1)
+        return GoogleSheets({'client_email': EmulatorCredentials.service_account_email}, spreadsheet_id,
+                            scheduler=scheduler, transport=self.transport(), **kwargs)
+
+    def pool(self, scheduler: Optional[RequestScheduler] = None, **kwargs):
+        """SheetsClientPool talking to the emulator, by default with a scheduler which never waits for tokens"""
+        from .pool import SheetsClientPool
+        if scheduler is None:
+            scheduler = RequestScheduler(UNLIMITED, UNLIMITED, base_delay=0.01, max_delay=0.1)
+        return SheetsClientPool({'client_email': EmulatorCredentials.service_account_email},
+                                scheduler=scheduler, transport=self.transport(), **kwargs)
+
+    def request(self, uri: str, method: str = 'GET', body: Optional[str | bytes] = None,
+                headers: Optional[dict] = None, redirections: int = 5, connection_type=None) \
+            -> tuple[EmulatorResponse, bytes]:
+        """httplib2.Http.request answered by the emulator"""
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        parts = urlsplit(uri)
+        query = parts.query
+        if 'x-http-method-override' in headers:
+            method, query, body = headers['x-http-method-override'], body or '', None
+        if isinstance(query, bytes):
+            query = query.decode('utf-8')
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        sent = len(body or b'')
+        if body and headers.get('content-encoding') == 'gzip':
+            body = gzip.decompress(body)
+        params = parse_qs(query, keep_blank_values=True)
+        path = unquote(parts.path)
+        if path.startswith('/sheets/'):
+            path = path[len('/sheets'):]
+        route, args = self._route(method, path)
+        kind = 'read' if method == 'GET' else 'write'
+
+        delay = self.latency
+        if self.bandwidth:
+            delay += sent / self.bandwidth
+        status = 200
+        response_headers = {'content-type': 'application/json; charset=UTF-8'}
+        try:
+            self._admit(route, kind)
+            with self._lock:
+                try:
+                    result = getattr(self, '_' + route.replace('.', '_'))(
+                        params, self._codec.loads(body) if body else {}, *args)
+                finally:
+                    # requests of batchUpdate are applied one by one, so a failed one may have changed something
+                    if kind == 'write' and route not in _NOT_TOUCHING and args and args[0] in self._spreadsheets:
+                        self._spreadsheets[args[0]].touch()
+        except ApiError as exc:
+            status = exc.status
+            response_headers.update(exc.headers)
+            result = {'error': {'code': status, 'message': exc.message,
+                                'status': _STATUSES.get(status, ('', 'UNKNOWN'))[1]}}
+        if status == 200 and 'fields' in params:
+            result = select_fields(result, parse_fields(','.join(params['fields'])))
+        content = self._codec.dumps(result)
+        received = len(content)
+        if self.gzip and 'gzip' in headers.get('accept-encoding', '') \
+                and GZIP_USER_AGENT in headers.get('user-agent', ''):
+            encoded = gzip.compress(content, compresslevel=GZIP_LEVEL)
+            received = len(encoded)
+            # httplib2 decompresses the body and keeps the original header under this name
+            content = gzip.decompress(encoded)
+            response_headers['-content-encoding'] = 'gzip'
+        if self.bandwidth:
+            delay += received / self.bandwidth
+        with self._lock:
+            self.routes[route] += 1
+            self.stats['requests'] += 1
+            self.stats['request_bytes'] += sent
+            self.stats['response_bytes'] += received
+            if status >= 300:
+                self.stats['errors'] += 1
+        if delay > 0:
+            self._sleep(delay)
+        return EmulatorResponse(status, response_headers), content
+
+    def _route(self, method: str, path: str) -> tuple[str, tuple]:
+        for route_method, pattern, route in _ROUTES:
+            match = pattern.match(path)
+            if match is not None and route_method == method:
+                return route, match.groups()
+        raise ApiError(404, f'{method} {path} is not emulated')
+
+    def _admit(self, route: str, kind: str):
+        with self._lock:
+            for fault in self._faults:
+                if fault.times > 0 and fault.route in (None, route):
+                    fault.times -= 1
+                    self._faults = [fault for fault in self._faults if fault.times > 0]
+                    if fault.status is None:
+                        raise ConnectionResetError(fault.message)
+                    headers = {'retry-after': str(fault.retry_after)} if fault.retry_after is not None else {}
+                    raise ApiError(fault.status, fault.message, headers)
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise ApiError(503, 'The service is currently unavailable.')
+            limit = self.quotas[kind]
+            if limit is not None:
+                now = self._clock()
+                calls = self._calls[kind]
+                while calls and now - calls[0] >= 60:
+                    calls.popleft()
+                if len(calls) >= limit:
+                    raise ApiError(429, f"Quota exceeded for quota metric '{kind.capitalize()} requests' "
+                                        f"and limit '{kind.capitalize()} requests per minute per user'")
+                calls.append(now)
+
+    def _spreadsheet(self, spreadsheet_id: str) -> _Spreadsheet:
+        try:
+            return self._spreadsheets[spreadsheet_id]
+        except KeyError:
+            raise ApiError(404, 'Requested entity was not found.') from None
+
+    # spreadsheets
+
+    def _spreadsheets_create(self, params: dict, body: dict) -> dict:
+        spreadsheet = self._new_spreadsheet(body.get('properties', {}).get('title', 'Untitled spreadsheet'))
+        for sheet in body.get('sheets') or [{'properties': {'sheetId': 0, 'title': 'Sheet1'}}]:
+            spreadsheet.add_sheet(sheet.get('properties'))
+        return self._resource(spreadsheet, None, False)
+
+    def _spreadsheets_get(self, params: dict, body: dict, spreadsheet_id: str) -> dict:
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        include = params.get('includeGridData', ['false'])[0] == 'true'
+        return self._resource(spreadsheet, params.get('ranges'), include)
+
+    def _resource(self, spreadsheet: _Spreadsheet, ranges: Optional[list[str]], include: bool) -> dict:
+        sheets = []
+        if ranges:
+            grids: dict[int, list] = {}
+            for range_ in ranges:
+                sheet, row, col, end_row, end_col = spreadsheet.parse_range(range_)
+                grids.setdefault(sheet.id, []).append((row, col, end_row, end_col))
+            selected = [(sheet, grids[sheet.id]) for sheet in spreadsheet.sheets if sheet.id in grids]
+        else:
+            selected = [(sheet, [(0, 0, sheet.rows, sheet.columns)]) for sheet in spreadsheet.sheets]
+        for sheet, areas in selected:
+            resource = {'properties': copy.deepcopy(sheet.properties)}
+            if include:
+                resource['data'] = [self._grid_data(sheet, *area) for area in areas]
+            if sheet.merges:
+                resource['merges'] = copy.deepcopy(sheet.merges)
+            sheets.append(resource)
+        return {
+            'spreadsheetId': spreadsheet.id,
+            'properties': copy.deepcopy(spreadsheet.properties),
+            'sheets': sheets,
+            'spreadsheetUrl': f'https://docs.google.com/spreadsheets/d/{spreadsheet.id}/edit',
+        }
+
+    @staticmethod
+    def _grid_data(sheet: _Sheet, row: int, col: int, end_row: int, end_col: int) -> dict:
+        rows = []
+        for row_idx in range(row, end_row):
+            cells = sheet.cells.get(row_idx)
+            values = []
+            if cells:
+                last = max((idx for idx in cells if col <= idx < end_col), default=col - 1)
+                values = [_cell_data(cells.get(col_idx)) for col_idx in range(col, last + 1)]
+            rows.append({'values': values} if values else {})
+        while rows and not rows[-1]:
+            rows.pop()
+        grid = {'rowData': rows} if rows else {}
+        # zero offsets are omitted like all default values of the API
+        if row:
+            grid['startRow'] = row
+        if col:
+            grid['startColumn'] = col
+        return grid
+
+    def _spreadsheets_batchUpdate(self, params: dict, body: dict, spreadsheet_id: str) -> dict:
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        replies = []
+        for request in body.get('requests', []):
+            if len(request) != 1:
+                raise ApiError(400, 'Every request must set exactly one kind of request')
+            (kind, item), = request.items()
+            handler = getattr(self, f'_request_{kind}', None)
+            if handler is None:
+                raise ApiError(400, f'Request {kind!r} is not emulated')
+            replies.append(handler(spreadsheet, item) or {})
+        return {'spreadsheetId': spreadsheet.id, 'replies': replies}
+
+    def _request_addSheet(self, spreadsheet: _Spreadsheet, item: dict) -> dict:
+        sheet = spreadsheet.add_sheet(item.get('properties'))
+        return {'addSheet': {'properties': copy.deepcopy(sheet.properties)}}
+
+    def _request_deleteSheet(self, spreadsheet: _Spreadsheet, item: dict):
+        sheet = spreadsheet.sheet(item['sheetId'])
+        if len(spreadsheet.sheets) == 1:
+            raise ApiError(400, 'You can\'t remove all the sheets in a document.')
+        spreadsheet.sheets.remove(sheet)
+        spreadsheet._reindex()
+
+    def _request_duplicateSheet(self, spreadsheet: _Spreadsheet, item: dict) -> dict:
+        source = spreadsheet.sheet(item['sourceSheetId'])
+        properties = copy.deepcopy(source.properties)
+        properties.pop('sheetId')
+        if 'newSheetId' in item:
+            properties['sheetId'] = item['newSheetId']
+        properties['title'] = item.get('newSheetName') or f'Copy of {source.properties["title"]}'
+        properties['index'] = item.get('insertSheetIndex', len(spreadsheet.sheets))
+        sheet = spreadsheet.add_sheet(properties)
+        sheet.cells = copy.deepcopy(source.cells)
+        sheet.merges = [dict(merge, sheetId=sheet.id) for merge in source.merges]
+        return {'duplicateSheet': {'properties': copy.deepcopy(sheet.properties)}}
+
+    def _request_updateSheetProperties(self, spreadsheet: _Spreadsheet, item: dict):
+        properties = item['properties']
+        sheet = spreadsheet.sheet(properties.get('sheetId', 0))
+        apply_mask(sheet.properties, properties, item['fields'])
+        sheet.properties['sheetId'] = sheet.id
+
+    def _request_updateCells(self, spreadsheet: _Spreadsheet, item: dict):
+        fields = item.get('fields')
+        if not fields:
+            raise ApiError(400, 'At least one field must be updated')
+        rows = item.get('rows', [])
+        if 'start' in item:
+            start = item['start']
+            sheet = spreadsheet.sheet(start.get('sheetId', 0))
+            row, col = start.get('rowIndex', 0), start.get('columnIndex', 0)
+            for row_idx, row_data in enumerate(rows, row):
+                values = row_data.get('values', [])
+                if values:
+                    sheet.check(row_idx, col + len(values) - 1)
+                for col_idx, data in enumerate(values, col):
+                    sheet.write(row_idx, col_idx, data, fields)
+            return
+        sheet, row, col, end_row, end_col = _grid_range(spreadsheet, item['range'])
+        sheet.check(end_row - 1, end_col - 1)
+        for row_idx in range(row, end_row):
+            values = rows[row_idx - row].get('values', []) if row_idx - row < len(rows) else []
+            for col_idx in range(col, end_col):
+                # cells of the range not covered by rows are cleared
+                data = values[col_idx - col] if col_idx - col < len(values) else {}
+                sheet.write(row_idx, col_idx, data, fields)
+
+    def _request_appendCells(self, spreadsheet: _Spreadsheet, item: dict):
+        sheet = spreadsheet.sheet(item.get('sheetId', 0))
+        fields = item.get('fields')
+        if not fields:
+            raise ApiError(400, 'At least one field must be updated')
+        row = sheet.last_row() + 1
+        rows = item.get('rows', [])
+        width = max((len(row_data.get('values', [])) for row_data in rows), default=0)
+        sheet.resize(rows=max(sheet.rows, row + len(rows)), columns=max(sheet.columns, width))
+        for row_idx, row_data in enumerate(rows, row):
+            for col_idx, data in enumerate(row_data.get('values', [])):
+                sheet.write(row_idx, col_idx, data, fields)
+
+    def _request_appendDimension(self, spreadsheet: _Spreadsheet, item: dict):
+        sheet = spreadsheet.sheet(item['sheetId'])
+        if item['dimension'] == 'ROWS':
+            sheet.resize(rows=sheet.rows + item['length'])
+        elif item['dimension'] == 'COLUMNS':
+            sheet.resize(columns=sheet.columns + item['length'])
+        else:
+            raise ApiError(400, 'dimension must be ROWS or COLUMNS')
+
+    def _request_insertDimension(self, spreadsheet: _Spreadsheet, item: dict):
+        dimension = item['range']
+        sheet = spreadsheet.sheet(dimension.get('sheetId', 0))
+        start, end = dimension.get('startIndex', 0), dimension['endIndex']
+        _shift(sheet, dimension['dimension'], start, end - start)
+
+    def _request_deleteDimension(self, spreadsheet: _Spreadsheet, item: dict):
+        dimension = item['range']
+        sheet = spreadsheet.sheet(dimension.get('sheetId', 0))
+        start, end = dimension.get('startIndex', 0), dimension['endIndex']
+        _shift(sheet, dimension['dimension'], end, start - end)
+
+    def _request_insertRange(self, spreadsheet: _Spreadsheet, item: dict):
+        sheet, row, col, end_row, end_col = _grid_range(spreadsheet, item['range'])
+        if item['shiftDimension'] == 'ROWS':
+            length = end_row - row
+            for row_idx in sorted((idx for idx in sheet.cells if idx >= row), reverse=True):
+                cells = sheet.cells[row_idx]
+                moved = {col_idx: cells.pop(col_idx) for col_idx in list(cells) if col <= col_idx < end_col}
+                if moved:
+                    sheet.cells.setdefault(row_idx + length, {}).update(moved)
+            sheet.resize(rows=sheet.rows + length)
+        elif item['shiftDimension'] == 'COLUMNS':
+            length = end_col - col
+            for row_idx in range(row, end_row):
+                cells = sheet.cells.get(row_idx, {})
+                sheet.cells[row_idx] = {idx + length if idx >= col else idx: data for idx, data in cells.items()}
+            sheet.resize(columns=sheet.columns + length)
+        else:
+            raise ApiError(400, 'shiftDimension must be ROWS or COLUMNS')
+
+    def _request_mergeCells(self, spreadsheet: _Spreadsheet, item: dict):
+        sheet, row, col, end_row, end_col = _grid_range(spreadsheet, item['range'])
+        sheet.check(end_row - 1, end_col - 1)
+        for merge in sheet.merges:
+            if merge['startRowIndex'] < end_row and row < merge['endRowIndex'] \
+                    and merge['startColumnIndex'] < end_col and col < merge['endColumnIndex']:
+                raise ApiError(400, 'You can\'t merge cells which are already merged.')
+        sheet.merges.append({'sheetId': sheet.id, 'startRowIndex': row, 'endRowIndex': end_row,
+                             'startColumnIndex': col, 'endColumnIndex': end_col})
+
+    def _request_unmergeCells(self, spreadsheet: _Spreadsheet, item: dict):
+        sheet, row, col, end_row, end_col = _grid_range(spreadsheet, item['range'])
+        sheet.merges = [
+            merge for merge in sheet.merges
+            if not (merge['startRowIndex'] < end_row and row < merge['endRowIndex']
+                    and merge['startColumnIndex'] < end_col and col < merge['endColumnIndex'])
+        ]
+
+    def _spreadsheets_sheets_copyTo(self, params: dict, body: dict, spreadsheet_id: str, sheet_id: str) -> dict:
+        source = self._spreadsheet(spreadsheet_id).sheet(int(sheet_id))
+        destination = self._spreadsheet(body.get('destinationSpreadsheetId', ''))
+        properties = copy.deepcopy(source.properties)
+        properties.pop('sheetId')
+        properties.pop('index')
+        title = f'Copy of {source.properties["title"]}'
+        copies = 1
+        while any(sheet.properties['title'] == title for sheet in destination.sheets):
+            copies += 1
+            title = f'Copy {copies} of {source.properties["title"]}'
+        properties['title'] = title
+        sheet = destination.add_sheet(properties)
+        sheet.cells = copy.deepcopy(source.cells)
+        sheet.merges = [dict(merge, sheetId=sheet.id) for merge in source.merges]
+        destination.touch()
+        return copy.deepcopy(sheet.properties)
+
+    # values
+
+    def _spreadsheets_values_get(self, params: dict, body: dict, spreadsheet_id: str, range_: str) -> dict:
+        return self._value_range(self._spreadsheet(spreadsheet_id), range_, params)
+
+    def _spreadsheets_values_batchGet(self, params: dict, body: dict, spreadsheet_id: str) -> dict:
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        return {
+            'spreadsheetId': spreadsheet.id,
+            'valueRanges': [self._value_range(spreadsheet, range_, params) for range_ in params.get('ranges', [])],
+        }
+
+    def _value_range(self, spreadsheet: _Spreadsheet, range_: str, params: dict) -> dict:
+        sheet, row, col, end_row, end_col = spreadsheet.parse_range(range_)
+        major = params.get('majorDimension', ['ROWS'])[0]
+        render = params.get('valueRenderOption', ['FORMATTED_VALUE'])[0]
+        rows = []
+        for row_idx in range(row, end_row):
+            cells = sheet.cells.get(row_idx) or {}
+            values = [_render(cells.get(col_idx), render) for col_idx in range(col, end_col)] if cells else []
+            while values and values[-1] == '':
+                values.pop()
+            rows.append(values)
+        while rows and not rows[-1]:
+            rows.pop()
+        if major == 'COLUMNS':
+            width = max((len(values) for values in rows), default=0)
+            columns = [[values[idx] if idx < len(values) else '' for values in rows] for idx in range(width)]
+            for values in columns:
+                while values and values[-1] == '':
+                    values.pop()
+            rows = columns
+        result = {'range': spreadsheet.range_name(sheet, row, col, end_row, end_col), 'majorDimension': major}
+        if rows:
+            result['values'] = rows
+        return result
+
+    def _spreadsheets_values_update(self, params: dict, body: dict, spreadsheet_id: str, range_: str) -> dict:
+        option = params.get('valueInputOption', [None])[0]
+        return self._write_values(self._spreadsheet(spreadsheet_id), dict(body, range=range_), option)
+
+    def _spreadsheets_values_batchUpdate(self, params: dict, body: dict, spreadsheet_id: str) -> dict:
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        responses = [self._write_values(spreadsheet, value_range, body.get('valueInputOption'))
+                     for value_range in body.get('data', [])]
+        result = {'spreadsheetId': spreadsheet.id, 'responses': responses}
+        for key in ('Rows', 'Columns', 'Cells'):
+            result[f'totalUpdated{key}'] = sum(response.get(f'updated{key}', 0) for response in responses)
+        result['totalUpdatedSheets'] = len({response['updatedRange'].rpartition('!')[0] for response in responses})
+        return result
+
+    def _write_values(self, spreadsheet: _Spreadsheet, value_range: dict, option: Optional[str],
+                      row_offset: Optional[int] = None) -> dict:
+        if option not in ('RAW', 'USER_ENTERED'):
+            raise ApiError(400, "'valueInputOption' is required but not specified")
+        sheet, row, col, _, _ = spreadsheet.parse_range(value_range['range'], clamp=False)
+        if row_offset is not None:
+            row = row_offset
+        rows = value_range.get('values', [])
+        if value_range.get('majorDimension', 'ROWS') == 'COLUMNS':
+            height = max((len(column) for column in rows), default=0)
+            rows = [[column[idx] if idx < len(column) else None for column in rows] for idx in range(height)]
+        width = max((len(values) for values in rows), default=0)
+        # the grid grows to fit the values
+        sheet.resize(rows=max(sheet.rows, row + len(rows)), columns=max(sheet.columns, col + width))
+        updated = 0
+        for row_idx, values in enumerate(rows, row):
+            for col_idx, value in enumerate(values, col):
+                if value is None:
+                    continue
+                entered = _entered_value(value, option)
+                sheet.write(row_idx, col_idx, {'userEnteredValue': entered} if entered else {}, 'userEnteredValue')
+                updated += 1
+        result = {'spreadsheetId': spreadsheet.id, 'updatedRange': spreadsheet.range_name(
+            sheet, row, col, row + max(1, len(rows)), col + max(1, width))}
+        if updated:
+            result.update(updatedRows=len(rows), updatedColumns=width, updatedCells=updated)
+        return result
+
+    def _spreadsheets_values_append(self, params: dict, body: dict, spreadsheet_id: str, range_: str) -> dict:
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        sheet, row, col, end_row, end_col = spreadsheet.parse_range(range_)
+        last = max((idx for idx, cells in sheet.cells.items()
+                    if any(col <= col_idx < end_col for col_idx in cells)), default=row - 1)
+        option = params.get('valueInputOption', [None])[0]
+        updates = self._write_values(spreadsheet, dict(body, range=range_), option, row_offset=max(row, last + 1))
+        return {'spreadsheetId': spreadsheet.id,
+                'tableRange': spreadsheet.range_name(sheet, row, col, max(row, last) + 1, end_col),
+                'updates': updates}
+
+    def _spreadsheets_values_clear(self, params: dict, body: dict, spreadsheet_id: str, range_: str) -> dict:
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        sheet, row, col, end_row, end_col = spreadsheet.parse_range(range_)
+        for row_idx in range(row, end_row):
+            cells = sheet.cells.get(row_idx)
+            if cells:
+                for col_idx in [idx for idx in cells if col <= idx < end_col]:
+                    sheet.write(row_idx, col_idx, {}, 'userEnteredValue')
+        return {'spreadsheetId': spreadsheet.id, 'clearedRange': spreadsheet.range_name(sheet, row, col, end_row, end_col)}
+
+    def _drive_files_list(self, params: dict, body: dict) -> dict:
+        return {'kind': 'drive#fileList', 'items': []}
+
+    def _drive_files_get(self, params: dict, body: dict, file_id: str) -> dict:
+        spreadsheet = self._spreadsheet(file_id)
+        return {'kind': 'drive#file', 'id': spreadsheet.id, 'name': spreadsheet.properties['title'],
+                'mimeType': 'application/vnd.google-apps.spreadsheet', 'version': str(spreadsheet.version),
+                'modifiedTime': spreadsheet.modified_time}
+
+
+def _now() -> str:
+    """RFC 3339 time as Drive formats modifiedTime"""
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def _grid_range(spreadsheet: _Spreadsheet, grid: dict) -> tuple[_Sheet, int, int, int, int]:
+    sheet = spreadsheet.sheet(grid.get('sheetId', 0))
+    return (sheet, grid.get('startRowIndex', 0), grid.get('startColumnIndex', 0),
+            grid.get('endRowIndex', sheet.rows), grid.get('endColumnIndex', sheet.columns))
+
+
+def _shift(sheet: _Sheet, dimension: str, start: int, length: int):
+    """Move rows or columns from start on by length, negative length deletes the rows or columns before start"""
+    if dimension == 'ROWS':
+        cells = {}
+        for row_idx, row in sheet.cells.items():
+            if row_idx < start + min(length, 0):
+                cells[row_idx] = row
+            elif row_idx >= start:
+                cells[row_idx + length] = row
+        sheet.cells = cells
+        sheet.resize(rows=sheet.rows + length)
+    elif dimension == 'COLUMNS':
+        for row_idx, row in sheet.cells.items():
+            sheet.cells[row_idx] = {
+                col_idx + length if col_idx >= start else col_idx: data
+                for col_idx, data in row.items() if not start + min(length, 0) <= col_idx < start
+            }
+        sheet.resize(columns=sheet.columns + length)
+    else:
+        raise ApiError(400, 'dimension must be ROWS or COLUMNS')
+
+
+def _effective(entered: dict) -> Optional[dict]:
+    """effectiveValue of a userEnteredValue, formulas are not evaluated and have none"""
+    if not entered or 'formulaValue' in entered:
+        return None
+    return entered
+
+
+def _formatted(entered: dict) -> str:
+    (kind, value), = entered.items()
+    if kind == 'numberValue':
+        return _number_text(value)
+    if kind == 'boolValue':
+        return 'TRUE' if value else 'FALSE'
+    return str(value)
+
+
+def _cell_data(cell: Optional[dict]) -> dict:
+    """CellData as spreadsheets.get answers it: stored fields with effective and formatted values"""
+    if not cell:
+        return {}
+    data = dict(cell)
+    entered = cell.get('userEnteredValue')
+    if entered:
+        effective = _effective(entered)
+        if effective is not None:
+            data['effectiveValue'] = effective
+        data['formattedValue'] = _formatted(entered)
+    if 'userEnteredFormat' in cell:
+        data['effectiveFormat'] = cell['userEnteredFormat']
+    return data
+
+
+def _render(cell: Optional[dict], render: str) -> Any:
+    entered = cell.get('userEnteredValue') if cell else None
+    if not entered:
+        return ''
+    (kind, value), = entered.items()
+    if render == 'FORMATTED_VALUE':
+        return _formatted(entered)
+    if kind == 'numberValue' and isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _entered_value(value: Any, option: str) -> Optional[dict]:
+    """userEnteredValue of a value of the values API, None for '' which clears the cell"""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, (int, float)):
+        return {'numberValue': value}
+    value = str(value)
+    if value == '':
+        return None
+    if option == 'USER_ENTERED':
+        if value.startswith('='):
+            return {'formulaValue': value}
+        if value.upper() in ('TRUE', 'FALSE'):
+            return {'boolValue': value.upper() == 'TRUE'}
+        if _NUMBER.fullmatch(value):
+            return {'numberValue': int(value) if value.isdigit() else float(value)}
+    return {'stringValue': value}
@@ -0,0 +1,184 @@
+import pickle
+import threading
+from array import array
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from .Dataclasses import Cell
+from .codec import JsonCodec, get_codec
+from .utils import cell_data, stack_rows, block_chunks, _encode_format
+
+# default number of cells encoded by one task of ParallelEncoder
+BLOCK_CELLS = 50_000
+
+
+class CellBlock(NamedTuple):
+    """Cells of whole rows sorted by position, field by field, as sent to encoding processes
+    Cell objects are not pickled: values are plain, formats are indexes into the format blocks of the write"""
+    rows: array
+    cols: array
+    values: list
+    notes: list
+    formats: array
+
+
+def cell_blocks(cells: Iterable[Cell], block_cells: int = BLOCK_CELLS) -> tuple[list[CellBlock], list[Optional[dict]]]:
+    """
+    Cells sorted once by row and column and split into blocks of about block_cells cells on row boundaries
+    A later cell of the same position replaces an earlier one, as in cell_runs.
+    Return the blocks and userEnteredFormat of every distinct style, None for the default one
+    """
+    formats: list[Optional[dict]] = []
+    format_ids: dict[tuple, int] = {}
+    blocks = []
+    rows, cols, values, notes, styles = array('l'), array('l'), [], [], array('l')
+    last_row = last_col = None
+    for cell in sorted(cells, key=lambda cell: (cell.row_idx, cell.col_idx)):
+        key = (cell.bg_color, cell.fr_color, cell.font_family, cell.font_size, cell.bold, cell.italic,
+               cell.strikethrough, cell.underline, cell.borders)
+        try:
+            style = format_ids[key]
+        except KeyError:
+            style = format_ids[key] = len(formats)
+            formats.append(_encode_format(*key))
+        except TypeError:
+            # colors or borders replaced by unhashable objects
+            style = len(formats)
+            formats.append(_encode_format(*key))
+        row_idx, col_idx = cell.row_idx, cell.col_idx
+        if row_idx == last_row and col_idx == last_col:
+            values[-1] = cell.value
+            notes[-1] = cell.note
+            styles[-1] = style
+            continue
+        if row_idx != last_row and len(values) >= block_cells:
+            blocks.append(CellBlock(rows, cols, values, notes, styles))
+            rows, cols, values, notes, styles = array('l'), array('l'), [], [], array('l')
+        rows.append(row_idx)
+        cols.append(col_idx)
+        values.append(cell.value)
+        notes.append(cell.note)
+        styles.append(style)
+        last_row, last_col = row_idx, col_idx
+    if values:
+        blocks.append(CellBlock(rows, cols, values, notes, styles))
+    return blocks, formats
+
+
+def block_runs(block: CellBlock, formats: list[Optional[dict]]) -> Iterator[tuple[dict, int, int, int]]:
+    """RowData of every run of neighbour cells of a row of the block, as stack_rows takes them"""
+    row = None
+    run_row = run_col = next_col = count = 0
+    for row_idx, col_idx, value, note, style in zip(block.rows, block.cols, block.values, block.notes,
+                                                     block.formats):
+        obj = cell_data(value, note, formats[style])
+        if row is not None and row_idx == run_row and col_idx == next_col:
+            row['values'].append(obj)
+            count += 1
+            next_col += 1
+            continue
+        if row is not None:
+            yield row, run_row, run_col, count
+        row = {'values': [obj]}
+        run_row, run_col, next_col, count = row_idx, col_idx, col_idx + 1, 1
+    if row is not None:
+        yield row, run_row, run_col, count
+
+
+def encode_block(block: CellBlock, formats: list[Optional[dict]], sheet_id: int, chunk_size: Optional[int],
+                 chunk_bytes: Optional[int], codec: str | JsonCodec = 'auto') -> list[tuple[bytes, int]]:
+    """Serialized batchUpdate bodies of the block, as update_cells_chunks would split it, with their cells"""
+    codec = get_codec(codec)
+    blocks = stack_rows(block_runs(block, formats), chunk_size, chunk_bytes)
+    return [(codec.dumps({'requests': requests}), count)
+            for requests, count in block_chunks(blocks, sheet_id, chunk_size, chunk_bytes)]
+
+
+class ParallelEncoder:
+    """
+    Encoder of update_cells on a pool of processes, for writes of millions of cells
+
+    with ParallelEncoder() as encoder:
+        sheets.update_cells(cells, encoder=encoder)
+
+    The cells are sorted and split into blocks of whole rows by the calling process, which turns them into
+    CellBlock, arrays of indexes and lists of plain values with formats encoded once per style.
+    Processes build the requests of a block and serialize them, bodies stream back in order
+    while at most two blocks per process are in flight, so the first chunk is sent while the rest is encoded.
+    Requests are planned per block, so a stacked block or a chunk never spans two of them.
+    Processes are started on the first write and kept until close(). On platforms starting them by spawn
+    (Windows, macOS) the writing script must be guarded by if __name__ == '__main__'.
+    processes: number of processes, os.cpu_count() by default
+    mp_context: multiprocessing context of the pool, see ProcessPoolExecutor
+    codec: sent to the processes with every block, so a custom JsonCodec must be picklable
+    """
+
+    def __init__(self, processes: Optional[int] = None, block_cells: int = BLOCK_CELLS,
+                 codec: str | JsonCodec = 'auto', mp_context=None):
+        if processes is not None and processes < 1:
+            raise ValueError('processes must be positive')
+        if block_cells < 1:
+            raise ValueError('block_cells must be positive')
+        if processes is None:
+            import os
+            processes = os.cpu_count() or 1
+        self.processes = processes
+        self.block_cells = block_cells
+        self.codec = get_codec(codec)
+        try:
+            pickle.dumps(self.codec)
+        except Exception as exc:
+            raise ValueError(f'codec {self.codec!r} can not be sent to encoding processes: {exc}') from None
+        self._mp_context = mp_context
+        self._lock = threading.Lock()
+        self._processes = None
+
+    def _executor(self):
+        if self._processes is None:
+            with self._lock:
+                if self._processes is None:
+                    from concurrent.futures import ProcessPoolExecutor
+                    self._processes = ProcessPoolExecutor(max_workers=self.processes, mp_context=self._mp_context)
+        return self._processes
+
+    def encode(self, cells: Iterable[Cell], sheet_id: int = 0, chunk_size: Optional[int] = None,
+               chunk_bytes: Optional[int] = None) -> tuple[Iterator[tuple[bytes, int]], int]:
+        """Stream of (batchUpdate body, cells) chunks of update_cells and the number of cells written"""
+        blocks, formats = cell_blocks(cells, self.block_cells)
+        total = sum(len(block.values) for block in blocks)
+        return self._stream(blocks, formats, sheet_id, chunk_size, chunk_bytes), total
+
+    def _stream(self, blocks: list[CellBlock], formats: list[Optional[dict]], sheet_id: int,
+                chunk_size: Optional[int], chunk_bytes: Optional[int]) -> Iterator[tuple[bytes, int]]:
+        from collections import deque
+        executor = self._executor()
+        pending = deque()
+        queued = iter(blocks)
+        try:
+            for block in queued:
+                pending.append(executor.submit(encode_block, block, formats, sheet_id, chunk_size, chunk_bytes,
+                                               self.codec))
+                if len(pending) >= 2 * self.processes:
+                    break
+            while pending:
+                chunks = pending.popleft().result()
+                for block in queued:
+                    pending.append(executor.submit(encode_block, block, formats, sheet_id, chunk_size,
+                                                   chunk_bytes, self.codec))
+                    break
+                yield from chunks
+        finally:
+            # the sender failed or stopped early
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        with self._lock:
+            processes, self._processes = self._processes, None
+        if processes is not None:
+            processes.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
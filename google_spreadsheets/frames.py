@@ -0,0 +1,145 @@
+import datetime
+import math
+from typing import Any, Iterable, Sequence
+
+from . import a1
+
+# values of one values.batchUpdate request of write_frame, about 2MB of JSON for short values
+FRAME_CHUNK_CELLS = 150_000
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def _require_pandas():
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError('read_frame requires pandas, install google_spreadsheets[pandas]') from None
+    return pd
+
+
+def frame_columns(frame: Any, header: bool = True, index: bool = False) -> list[list]:
+    """
+    Columns of a DataFrame or of a mapping name -> sequence as lists of JSON values for the values API
+
+    Conversion is done per column: numbers stay numbers, missing values and NaN become '' which clears
+    the cell, datetimes become 'YYYY-MM-DD[ HH:MM:SS]' strings parsed back to dates by USER_ENTERED,
+    strings are sent as they are, so ones starting with '=' become formulas
+    header: put names of columns on top, index: put the index of a DataFrame as the first column
+    """
+    if hasattr(frame, 'dtypes') and hasattr(frame, 'columns'):
+        series = [frame[name] for name in frame.columns]
+        names = list(frame.columns)
+        if index:
+            series.insert(0, frame.index.to_series())
+            names.insert(0, frame.index.name if frame.index.name is not None else '')
+        columns = [series_to_values(column) for column in series]
+    else:
+        names = list(frame)
+        columns = [sequence_to_values(frame[name]) for name in names]
+    if header:
+        columns = [[_value(name)] + column for name, column in zip(names, columns)]
+    return columns
+
+
+def series_to_values(series) -> list:
+    """JSON values of a pandas Series, converted for the whole column at once where its dtype allows"""
+    import numpy as np
+    kind = series.dtype.kind
+    if kind in 'biu' and not series.hasnans:
+        return series.tolist()
+    if kind == 'f':
+        data = series.to_numpy()
+        values = data.tolist()
+        for idx in np.flatnonzero(~np.isfinite(data)).tolist():
+            values[idx] = ''
+        return values
+    if kind == 'M':
+        fmt = DATE_FORMAT if (series.dropna().dt.normalize() == series.dropna()).all() else DATETIME_FORMAT
+        return series.dt.strftime(fmt).fillna('').tolist()
+    return sequence_to_values(series.tolist())
+
+
+def sequence_to_values(values: Iterable[Any]) -> list:
+    if hasattr(values, 'tolist'):
+        # numpy arrays and pandas objects convert their scalars at C speed
+        values = values.tolist()
+    return [_value(value) for value in values]
+
+
+def _value(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else ''
+    if isinstance(value, datetime.datetime):
+        return value.strftime(DATETIME_FORMAT if value.time() != datetime.time() else DATE_FORMAT)
+    if isinstance(value, datetime.date):
+        return value.strftime(DATE_FORMAT)
+    try:
+        # NaN-like missing values of pandas: NaT is not equal to itself, NA can not be compared at all
+        if value != value:
+            return ''
+    except TypeError:
+        return ''
+    return str(value)
+
+
+def frame_ranges(columns: list[list], sheet_name: str, start: str,
+                 chunk_cells: int = FRAME_CHUNK_CELLS) -> list[dict]:
+    """ValueRanges of columns split into blocks of whole rows holding about chunk_cells values"""
+    if not columns:
+        return []
+    col, row = a1.to_indexes(start)
+    height = max(len(column) for column in columns)
+    step = max(1, chunk_cells // len(columns))
+    ranges = []
+    for top in range(0, height, step):
+        bottom = min(height, top + step)
+        ranges.append({
+            'range': '{0}!{1}:{2}'.format(sheet_name, a1.to_name(col, row + top),
+                                          a1.to_name(col + len(columns) - 1, row + bottom - 1)),
+            'majorDimension': 'COLUMNS',
+            'values': [column[top:bottom] for column in columns],
+        })
+    return ranges
+
+
+def column_to_array(values: Sequence[Any]):
+    """numpy array of a column of the values API: int if it holds only integers, float if only numbers
+    and blanks, bool if only booleans, object otherwise. Blanks ('' or missing) become NaN or None"""
+    import numpy as np
+    kinds = {type(value) for value in values if value != ''}
+    if kinds == {int} and '' not in values:
+        return np.array(values, dtype=np.int64)
+    if kinds <= {int, float}:
+        return np.array([value if value != '' else np.nan for value in values], dtype=np.float64)
+    if kinds == {bool} and '' not in values:
+        return np.array(values, dtype=bool)
+    return np.array([value if value != '' else None for value in values], dtype=object)
+
+
+def columns_to_frame(columns: list[list], header: bool = True, parse_dates: Iterable[str] = (), col_idx: int = 0):
+    """DataFrame of a values API response with majorDimension COLUMNS
+    Columns are padded to the same height, the API omits trailing blank cells.
+    Without header columns are named by sheet letters starting from col_idx"""
+    pd = _require_pandas()
+    if header:
+        names = [str(column[0]) if column else '' for column in columns]
+        columns = [column[1:] for column in columns]
+    else:
+        names = [a1.column_to_letters(col_idx + idx) for idx in range(len(columns))]
+    height = max((len(column) for column in columns), default=0)
+    data = {}
+    for idx, column in enumerate(columns):
+        if len(column) < height:
+            column = column + [''] * (height - len(column))
+        data[idx] = column_to_array(column)
+    # built by positions, so repeated names of the header are kept
+    frame = pd.DataFrame(data, index=pd.RangeIndex(height))
+    frame.columns = names
+    for name in parse_dates:
+        frame[name] = pd.to_datetime(frame[name])
+    return frame
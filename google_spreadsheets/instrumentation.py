@@ -0,0 +1,234 @@
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, Literal, NamedTuple, Optional, TypeVar
+
+from .scheduler import status_of
+
+T = TypeVar('T')
+Stage = Literal['encode', 'decode']
+
+
+class CallEvent(NamedTuple):
+    method: str  # API method, e.g. 'sheets.spreadsheets.batchUpdate'
+    request_types: tuple[str, ...]  # kinds of batchUpdate requests in order of first use, e.g. ('updateCells',)
+    kind: str  # 'read' or 'write' bucket of the scheduler
+    latency: float  # seconds from the call to the result, with waiting for tokens and retries
+    wait: float  # seconds of latency spent waiting for tokens and backoff
+    encode: float  # seconds spent building the request, i.e. serializing its body
+    decode: float  # seconds spent parsing the response body
+    request_bytes: int
+    response_bytes: int
+    retries: int
+    status: Optional[int]  # HTTP status of the error, None if the call succeeded or failed without one
+    error: Optional[str]  # name of the exception class if the call failed
+
+    @property
+    def operation(self) -> str:
+        """method with request types, the key calls are aggregated by"""
+        name = self.method.rpartition('sheets.')[2] if self.method.startswith('sheets.') else self.method
+        return f'{name}[{",".join(self.request_types)}]' if self.request_types else name
+
+
+class Instrumentation:
+    """
+    Receiver of measurements of GoogleSheets, the base class ignores them
+
+    call(): after every API call, successful or not
+    convert(): after conversion between Cells (or frames) and the API format done outside of API calls,
+    e.g. encoding of update_cells or decoding of get_values
+    Methods are called from the thread making the call, so implementations must be thread-safe.
+    Measurements are taken only when enabled is True, so the default costs one attribute check per call
+    """
+    enabled = False
+
+    def call(self, event: CallEvent):
+        pass
+
+    def convert(self, operation: str, stage: Stage, seconds: float, items: int):
+        pass
+
+
+NOOP = Instrumentation()
+
+
+def request_types(requests: Iterable[dict]) -> tuple[str, ...]:
+    return tuple(dict.fromkeys(kind for request in requests for kind in request))
+
+
+def execute(scheduler, instrumentation: Instrumentation, request, kind: str,
+            types: tuple[str, ...] = (), encode: float = 0.0, **kwargs) -> Any:
+    """scheduler.execute(request, kind, **kwargs) reporting a CallEvent to instrumentation
+    Attempts are counted and the response is measured by wrapping execute and postproc of the HttpRequest"""
+    attempts = 0
+    busy = 0.0
+    decode = 0.0
+    response_bytes = 0
+    send = request.execute
+    postproc = request.postproc
+
+    def measured_postproc(resp, content):
+        nonlocal decode, response_bytes
+        response_bytes = len(content) if content else 0
+        started = time.perf_counter()
+        try:
+            return postproc(resp, content)
+        finally:
+            decode = time.perf_counter() - started
+
+    def measured_execute(**options):
+        nonlocal attempts, busy
+        attempts += 1
+        started = time.perf_counter()
+        try:
+            return send(**options)
+        finally:
+            busy += time.perf_counter() - started
+
+    request.postproc = measured_postproc
+    request.execute = measured_execute
+    status = error = None
+    started = time.perf_counter()
+    try:
+        return scheduler.execute(request, kind, **kwargs)
+    except Exception as exc:
+        status = status_of(exc)
+        error = type(exc).__name__
+        content = getattr(exc, 'content', None)
+        if isinstance(content, (bytes, str)):
+            response_bytes = len(content)
+        raise
+    finally:
+        latency = time.perf_counter() - started
+        body = getattr(request, 'body', None)
+        instrumentation.call(CallEvent(
+            method=getattr(request, 'methodId', None) or type(request).__name__,
+            request_types=types,
+            kind=kind,
+            latency=latency,
+            wait=max(0.0, latency - busy),
+            encode=encode,
+            decode=decode,
+            request_bytes=len(body) if body else 0,
+            response_bytes=response_bytes,
+            retries=max(0, attempts - 1),
+            status=status,
+            error=error,
+        ))
+
+
+def measure(instrumentation: Instrumentation, operation: str, stage: Stage, func: Callable[..., T], *args,
+            count: Callable[[T], int] = len, **kwargs) -> T:
+    """func(*args, **kwargs) reporting its time to instrumentation.convert, count gives the number of items"""
+    if not instrumentation.enabled:
+        return func(*args, **kwargs)
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    instrumentation.convert(operation, stage, time.perf_counter() - started, count(result))
+    return result
+
+
+def measure_iter(instrumentation: Instrumentation, operation: str, stage: Stage,
+                 items: Iterator[T]) -> Iterator[T]:
+    """items reporting time spent producing them once they are exhausted or the iterator is closed
+    Time the consumer spends between items is not counted"""
+    if not instrumentation.enabled:
+        return items
+    return _measured(instrumentation, operation, stage, items)
+
+
+def _measured(instrumentation: Instrumentation, operation: str, stage: Stage, items: Iterator[T]) -> Iterator[T]:
+    spent = 0.0
+    count = 0
+    clock = time.perf_counter
+    try:
+        while True:
+            started = clock()
+            try:
+                item = next(items)
+            except StopIteration:
+                spent += clock() - started
+                return
+            spent += clock() - started
+            count += 1
+            yield item
+    finally:
+        instrumentation.convert(operation, stage, spent, count)
+
+
+class MetricsCollector(Instrumentation):
+    """In-memory aggregator of measurements, per operation (API method with request types)
+
+    metrics = MetricsCollector()
+    sheets = GoogleSheets(creds, spreadsheet_id, instrumentation=metrics)
+    ...
+    print(metrics.report())
+    """
+    enabled = True
+    _CALL_FIELDS = ('latency', 'wait', 'encode', 'decode', 'request_bytes', 'response_bytes', 'retries')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, dict[str, float]] = {}
+        self._conversions: dict[tuple[str, str], dict[str, float]] = {}
+
+    def call(self, event: CallEvent):
+        with self._lock:
+            stats = self._calls.get(event.operation)
+            if stats is None:
+                stats = self._calls[event.operation] = dict.fromkeys(
+                    ('calls', 'errors', 'max_latency') + self._CALL_FIELDS, 0)
+            stats['calls'] += 1
+            stats['errors'] += event.error is not None
+            stats['max_latency'] = max(stats['max_latency'], event.latency)
+            for name in self._CALL_FIELDS:
+                stats[name] += getattr(event, name)
+
+    def convert(self, operation: str, stage: Stage, seconds: float, items: int):
+        with self._lock:
+            stats = self._conversions.setdefault((operation, stage), {'calls': 0, 'seconds': 0.0, 'items': 0})
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['items'] += items
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._conversions.clear()
+
+    def summary(self) -> dict:
+        """{'calls': {operation: totals}, 'conversions': {'operation.stage': totals}}"""
+        with self._lock:
+            return {
+                'calls': {operation: dict(stats) for operation, stats in self._calls.items()},
+                'conversions': {f'{operation}.{stage}': dict(stats)
+                                for (operation, stage), stats in self._conversions.items()},
+            }
+
+    def report(self) -> str:
+        """Table of the summary, slowest operations first"""
+        summary = self.summary()
+        lines = [f'{"operation":<44}{"calls":>7}{"errors":>7}{"retries":>8}{"latency":>10}{"max":>9}'
+                 f'{"wait":>9}{"encode":>9}{"decode":>9}{"sent":>11}{"received":>11}']
+        for operation, stats in sorted(summary['calls'].items(), key=lambda item: -item[1]['latency']):
+            lines.append(
+                f'{operation:<44}{stats["calls"]:>7}{stats["errors"]:>7}{stats["retries"]:>8}'
+                f'{stats["latency"]:>9.3f}s{stats["max_latency"]:>8.3f}s{stats["wait"]:>8.3f}s'
+                f'{stats["encode"]:>8.3f}s{stats["decode"]:>8.3f}s'
+                f'{_size(stats["request_bytes"]):>11}{_size(stats["response_bytes"]):>11}'
+            )
+        if summary['conversions']:
+            lines.append('')
+            lines.append(f'{"conversion":<44}{"calls":>7}{"items":>12}{"seconds":>10}{"items/s":>12}')
+            for name, stats in sorted(summary['conversions'].items(), key=lambda item: -item[1]['seconds']):
+                rate = stats['items'] / stats['seconds'] if stats['seconds'] else 0
+                lines.append(f'{name:<44}{stats["calls"]:>7}{stats["items"]:>12}{stats["seconds"]:>9.3f}s'
+                             f'{rate:>12,.0f}')
+        return '\n'.join(lines)
+
+
+def _size(count: float) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if count < 1024:
+            return f'{count:.0f}{unit}' if unit == 'B' else f'{count:.1f}{unit}'
+        count /= 1024
+    return f'{count:.1f}GB'
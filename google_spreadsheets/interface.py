@@ -1,6 +1,6 @@
 from abc import ABC
 from .Dataclasses import Cell
-from typing import Union, Iterable, Optional
+from typing import Union, Iterable, Optional, Iterator
 
 
 class GoogleSheetsInterface(ABC):
@@ -21,6 +21,19 @@ class GoogleSheetsInterface(ABC):
         If the both, return values from range(A, ZZZ)"""
         raise NotImplementedError
 
+    def iter_rows(self, sheet_name: str = None, sheet_id: int = None, window: int = 5000) -> Iterator[list[Cell]]:
+        """Yield rows of the sheet fetching them by windows of given size"""
+        raise NotImplementedError
+
+    def write_frame(self, frame, sheet_name: str = None, sheet_id: int = None, start: str = 'A1') -> dict:
+        """Write a DataFrame starting from the start cell"""
+        raise NotImplementedError
+
+    def read_frame(self, sheet_name: str = None, sheet_id: int = None, range_: Optional[str] = None,
+                   header: bool = True):
+        """Read the range into a DataFrame"""
+        raise NotImplementedError
+
     def add_sheet(self, title: str) -> dict:
         """Create table in the spreadsheet"""
         raise NotImplementedError
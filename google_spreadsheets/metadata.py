@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from .Dataclasses import Sheet
+from .utils import parse_sheets, sheet_from_properties
+
+# fields mask of spreadsheets.get returning ids, titles and grid sizes of sheets only
+SHEETS_FIELDS = 'sheets.properties'
+# requests of batchUpdate which change the grid size of a sheet in a way not visible from their replies
+RESIZING_REQUESTS = frozenset({
+    'appendCells', 'insertRange', 'insertDimension', 'deleteDimension', 'deleteRange', 'updateDimensionProperties',
+    'autoResizeDimensions', 'pasteData', 'updateSheetProperties', 'copyPaste', 'cutPaste',
+})
+
+
+class SheetMetadata:
+    """
+    Cache of sheets of a spreadsheet indexed by id and by title
+
+    fetch: returns response of spreadsheets.get with at least sheets.properties, None if responses are given
+    to load() only
+    ttl: seconds after which the cache is fetched again, None keeps it until invalidate().
+    Set it when other writers add, rename or resize sheets
+    Own changes are applied from batchUpdate requests and replies by apply()
+    """
+
+    def __init__(self, fetch: Optional[Callable[[], dict]] = None, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self._fetch = fetch
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._by_id: Optional[dict[int, Sheet]] = None
+        self._by_title: dict[str, Sheet] = {}
+        self._fetched = 0.0
+
+    @property
+    def stale(self) -> bool:
+        """True if the next use fetches sheets again"""
+        return self._by_id is None or (self.ttl is not None and self._clock() - self._fetched >= self.ttl)
+
+    def _ensure(self) -> tuple[dict[int, Sheet], dict[str, Sheet]]:
+        """Both indexes taken together, so a concurrent apply() or invalidate() can not reset one of them
+        between the reads"""
+        with self._lock:
+            if self.stale:
+                if self._fetch is not None:
+                    self._index(parse_sheets(self._fetch()))
+                elif self._by_id is None:
+                    raise Exception('Sheets are not loaded')
+            return self._by_id, self._by_title
+
+    def _index(self, sheets: list[Sheet]):
+        self._by_id = {sheet.id: sheet for sheet in sheets}
+        self._by_title = {sheet.title: sheet for sheet in sheets}
+        self._fetched = self._clock()
+
+    @property
+    def sheets(self) -> list[Sheet]:
+        return list(self._ensure()[0].values())
+
+    def refresh(self) -> list[Sheet]:
+        return self.load(self._fetch())
+
+    def load(self, response: dict) -> list[Sheet]:
+        """Index sheets of a spreadsheets.get response fetched elsewhere, e.g. by a coroutine"""
+        sheets = parse_sheets(response)
+        with self._lock:
+            self._index(sheets)
+        return sheets
+
+    def invalidate(self):
+        with self._lock:
+            self._by_id = None
+            self._by_title = {}
+
+    def find(self, id: int = None, title: str = None) -> Sheet:
+        if id is None and title is None:
+            raise ValueError('You must give although one argument')
+        by_id, by_title = self._ensure()
+        sheet = by_id.get(id) if id is not None else None
+        if sheet is None and title is not None:
+            sheet = by_title.get(title)
+        if sheet is None:
+            raise Exception('Sheet not found')
+        return sheet
+
+    def _put(self, sheet: Sheet):
+        old = self._by_id.get(sheet.id)
+        if old is not None and self._by_title.get(old.title) is old:
+            del self._by_title[old.title]
+        self._by_id[sheet.id] = sheet
+        self._by_title[sheet.title] = sheet
+
+    def apply(self, requests: list[dict], response: dict):
+        """Update the cache from requests of batchUpdate and its replies, replies go in order of requests"""
+        with self._lock:
+            if self._by_id is None:
+                return
+            for request, reply in zip(requests, response.get('replies', [])):
+                kind = next(iter(request), None)
+                if kind in ('addSheet', 'duplicateSheet'):
+                    self._put(sheet_from_properties(reply[kind]['properties']))
+                elif kind == 'deleteSheet':
+                    sheet = self._by_id.pop(request[kind]['sheetId'], None)
+                    if sheet is not None and self._by_title.get(sheet.title) is sheet:
+                        del self._by_title[sheet.title]
+                elif kind == 'appendDimension':
+                    body = request[kind]
+                    sheet = self._by_id.get(body['sheetId'])
+                    if sheet is None:
+                        continue
+                    if body['dimension'] == 'ROWS' and sheet.row_count is not None:
+                        self._put(sheet._replace(row_count=sheet.row_count + body['length']))
+                    elif body['dimension'] == 'COLUMNS' and sheet.column_count is not None:
+                        self._put(sheet._replace(column_count=sheet.column_count + body['length']))
+                elif kind in RESIZING_REQUESTS:
+                    # fetched again on the next use
+                    self._by_id = None
+                    self._by_title = {}
+                    return
@@ -0,0 +1,174 @@
+from typing import Iterable, Iterator, Optional
+
+from . import a1
+from .Dataclasses import Cell
+from .batch import MAX_BATCH_BYTES, PendingResponse, chunk_items
+from .utils import from_cells_to_google_format
+
+# tracked attribute of Cell -> path of CellData it is written to
+FIELD_PATHS = {
+    'value': 'userEnteredValue',
+    'note': 'note',
+    'bg_color': 'userEnteredFormat.backgroundColor',
+    'fr_color': 'userEnteredFormat.textFormat.foregroundColor',
+    'font_family': 'userEnteredFormat.textFormat.fontFamily',
+    'font_size': 'userEnteredFormat.textFormat.fontSize',
+    'bold': 'userEnteredFormat.textFormat.bold',
+    'italic': 'userEnteredFormat.textFormat.italic',
+    'strikethrough': 'userEnteredFormat.textFormat.strikethrough',
+    'underline': 'userEnteredFormat.textFormat.underline',
+    'borders': 'userEnteredFormat.borders',
+}
+TRACKED = tuple(FIELD_PATHS)
+
+
+def cell_state(cell: Cell) -> tuple:
+    # type is kept for value, so 1 -> True or 1 -> 1.0 count as changes
+    return ((type(cell.value), cell.value),) + tuple(getattr(cell, attr) for attr in TRACKED[1:])
+
+
+def pick_fields(data: dict, paths: Iterable[str]) -> dict:
+    """Part of CellData holding only given paths, missing paths are left out and so cleared by the mask"""
+    result = {}
+    for path in paths:
+        keys = path.split('.')
+        source = data
+        for key in keys:
+            if not isinstance(source, dict) or key not in source:
+                break
+            source = source[key]
+        else:
+            target = result
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = source
+    return result
+
+
+class SheetMirror:
+    """
+    Local copy of a range which remembers the loaded state of every Cell
+    Change cells in place or put new ones with mirror['B2'] = Cell('B2', ...), then commit() sends only
+    changed attributes of changed cells, each request having a fields mask of exactly those attributes
+    """
+
+    def __init__(self, sheets, sheet_id: int, cells: Iterable[Cell]):
+        self.sheets = sheets
+        self.sheet_id = sheet_id
+        self._cells: dict[str, Cell] = {}
+        self._snapshot: dict[str, tuple] = {}
+        for cell in cells:
+            self._cells[cell.name] = cell
+            self._snapshot[cell.name] = cell_state(cell)
+
+    def __repr__(self):
+        return f'SheetMirror(sheet_id={self.sheet_id}, cells={len(self._cells)}, changed={len(self.changes())})'
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __iter__(self) -> Iterator[Cell]:
+        return iter(self._cells.values())
+
+    def __contains__(self, key: str | tuple[int, int]) -> bool:
+        return self._name(key) in self._cells
+
+    def __getitem__(self, key: str | tuple[int, int]) -> Cell:
+        """mirror['B2'] or mirror[row_idx, col_idx], a missing cell is created empty"""
+        name = self._name(key)
+        if name not in self._cells:
+            self._cells[name] = Cell(name)
+        return self._cells[name]
+
+    def __setitem__(self, key: str | tuple[int, int], cell: Cell):
+        name = self._name(key)
+        if cell.name != name:
+            raise ValueError(f'Cell {cell.name!r} can not be put to {name!r}')
+        self._cells[name] = cell
+
+    @staticmethod
+    def _name(key: str | tuple[int, int]) -> str:
+        if isinstance(key, tuple):
+            row, col = key
+            return a1.to_name(col, row)
+        return key.upper()
+
+    def changes(self) -> dict[str, tuple[str, ...]]:
+        """Changed attributes of every changed cell, cells unknown to the sheet have all attributes changed"""
+        result = {}
+        for name, cell in self._cells.items():
+            before = self._snapshot.get(name)
+            if before is None:
+                # an empty cell created by __getitem__ and never filled is not a change
+                if cell_state(cell) != cell_state(Cell(name)):
+                    result[name] = TRACKED
+                continue
+            after = cell_state(cell)
+            if after != before:
+                result[name] = tuple(attr for attr, old, new in zip(TRACKED, before, after) if old != new)
+        return result
+
+    def requests(self) -> list[dict]:
+        """updateCells requests of changes, neighbour cells of a row with the same changes share one request"""
+        changes = self.changes()
+        cells = sorted((self._cells[name] for name in changes), key=lambda cell: (cell.row_idx, cell.col_idx))
+        requests = []
+        run: list[Cell] = []
+        run_attrs: Optional[tuple[str, ...]] = None
+        for cell in cells:
+            attrs = changes[cell.name]
+            last = run[-1] if run else None
+            if last is not None and attrs == run_attrs and last.row_idx == cell.row_idx \
+                    and last.col_idx + 1 == cell.col_idx:
+                run.append(cell)
+                continue
+            if run:
+                requests.append(self._request(run, run_attrs))
+            run = [cell]
+            run_attrs = attrs
+        if run:
+            requests.append(self._request(run, run_attrs))
+        return requests
+
+    def _request(self, cells: list[Cell], attrs: tuple[str, ...]) -> dict:
+        paths = sorted(FIELD_PATHS[attr] for attr in attrs)
+        values = [pick_fields(data, paths) for data in from_cells_to_google_format(cells)]
+        return {
+            'updateCells': {
+                'rows': [{'values': values}],
+                'fields': ','.join(paths),
+                'start': {
+                    'sheetId': self.sheet_id,
+                    'rowIndex': cells[0].row_idx,
+                    'columnIndex': cells[0].col_idx,
+                },
+            }
+        }
+
+    def commit(self, chunk_bytes: Optional[int] = MAX_BATCH_BYTES) -> dict | PendingResponse:
+        """Send changes in batchUpdate calls of at most chunk_bytes of JSON and, once they are sent,
+        take the state of cells at the call as the new loaded one.
+        Inside batch() that happens on flush, if the flush or a chunk fails the changes stay pending"""
+        requests = self.requests()
+        if not requests:
+            self.reset()
+            return {'spreadsheetId': self.sheets.spreadsheetId, 'replies': []}
+        snapshot = self._state()
+        counts = [len(request['updateCells']['rows'][0]['values']) for request in requests]
+        response = self.sheets._send_chunks(chunk_items(requests, counts, max_bytes=chunk_bytes))
+
+        def committed(_=None):
+            self._snapshot = snapshot
+
+        if isinstance(response, PendingResponse):
+            response.add_done_callback(committed)
+        else:
+            committed()
+        return response
+
+    def reset(self):
+        """Take the current state of cells as the state of the sheet without sending anything"""
+        self._snapshot = self._state()
+
+    def _state(self) -> dict[str, tuple]:
+        return {name: cell_state(cell) for name, cell in self._cells.items()}
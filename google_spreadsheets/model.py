@@ -0,0 +1,39 @@
+from typing import Optional
+
+from googleapiclient.model import JsonModel
+
+from .codec import EncodedBody, JsonCodec, gzip_body
+
+
+class SheetsModel(JsonModel):
+    """
+    JsonModel of googleapiclient serializing with codec and parsing responses straight from bytes
+
+    Responses are asked gzip encoded by JsonModel already, httplib2 decompresses them.
+    gzip_threshold: request bodies of at least so many bytes are sent gzip encoded, None to never compress
+    """
+
+    def __init__(self, codec: JsonCodec, gzip_threshold: Optional[int] = None):
+        super().__init__(data_wrapper=False)
+        self.codec = codec
+        self.gzip_threshold = gzip_threshold
+
+    def request(self, headers, path_params, query_params, body_value):
+        headers, path_params, query, body = super().request(headers, path_params, query_params, body_value)
+        compressed = gzip_body(body, self.gzip_threshold) if body is not None else None
+        if compressed is not None:
+            body = compressed
+            headers['content-encoding'] = 'gzip'
+        return headers, path_params, query, body
+
+    def serialize(self, body_value):
+        if isinstance(body_value, EncodedBody):
+            return body_value.data
+        return self.codec.dumps(body_value)
+
+    def deserialize(self, content):
+        try:
+            return self.codec.load_body(content)
+        except ValueError:
+            # as JsonModel does, a body which is not JSON is returned as text
+            return content.decode('utf-8', 'replace') if isinstance(content, bytes) else content
@@ -1,5 +1,8 @@
 from functools import singledispatch
 
+# interned colors are kept until the cache reaches this size, later colors are created per call
+MAX_INTERNED_COLORS = 4096
+
 
 @singledispatch
 def to_rgb(color):
@@ -28,4 +31,44 @@ def _(color: tuple):
 
 @to_rgb.register
 def _(color: dict):
-    return color
\ No newline at end of file
+    return color
+
+
+class Color(dict):
+    """Immutable color dict like {'red': 1.0, 'green': 1.0, 'blue': 1.0}
+    Instances are shared between cells, so assign a new color instead of changing the existing one"""
+    __slots__ = ('_hash',)
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('Color is immutable, assign a new color instead')
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _immutable
+
+    def __hash__(self):
+        # colors are keys of cached format blocks, so the hash is computed once
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(tuple(sorted(self.items())))
+            return self._hash
+
+    def __reduce__(self):
+        return Color, (dict(self),)
+
+
+_colors: dict[tuple, Color] = {}
+
+
+def intern_color(color: dict) -> Color:
+    """Return shared Color equal to the given dict"""
+    key = tuple(sorted(color.items()))
+    try:
+        return _colors[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # unhashable values, nothing to share
+        return Color(color)
+    if len(_colors) >= MAX_INTERNED_COLORS:
+        return Color(color)
+    return _colors.setdefault(key, Color(color))
@@ -0,0 +1,235 @@
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Hashable, Iterable, Literal, Mapping, NamedTuple, Optional, Sequence
+
+from .api import GoogleSheets
+from .codec import JsonCodec, get_codec
+from .instrumentation import Instrumentation
+from .scheduler import RequestScheduler, get_scheduler
+from .transport import HttpPool, service_account_credentials
+
+if TYPE_CHECKING:
+    from .cache import ReadCache
+
+# default number of spreadsheets handled at once by bulk methods
+POOL_WORKERS = 8
+
+
+class PoolError(Exception):
+    """Raised by PoolResult.raise_errors, errors: exception per key of the failed items"""
+
+    def __init__(self, message: str, errors: dict[Hashable, Exception]):
+        super().__init__(message)
+        self.errors = errors
+
+
+class PoolResult(NamedTuple):
+    """Outcome of a bulk operation: result per key of the successful items, exception per key of the failed ones
+    Both keep the order the items were given in"""
+    results: dict[Hashable, Any]
+    errors: dict[Hashable, Exception]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def raise_errors(self) -> dict[Hashable, Any]:
+        """results if every item succeeded, PoolError with all errors otherwise"""
+        if self.errors:
+            first = next(iter(self.errors.values()))
+            raise PoolError(f'{len(self.errors)} of {len(self.errors) + len(self.results)} items failed, '
+                            f'first: {first!r}', self.errors) from first
+        return self.results
+
+
+class SheetsClientPool:
+    """
+    GoogleSheets clients of many spreadsheets of one service account
+
+    pool = SheetsClientPool(creds)
+    result = pool.read_many({spreadsheet_id: ['Sheet1!A1:D100', 'Totals'] for spreadsheet_id in ids})
+    for spreadsheet_id, values in result.results.items(): ...
+
+    Clients share the credentials and so one access token, the connections of every thread, the service
+    with its resources and the scheduler, so the quota of the service account is kept by all of them together.
+    Bulk methods handle up to max_workers spreadsheets at once on threads kept by the pool until close(),
+    and gather per spreadsheet results and errors instead of stopping at the first error.
+    Functions given to map() must not call bulk methods of the same pool, they would wait for its threads.
+    Other arguments are passed to every client, see GoogleSheets
+    """
+
+    def __init__(self, creds: dict, scheduler: Optional[RequestScheduler] = None,
+                 transport: Optional[HttpPool] = None, max_workers: int = POOL_WORKERS,
+                 metadata_ttl: Optional[float] = None, instrumentation: Optional[Instrumentation] = None,
+                 codec: str | JsonCodec = 'auto', gzip_threshold: Optional[int] = None,
+                 cache: Optional['ReadCache'] = None):
+        if max_workers < 1:
+            raise ValueError('max_workers must be positive')
+        self._creds = creds
+        self._transport = transport
+        self._lock = threading.Lock()
+        self.scheduler = scheduler if scheduler is not None else get_scheduler(creds.get('client_email', ''))
+        self.max_workers = max_workers
+        self._options = {
+            'metadata_ttl': metadata_ttl,
+            'instrumentation': instrumentation,
+            'codec': get_codec(codec),
+            'gzip_threshold': gzip_threshold,
+            'cache': cache,
+        }
+        self._clients: dict[str, GoogleSheets] = {}
+        self._threads = None
+
+    @property
+    def transport(self) -> HttpPool:
+        """Credentials are parsed once, on the first client"""
+        if self._transport is None:
+            with self._lock:
+                if self._transport is None:
+                    self._transport = HttpPool(service_account_credentials(self._creds))
+        return self._transport
+
+    def client(self, spreadsheet_id: str) -> GoogleSheets:
+        """Client of the spreadsheet, created once and then reused with its cached metadata"""
+        client = self._clients.get(spreadsheet_id)
+        if client is None:
+            transport = self.transport
+            with self._lock:
+                client = self._clients.get(spreadsheet_id)
+                if client is None:
+                    client = self._clients[spreadsheet_id] = GoogleSheets(
+                        self._creds, spreadsheet_id, scheduler=self.scheduler, transport=transport, **self._options
+                    )
+        return client
+
+    __getitem__ = client
+
+    def __len__(self):
+        return len(self._clients)
+
+    def map(self, func: Callable[[GoogleSheets, Any], Any], items: Mapping[str, Any] | Iterable[str],
+            max_workers: Optional[int] = None) -> PoolResult:
+        """
+        func(client, argument) for every spreadsheet id of items, at most max_workers at once
+        items: mapping spreadsheet id -> argument, or ids alone, func gets None as the argument then
+        """
+        if not isinstance(items, Mapping):
+            items = dict.fromkeys(items)
+        return self._gather([(key, (lambda key=key: func(self.client(key), items[key]))) for key in items],
+                            max_workers)
+
+    def read_many(self, ranges: Mapping[str, str | Sequence[str]],
+                  value_render_option: Literal['FORMATTED_VALUE', 'UNFORMATTED_VALUE', 'FORMULA'] = 'FORMATTED_VALUE',
+                  major_dimension: Literal['ROWS', 'COLUMNS'] = 'ROWS',
+                  max_workers: Optional[int] = None) -> PoolResult:
+        """
+        Values of the ranges of every spreadsheet, one values.batchGet request per spreadsheet
+        ranges: spreadsheet id -> A1 range or list of them, e.g. 'Sheet1!A1:D10' or a sheet name for all of it
+        Results are spreadsheet id -> {range as given: list of rows (or columns), without trailing blanks}
+        """
+        return self.map(
+            lambda client, requested: batch_get_values(client, requested, value_render_option, major_dimension),
+            ranges, max_workers,
+        )
+
+    def copy_many(self, copies: Mapping[str, str] | Iterable[tuple[str, str]], sheet_name: Optional[str] = None,
+                  sheet_id: Optional[int] = None, max_workers: Optional[int] = None) -> PoolResult:
+        """
+        Copy sheets between spreadsheets, e.g. a template into many reports
+        copies: (source id, destination id) pairs or mapping source id -> destination id
+        sheet_name, sheet_id: the sheet of every source to copy, all of its sheets by default
+        Results are (source id, destination id) -> list of properties of the new sheets
+        """
+        pairs = list(copies.items()) if isinstance(copies, Mapping) else [tuple(pair) for pair in copies]
+
+        def copy(source: str, destination: str) -> list[dict]:
+            client = self.client(source)
+            if sheet_name is None and sheet_id is None:
+                # spreadsheets are the unit of concurrency, sheets of one are copied one by one
+                return client.copy_all_to_spreadsheet(destination, max_workers=1)
+            if sheet_name is None:
+                return [client.copy_to_spreadsheet(destination, sheet_id=sheet_id)]
+            return [client.copy_to_spreadsheet(destination, sheet_name=sheet_name)]
+
+        return self._gather([(pair, (lambda pair=pair: copy(*pair))) for pair in pairs], max_workers)
+
+    def _gather(self, tasks: list[tuple[Hashable, Callable[[], Any]]], max_workers: Optional[int]) -> PoolResult:
+        """Run tasks on the threads of the pool with at most max_workers of them at once,
+        results and errors are ordered as tasks"""
+        max_workers = min(max_workers or self.max_workers, self.max_workers, len(tasks))
+        outcomes: list[Optional[tuple[bool, Any]]] = [None] * len(tasks)
+        if max_workers <= 1:
+            for idx, (_, task) in enumerate(tasks):
+                outcomes[idx] = _outcome(task)
+        else:
+            from concurrent.futures import wait, FIRST_COMPLETED
+            executor = self._executor()
+            pending = {}
+            queued = iter(enumerate(tasks))
+            try:
+                for idx, (_, task) in queued:
+                    pending[executor.submit(_outcome, task)] = idx
+                    if len(pending) >= max_workers:
+                        break
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        outcomes[pending.pop(future)] = future.result()
+                        for idx, (_, task) in queued:
+                            pending[executor.submit(_outcome, task)] = idx
+                            break
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        results = {}
+        errors = {}
+        for (key, _), (ok, value) in zip(tasks, outcomes):
+            (results if ok else errors)[key] = value
+        return PoolResult(results, errors)
+
+    def _executor(self):
+        """Threads are kept between bulk calls, so are their connections"""
+        if self._threads is None:
+            with self._lock:
+                if self._threads is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._threads = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                       thread_name_prefix='SheetsClientPool')
+        return self._threads
+
+    def close(self):
+        """Stop the threads of the pool, clients stay usable"""
+        with self._lock:
+            threads, self._threads = self._threads, None
+        if threads is not None:
+            threads.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _outcome(task: Callable[[], Any]) -> tuple[bool, Any]:
+    try:
+        return True, task()
+    except Exception as exc:
+        return False, exc
+
+
+def batch_get_values(client: GoogleSheets, ranges: str | Sequence[str],
+                     value_render_option: str = 'FORMATTED_VALUE', major_dimension: str = 'ROWS') -> dict[str, list]:
+    """Values of the ranges of the client's spreadsheet by one values.batchGet, range as given -> values"""
+    ranges = [ranges] if isinstance(ranges, str) else list(ranges)
+    if not ranges:
+        return {}
+    response = client._execute(client._resource('spreadsheets', 'values').batchGet(
+        spreadsheetId=client.spreadsheetId,
+        ranges=ranges,
+        valueRenderOption=value_render_option,
+        majorDimension=major_dimension,
+    ))
+    # value ranges come in order of the requested ones, their names are normalized by the API
+    return {range_: value_range.get('values', [])
+            for range_, value_range in zip(ranges, response.get('valueRanges', []))}
@@ -0,0 +1,200 @@
+import threading
+import time
+from typing import Any, Awaitable, Callable, Literal, NamedTuple, Optional
+
+# Sheets API answers 429 when a quota is exceeded, 5xx are transient server errors
+RETRIABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+# default per user quota of Sheets API, the same for reads and writes
+REQUESTS_PER_MINUTE = 60
+
+Kind = Literal['read', 'write']
+
+
+class TokenBucket:
+    """
+    rate: tokens added per second
+    capacity: max tokens stored, i.e. the size of a burst
+    Tokens are reserved in order of calls, so waiting callers are served fairly
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0 or capacity < 1:
+            raise ValueError('rate must be positive and capacity must be at least 1')
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, limit: int, burst: int = 10, clock: Callable[[], float] = time.monotonic) -> 'TokenBucket':
+        """Bucket which never lets more than limit requests through in any minute
+        With limit 1 the single token is refilled once a minute"""
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        burst = max(1, min(burst, limit - 1))
+        return cls(max(1, limit - burst) / 60, burst, clock)
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take tokens and return how many seconds the caller must wait before using them"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class SchedulerStats(NamedTuple):
+    requests: int
+    retries: int
+    waiting: int  # requests currently waiting for a token, i.e. queue depth
+    total_wait: float  # seconds spent waiting for tokens and backoff
+    max_wait: float
+
+
+def status_of(exc: BaseException) -> Optional[int]:
+    """HTTP status of googleapiclient HttpError or None"""
+    status = getattr(getattr(exc, 'resp', None), 'status', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    Central point every request of GoogleSheets is executed through
+
+    Reads and writes take tokens from separate buckets. Retriable errors (429, 5xx, dropped connections)
+    are retried with jittered exponential backoff, Retry-After of the response is respected.
+    clock and sleep can be replaced for offline tests, as well as the HTTP layer of the requests,
+    for example googleapiclient.http.HttpMockSequence answering with 429 several times.
+
+    retry_writes_on_5xx: retry writes which failed with 5xx too. Off by default: such a write might have been
+    applied, so retrying appendCells or appendDimension would append the same rows twice.
+    Writes answered with 429 were not applied and are always retried
+    """
+
+    def __init__(self, reads_per_minute: int = REQUESTS_PER_MINUTE, writes_per_minute: int = REQUESTS_PER_MINUTE,
+                 burst: int = 10, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 64.0,
+                 retry_writes_on_5xx: bool = False, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Any] = time.sleep):
+        self.buckets: dict[str, TokenBucket] = {
+            'read': TokenBucket.per_minute(reads_per_minute, burst, clock),
+            'write': TokenBucket.per_minute(writes_per_minute, burst, clock),
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_writes_on_5xx = retry_writes_on_5xx
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+        self._waiting = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def stats(self) -> SchedulerStats:
+        with self._lock:
+            return SchedulerStats(self._requests, self._retries, self._waiting, self._total_wait, self._max_wait)
+
+    def _wait(self, seconds: float):
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._waiting += 1
+            self._total_wait += seconds
+            self._max_wait = max(self._max_wait, seconds)
+        try:
+            self._sleep(seconds)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    async def _await(self, seconds: float):
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._waiting += 1
+            self._total_wait += seconds
+            self._max_wait = max(self._max_wait, seconds)
+        import asyncio
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def is_retriable(self, exc: BaseException, kind: Kind) -> bool:
+        status = status_of(exc)
+        if status is None:
+            return isinstance(exc, (ConnectionError, TimeoutError))
+        if status >= 500 and kind == 'write':
+            return self.retry_writes_on_5xx and status in RETRIABLE_STATUSES
+        return status in RETRIABLE_STATUSES
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        """Delay before the retry number attempt + 1"""
+        resp = getattr(exc, 'resp', None)
+        retry_after = resp.get('retry-after') if isinstance(resp, dict) else None
+        try:
+            if retry_after is not None:
+                return min(self.max_delay, float(retry_after))
+        except ValueError:
+            pass
+        import random
+        return min(self.max_delay, self.base_delay * 2 ** attempt + random.uniform(0, self.base_delay))
+
+    def execute(self, request, kind: Kind = 'read', **kwargs) -> Any:
+        """Wait for a token, call request.execute(**kwargs) and retry it on retriable errors"""
+        bucket = self.buckets[kind]
+        attempt = 0
+        while True:
+            self._wait(bucket.reserve())
+            with self._lock:
+                self._requests += 1
+            try:
+                return request.execute(**kwargs)
+            except Exception as exc:
+                if attempt >= self.max_retries or not self.is_retriable(exc, kind):
+                    raise
+                delay = self.backoff(attempt, exc)
+            with self._lock:
+                self._retries += 1
+            self._wait(delay)
+            attempt += 1
+
+    async def execute_async(self, send: Callable[[], Awaitable[Any]], kind: Kind = 'read') -> Any:
+        """Coroutine version of execute, send() is awaited for every attempt"""
+        bucket = self.buckets[kind]
+        attempt = 0
+        while True:
+            await self._await(bucket.reserve())
+            with self._lock:
+                self._requests += 1
+            try:
+                return await send()
+            except Exception as exc:
+                if attempt >= self.max_retries or not self.is_retriable(exc, kind):
+                    raise
+                delay = self.backoff(attempt, exc)
+            with self._lock:
+                self._retries += 1
+            await self._await(delay)
+            attempt += 1
+
+
+_schedulers: dict[str, RequestScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(key: str) -> RequestScheduler:
+    """Shared scheduler for the key, e.g. client_email of a service account, so that every client
+    of the same user takes tokens from the same buckets"""
+    with _schedulers_lock:
+        if key not in _schedulers:
+            _schedulers[key] = RequestScheduler()
+        return _schedulers[key]
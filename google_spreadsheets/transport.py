@@ -0,0 +1,107 @@
+import threading
+from typing import Callable, Optional
+
+from .codec import JsonCodec, get_codec
+
+SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive',
+    'https://www.googleapis.com/auth/drive.file',
+]
+
+_services: dict[tuple, object] = {}
+_services_lock = threading.Lock()
+_resources: dict[tuple, object] = {}
+_resources_lock = threading.Lock()
+
+
+def service_account_credentials(creds: dict, scopes: Optional[list[str]] = None):
+    """oauth2client credentials of the parsed service account key file"""
+    from oauth2client.service_account import ServiceAccountCredentials
+    return ServiceAccountCredentials._from_parsed_json_keyfile(creds, scopes if scopes is not None else SCOPES)
+
+
+def get_service(name: str, version: str, codec: str | JsonCodec = 'auto', gzip_threshold: Optional[int] = None):
+    """
+    Service object built once per process from the discovery document bundled with google-api-python-client,
+    so neither the network nor parsing of the document is paid again by other clients.
+    The service is shared by all clients, their requests are executed with their own Http
+    codec: JSON codec of request and response bodies, see get_codec
+    gzip_threshold: request bodies of at least so many bytes are sent gzip encoded, None to never compress
+    """
+    codec = get_codec(codec)
+    key = (name, version, codec, gzip_threshold)
+    service = _services.get(key)
+    if service is None:
+        with _services_lock:
+            service = _services.get(key)
+            if service is None:
+                import httplib2
+                service = _services[key] = build_service(name, version, httplib2.Http(), codec, gzip_threshold)
+    return service
+
+
+def build_service(name: str, version: str, http, codec: str | JsonCodec = 'auto',
+                  gzip_threshold: Optional[int] = None):
+    """Service from the bundled discovery document whose requests are executed with http by default"""
+    import apiclient.discovery
+    from .model import SheetsModel
+    return apiclient.discovery.build(name, version, http=http, model=SheetsModel(get_codec(codec), gzip_threshold),
+                                     static_discovery=True, cache_discovery=False)
+
+
+def get_resource(name: str, version: str, *path: str, codec: str | JsonCodec = 'auto',
+                 gzip_threshold: Optional[int] = None):
+    """
+    Resource of the shared service, e.g. get_resource('sheets', 'v4', 'spreadsheets', 'values'), built once
+    googleapiclient builds a Resource with all its methods from the discovery document on every call
+    like service.spreadsheets(), which costs more than most requests take to send. Resources hold no state
+    of requests, so they are shared by all clients and threads
+    """
+    codec = get_codec(codec)
+    key = (name, version, path, codec, gzip_threshold)
+    resource = _resources.get(key)
+    if resource is None:
+        with _resources_lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = get_service(name, version, codec, gzip_threshold)
+                for attr in path:
+                    resource = getattr(resource, attr)()
+                _resources[key] = resource
+    return resource
+
+
+class HttpPool:
+    """
+    Authorized httplib2.Http per thread
+    httplib2.Http is not thread-safe, so every thread gets its own one and keeps its connections alive
+    between requests. The credentials and so the access token are shared by all threads
+
+    http_factory: creates a not authorized Http, e.g. with custom timeout or certificates
+    """
+
+    def __init__(self, credentials, http_factory: Optional[Callable[[], 'httplib2.Http']] = None):
+        self.credentials = credentials
+        self.http_factory = http_factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    @property
+    def size(self) -> int:
+        """Number of Http objects created so far"""
+        return self._created
+
+    def http(self) -> 'httplib2.Http':
+        """Http of the current thread"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            if self.http_factory is None:
+                import httplib2
+                self.http_factory = httplib2.Http
+            http = self.credentials.authorize(self.http_factory())
+            self._local.http = http
+            with self._lock:
+                self._created += 1
+        return http
@@ -1,56 +1,123 @@
-from .Dataclasses import Cell, Borders, LeftBorder, RightBorder, TopBorder, BottomBorder, Sheet
-from typing import Iterable, Union, Tuple, List, Sequence, Any, Iterator
+from . import a1
+from .Dataclasses import Cell, Borders, LeftBorder, RightBorder, TopBorder, BottomBorder, Sheet, Grid, \
+    intern_borders, DEFAULT_BG_COLOR, DEFAULT_FR_COLOR, DEFAULT_FONT_FAMILY, DEFAULT_FONT_SIZE
+from array import array
+import json
+from .batch import chunk_items
+from typing import Iterable, Union, Tuple, List, Sequence, Any, Iterator, Optional, Literal
+
+# fields mask for get_values(values_only=True): drops formatting, borders and notes from the response
+VALUES_ONLY_FIELDS = 'sheets(data(startRow,startColumn,rowData(values(userEnteredValue,formattedValue))))'
+# fields mask for get_values(as_='grid')
+GRID_FIELDS = 'sheets(data(startRow,startColumn,rowData(values(effectiveValue,userEnteredValue))))'
+# paths of CellData written by from_cells_to_google_format, the fields mask of updateCells
+FORMAT_PATHS = {name: f'userEnteredFormat.{name}' for name in ('textFormat', 'backgroundColor', 'borders')}
+CELL_FIELDS = ','.join(['userEnteredValue', 'note', *FORMAT_PATHS.values()])
+# encoded format blocks kept by format_to_google_format
+MAX_FORMATS = 4096
 
 
 def from_cells_to_google_format(cells: Iterable[Cell]) -> list[dict]:
-    values = []
-    for cell in cells:
-        obj = {'userEnteredValue': {},
-               'userEnteredFormat': {
-                   'textFormat': {},
-                   'backgroundColor': {},
-               }}
-        if cell.value is not None:
-            try:
-                if cell.value.startswith('='):
-                    obj['userEnteredValue']['formulaValue'] = cell.value
-                else:
-                    obj['userEnteredValue']['stringValue'] = cell.value
-            except AttributeError:
-                obj['userEnteredValue']['numberValue'] = cell.value
+    """CellData of cells, attributes equal to defaults of Cell are left out
+    Requests must use CELL_FIELDS (or a narrower mask) so that left out attributes are reset to defaults.
+    Format blocks are shared between cells of the same style, do not mutate them"""
+    return [cell_data(cell.value, cell.note, format_to_google_format(cell)) for cell in cells]
+
+
+def cell_data(value: Any, note: Optional[str], cell_format: Optional[dict]) -> dict:
+    """CellData of a value, a note and an encoded format block, None ones are left out"""
+    obj = {}
+    if value is not None:
+        if isinstance(value, str):
+            obj['userEnteredValue'] = {'formulaValue' if value.startswith('=') else 'stringValue': value}
         else:
-            obj.pop('userEnteredValue')
+            obj['userEnteredValue'] = {'numberValue': value}
+    if note is not None:
+        obj['note'] = note
+    if cell_format is not None:
+        obj['userEnteredFormat'] = cell_format
+    return obj
+
 
-        if (note := cell.note) is not None:
-            obj['note'] = note
+_formats: dict[tuple, Optional[dict]] = {}
 
-        if borders := borders_to_google_format(cell.borders):
-            borders = {key: value for key, value in borders.items() if value}
-            if borders:
-                obj['userEnteredFormat']['borders'] = borders
-        obj['userEnteredFormat']['textFormat']['bold'] = cell.bold
-        obj['userEnteredFormat']['textFormat']['italic'] = cell.italic
-        obj['userEnteredFormat']['textFormat']['strikethrough'] = cell.strikethrough
-        obj['userEnteredFormat']['textFormat']['underline'] = cell.underline
-        obj['userEnteredFormat']['textFormat']['fontSize'] = cell.font_size
-        obj['userEnteredFormat']['textFormat']['fontFamily'] = cell.font_family
-        obj['userEnteredFormat']['textFormat']['foregroundColor'] = cell.fr_color
-        obj['userEnteredFormat']['backgroundColor'] = cell.bg_color
 
-        values.append(obj)
-    return values
+def format_to_google_format(cell: Cell) -> Optional[dict]:
+    """userEnteredFormat of the cell without default attributes, None if all of them are defaults
+    Blocks are cached by style, so cells of the same style share one dict"""
+    key = (cell.bg_color, cell.fr_color, cell.font_family, cell.font_size, cell.bold, cell.italic,
+           cell.strikethrough, cell.underline, cell.borders)
+    try:
+        return _formats[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # colors or borders replaced by unhashable objects
+        return _encode_format(*key)
+    if len(_formats) >= MAX_FORMATS:
+        _formats.clear()
+    result = _formats[key] = _encode_format(*key)
+    return result
+
+
+def _encode_format(bg_color, fr_color, font_family, font_size, bold, italic, strikethrough, underline,
+                   borders) -> Optional[dict]:
+    text_format = {}
+    if bold:
+        text_format['bold'] = bold
+    if italic:
+        text_format['italic'] = italic
+    if strikethrough:
+        text_format['strikethrough'] = strikethrough
+    if underline:
+        text_format['underline'] = underline
+    if font_size != DEFAULT_FONT_SIZE:
+        text_format['fontSize'] = font_size
+    if font_family != DEFAULT_FONT_FAMILY:
+        text_format['fontFamily'] = font_family
+    if fr_color != DEFAULT_FR_COLOR:
+        text_format['foregroundColor'] = fr_color
+    result = {}
+    if text_format:
+        result['textFormat'] = text_format
+    if bg_color != DEFAULT_BG_COLOR:
+        result['backgroundColor'] = bg_color
+    if borders := borders_to_google_format(borders):
+        result['borders'] = borders
+    return result or None
 
 
 def borders_to_google_format(borders: Borders) -> dict:
+    """Sides having any of style, color or width, without empty attributes"""
     result = {}
-    for side in ['top', 'bottom', 'left', 'right']:
-        result[side] = {}
-        for attr in ['style', 'color', 'width']:
-            if value := eval(f'borders.{side}.{attr}'):
-                result[side] |= {attr: value}
+    for side in ('top', 'bottom', 'left', 'right'):
+        border = getattr(borders, side)
+        if border is None:
+            continue
+        encoded = {}
+        if style := border.style:
+            encoded['style'] = style
+        if color := border.color:
+            encoded['color'] = color
+        if width := border.width:
+            encoded['width'] = width
+        if encoded:
+            result[side] = encoded
     return result
 
 
+def fields_of(values: Iterable[dict]) -> set[str]:
+    """Paths of CellData present in values, userEnteredFormat is split into its blocks"""
+    fields = set()
+    for value in values:
+        for key, item in value.items():
+            if key == 'userEnteredFormat':
+                fields.update(FORMAT_PATHS[name] for name in item)
+            else:
+                fields.add(key)
+    return fields
+
+
 def borders_from_google_format(dictionary: dict) -> Borders:
     borders = dictionary
     try:
@@ -87,7 +154,7 @@ def borders_from_google_format(dictionary: dict) -> Borders:
         )
     except (KeyError, TypeError):
         right = None
-    return Borders(top=top, bottom=bottom, left=left, right=right)
+    return intern_borders(Borders(top=top, bottom=bottom, left=left, right=right))
 
 
 # def calc_ords(chars: str):
@@ -96,67 +163,85 @@ def borders_from_google_format(dictionary: dict) -> Borders:
 
 
 def from_google_format_to_cell(response: dict, from_: str) -> Iterator[Cell]:
-    """Inspect given data and return list of Cells
-    TODO Not the whole data yet"""
-    col, row = Cell.find_indexes(from_)
-
-    data = inspector(response, ['data'])
-    for idx in range(len(data['data'])):
-        i = 0
-        try:
-            rowData = data['data'][idx]['rowData']
-        except KeyError:
-            i += 1
-            continue
-        for rowData in rowData:
-            j = 0
-            try:
-                values = rowData['values']
-            except KeyError:
-                i += 1
-                continue
-
-            for val in values:
-                name = Cell.from_indexes_to_name(col + j, row + i)
-
-                try:
-                    value = get_value(inspector(val, ['userEnteredValue'])['userEnteredValue'])
-                except KeyError:
-                    value = str()
-
-                keys = [
-                    'note', 'textFormat', 'formattedValue', 'backgroundColor', 'foregroundColor',
-                    'fontFamily', 'bold', 'italic', 'underline', 'strikethrough', 'fontSize', 'borders'
-                ]
-                val_data = inspector(val, keys.copy())
-
-                borders = Borders()
-                if all_borders := key_error_handle(val_data, 'borders'):
-                    borders = borders_from_google_format(all_borders)
-
-                value = value if value else None
-                note = key_error_handle(val_data, 'note') if key_error_handle(val_data, 'note') else None
-
-                cell = Cell(
-                    name, value, note,
-                    bg_color=key_error_handle(val_data, 'backgroundColor'),
-                    fr_color=key_error_handle(val_data, 'foregroundColor'),
-                    font_family=key_error_handle(val_data, 'fontFamily') if key_error_handle(val_data,
-                                                                                             'fontFamily') else 'Arial',
-                    font_size=key_error_handle(val_data, 'fontSize') if key_error_handle(val_data, 'fontSize') else 10,
-                    bold=key_error_handle(val_data, 'bold') if key_error_handle(val_data, 'bold') else False,
-                    italic=key_error_handle(val_data, 'italic') if key_error_handle(val_data, 'italic') else False,
-                    strikethrough=key_error_handle(val_data, 'strikethrough') if key_error_handle(val_data,
-                                                                                                  'strikethrough') else False,
-                    underline=key_error_handle(val_data, 'underline') if key_error_handle(val_data,
-                                                                                          'underline') else False,
-                    borders=borders if borders else None,
-                    formatted_value=key_error_handle(val_data, 'formattedValue') if key_error_handle(val_data,
-                                                                                                     'formattedValue') else None
-                )
-                yield cell
-                j += 1
-            i += 1
+    """Walk sheets[].data[].rowData[].values[] once and yield a Cell per value
+    Offsets are taken from startRow/startColumn of every grid, from_ is used when the response omits them"""
+    col, row = a1.to_indexes(from_)
+    for sheet in response.get('sheets', ()):
+        for grid in sheet.get('data', ()):
+            start_row = grid.get('startRow', row)
+            start_col = grid.get('startColumn', col)
+            for i, row_data in enumerate(grid.get('rowData', ())):
+                for j, val in enumerate(row_data.get('values', ())):
+                    yield cell_from_google_format(val, start_col + j, start_row + i)
+
+
+_EMPTY = {}
+
+
+def cell_from_google_format(val: dict, col_idx: int, row_idx: int) -> Cell:
+    """Build Cell from one CellData
+    Format attributes are taken from userEnteredFormat and fall back to effectiveFormat"""
+    user_format = val.get('userEnteredFormat', _EMPTY)
+    effective_format = val.get('effectiveFormat', _EMPTY)
+    user_text = user_format.get('textFormat', _EMPTY)
+    effective_text = effective_format.get('textFormat', _EMPTY)
+
+    def text_attr(key):
+        return user_text[key] if key in user_text else effective_text.get(key)
+
+    def format_attr(key):
+        return user_format[key] if key in user_format else effective_format.get(key)
+
+    value = val.get('userEnteredValue')
+    if value:
+        value = next(iter(value.values()))
+    all_borders = format_attr('borders')
+
+    return Cell(
+        None, value or None, val.get('note') or None,
+        bg_color=format_attr('backgroundColor'),
+        fr_color=text_attr('foregroundColor'),
+        font_family=text_attr('fontFamily') or 'Arial',
+        font_size=text_attr('fontSize') or 10,
+        bold=text_attr('bold') or False,
+        italic=text_attr('italic') or False,
+        strikethrough=text_attr('strikethrough') or False,
+        underline=text_attr('underline') or False,
+        borders=borders_from_google_format(all_borders) if all_borders else None,
+        formatted_value=val.get('formattedValue') or None,
+        col_idx=col_idx,
+        row_idx=row_idx,
+    )
+
+
+def from_google_format_to_grid(response: dict, from_: str) -> Grid:
+    """Collect values of the first grid of the response into Grid
+    Computed values (effectiveValue) are taken, so formulas come as their results"""
+    col, row = a1.to_indexes(from_)
+    grids = [grid for sheet in response.get('sheets', ()) for grid in sheet.get('data', ())]
+    if not grids:
+        return Grid([], col, row)
+    grid = grids[0]
+    rows = grid.get('rowData', ())
+    width = max((len(row_data.get('values', ())) for row_data in rows), default=0)
+    columns = [[None] * len(rows) for _ in range(width)]
+    for i, row_data in enumerate(rows):
+        for j, val in enumerate(row_data.get('values', ())):
+            value = val.get('effectiveValue') or val.get('userEnteredValue')
+            if value:
+                columns[j][i] = next(iter(value.values()))
+    return Grid(
+        [compact_column(column) for column in columns],
+        grid.get('startColumn', col),
+        grid.get('startRow', row),
+    )
+
+
+def compact_column(column: list) -> list | array:
+    """Store column as array('d') if it holds only numbers"""
+    if column and all(type(value) in (int, float) for value in column):
+        return array('d', column)
+    return column
 
 
 def key_error_handle(dictionary, key):
@@ -178,12 +263,13 @@ def find_range(range_: str):
 
 def sort_cells(cells: Iterable[Cell], by: str = 'both'):
     sorted_cells = []
+    to_indexes = a1.to_indexes
     if by == 'both':
-        sorted_cells.extend(sorted(cells, key=lambda x: sum(Cell.find_indexes(x.name))))
+        sorted_cells.extend(sorted(cells, key=lambda x: sum(to_indexes(x.name))))
     elif by == 'col':
-        sorted_cells.extend(sorted(cells, key=lambda x: Cell.find_indexes(x.name)[0]))
+        sorted_cells.extend(sorted(cells, key=lambda x: to_indexes(x.name)[0]))
     elif by == 'row':
-        sorted_cells.extend(sorted(cells, key=lambda x: Cell.find_indexes(x.name)[1]))
+        sorted_cells.extend(sorted(cells, key=lambda x: to_indexes(x.name)[1]))
     else:
         raise ValueError('by can be only "both", "row" or "col"')
     return sorted_cells
@@ -245,45 +331,117 @@ def additional_sort(cells: list[Cell]):
     return result
 
 
-def to_rows_format(cells: list[Cell]) -> \
-        list[Union[tuple[dict[str, list[dict[str]]], Any, Any], tuple[dict[str, list[dict[str]]], Any, Any]]]:
-    cells = sort_cells(cells, 'row')
-    cells = additional_sort(cells)
+def to_rows_format(cells: list[Cell]) -> list[tuple[dict[str, list[dict]], int, int]]:
+    """RowData of every run of neighbour cells of a row with column and row index of its first cell"""
+    return [({'values': from_cells_to_google_format(run)}, run[0].col_idx, run[0].row_idx)
+            for run in cell_runs(cells)]
 
-    col_idx, row_idx = cells[0].col_idx, cells[0].row_idx
-    result = []
-    row = []
-    row_ind = cells[0].row_idx
-    col_ind = cells[0].col_idx
-    for i in cells:
-        if i.row_idx == row_ind and abs(col_ind - i.col_idx) < 2:
-            row.append(i)
-        else:
-            row_ind = i.row_idx
-            col_ind = i.col_idx
-            values = {'values': from_cells_to_google_format(row)}
-            result.append(
-                (values, col_idx, row_idx)
-            )
-            col_idx, row_idx = i.col_idx, i.row_idx
-            row = [i]
-    else:
-        values = {'values': from_cells_to_google_format(row)}
-        result.append(
-            (values, col_idx, row_idx)
-        )
 
-    return result
+def cell_runs(cells: Iterable[Cell]) -> list[list[Cell]]:
+    """Cells sorted once by row and column and split into runs of neighbour cells of one row
+    A later cell of the same position replaces an earlier one"""
+    runs = []
+    run = []
+    last = None
+    for cell in sorted(cells, key=lambda cell: (cell.row_idx, cell.col_idx)):
+        if last is not None and cell.row_idx == last.row_idx:
+            if cell.col_idx == last.col_idx:
+                run[-1] = last = cell
+                continue
+            if cell.col_idx == last.col_idx + 1:
+                run.append(cell)
+                last = cell
+                continue
+        if run:
+            runs.append(run)
+        run = [cell]
+        last = cell
+    if run:
+        runs.append(run)
+    return runs
+
+
+def update_cells_request(rows: list[dict], sheet_id: int, row_idx: int, col_idx: int) -> dict:
+    return {
+        'updateCells': {
+            'rows': rows,
+            'fields': CELL_FIELDS,
+            'start': {
+                'sheetId': sheet_id,
+                'rowIndex': row_idx,
+                'columnIndex': col_idx,
+            },
+        }
+    }
+
+
+# JSON bytes of an updateCells request without rows, i.e. what one more request costs,
+# with room for longer ids and indexes
+REQUEST_BYTES = len(json.dumps(update_cells_request([], 0, 0, 0), separators=(',', ':'))) + 20
+# JSON bytes of an empty RowData padding a skipped row of a block
+PAD_BYTES = len('{},')
+
+
+def plan_blocks(cells: Iterable[Cell], max_cells: Optional[int] = None, max_bytes: Optional[int] = None) \
+        -> list[tuple[list[dict], int, int, int, int]]:
+    """
+    Group cells into blocks, each block is written by one updateCells request
+
+    Runs of neighbour cells starting at the same column of following rows are stacked into one block.
+    Rows between them are padded with empty RowData, which updateCells leaves untouched, when padding costs
+    fewer bytes than starting another request. A gap inside a row can not be padded: any CellData put there
+    would clear the cell under the fields mask, so such runs go to separate blocks.
+    max_cells, max_bytes: limits of one block, so that chunk_items can still fit blocks into chunks
+
+    Return list of (rows, row_idx, col_idx, cells, bytes) sorted by position,
+    bytes are the estimated JSON size of the request when max_bytes is given
+    """
+    runs = (({'values': from_cells_to_google_format(run)}, run[0].row_idx, run[0].col_idx, len(run))
+            for run in cell_runs(cells))
+    return stack_rows(runs, max_cells, max_bytes)
+
+
+def stack_rows(runs: Iterable[tuple[dict, int, int, int]], max_cells: Optional[int] = None,
+               max_bytes: Optional[int] = None) -> list[tuple[list[dict], int, int, int, int]]:
+    """Blocks of plan_blocks from runs already encoded as (RowData, row_idx, col_idx, cells),
+    given in order of position"""
+    blocks = []
+    # column of the first cell -> [rows, row_idx, col_idx, cells, bytes, last row_idx]
+    open_blocks: dict[int, list] = {}
+    budget = max_bytes - REQUEST_BYTES if max_bytes is not None else None
+    for row, row_idx, col_idx, count in runs:
+        size = len(json.dumps(row, separators=(',', ':'))) + 1 if max_bytes is not None else 0
+        block = open_blocks.get(col_idx)
+        if block is not None:
+            gap = row_idx - block[5] - 1
+            padding = gap * PAD_BYTES
+            if padding >= REQUEST_BYTES \
+                    or max_cells is not None and block[3] + count > max_cells \
+                    or budget is not None and block[4] + padding + size > budget:
+                blocks.append(block)
+                block = None
+            else:
+                block[0].extend({} for _ in range(gap))
+                block[0].append(row)
+                block[3] += count
+                block[4] += padding + size
+                block[5] = row_idx
+        if block is None:
+            open_blocks[col_idx] = [[row], row_idx, col_idx, count, size, row_idx]
+    blocks.extend(open_blocks.values())
+    blocks.sort(key=lambda block: (block[1], block[2]))
+    return [(rows, row_idx, col_idx, count, size + REQUEST_BYTES)
+            for rows, row_idx, col_idx, count, size, _ in blocks]
 
 
 # TODO добавить dataclass Sheet
+def sheet_from_properties(properties: dict) -> Sheet:
+    grid = properties.get('gridProperties', {})
+    return Sheet(properties.get('sheetId', 0), properties['title'], grid.get('rowCount'), grid.get('columnCount'))
+
+
 def parse_sheets(response: dict) -> list[Sheet]:
-    sheets = []
-    for sheet in response['sheets']:
-        title = sheet['properties']['title']
-        sheet_id = sheet['properties']['sheetId']
-        sheets.append(Sheet(sheet_id, title))
-    return sheets
+    return [sheet_from_properties(sheet['properties']) for sheet in response['sheets']]
 
 
 def find_sheet(sheets: list[Sheet], id: int = None, title: str = None) -> Sheet:
@@ -295,3 +453,158 @@ def find_sheet(sheets: list[Sheet], id: int = None, title: str = None) -> Sheet:
             return sheet
     else:
         raise Exception('Sheet not found')
+
+
+def has_row_data(response: dict) -> bool:
+    """True if any grid of the response holds at least one row"""
+    return any(grid.get('rowData') for sheet in response.get('sheets', ()) for grid in sheet.get('data', ()))
+
+
+def rows_of(cells: Iterable[Cell]) -> Iterator[list[Cell]]:
+    """Group cells ordered by rows into lists of cells of one row"""
+    row = []
+    row_idx = None
+    for cell in cells:
+        if cell.row_idx != row_idx and row:
+            yield row
+            row = []
+        row_idx = cell.row_idx
+        row.append(cell)
+    if row:
+        yield row
+
+
+def grid_range(from_cell: Cell, to_cell: Cell, sheet_id: int) -> dict:
+    return {
+        'sheetId': sheet_id,
+        'startRowIndex': from_cell.row_idx,
+        'endRowIndex': to_cell.row_idx + 1,
+        'startColumnIndex': from_cell.col_idx,
+        'endColumnIndex': to_cell.col_idx + 1
+    }
+
+
+def add_sheet_request(title: str) -> dict:
+    return {
+        'addSheet': {
+            'properties': {
+                'title': title
+            }
+        }
+    }
+
+
+def unmerge_cells_request(from_cell: Cell, to_cell: Cell, sheet_id: int) -> dict:
+    return {
+        'unmergeCells': {
+            'range': grid_range(from_cell, to_cell, sheet_id)
+        }
+    }
+
+
+def merge_cells_request(from_cell: Cell, to_cell: Cell, sheet_id: int) -> dict:
+    return {
+        'mergeCells': {
+            'range': grid_range(from_cell, to_cell, sheet_id),
+            'mergeType': 'MERGE_ALL'
+        }
+    }
+
+
+def insert_range_request(from_cell: Cell, to_cell: Cell, shift_dimension: Literal['ROWS', 'COLUMNS'],
+                         sheet_id: int) -> dict:
+    return {
+        'insertRange': {
+            'range': grid_range(from_cell, to_cell, sheet_id),
+            'shiftDimension': shift_dimension
+        }
+    }
+
+
+def append_dimension_request(dimension: Literal['ROWS', 'COLUMNS', 'DIMENSION_UNSPECIFIED'], sheet_id: int,
+                             length: int) -> dict:
+    return {
+        'appendDimension': {
+            'sheetId': sheet_id,
+            'dimension': dimension,
+            'length': length,
+        }
+    }
+
+
+def append_row(cells: Iterable[Cell]) -> tuple[dict, int]:
+    """RowData of append and its number of cells"""
+    values = from_cells_to_google_format(cells)
+    return {'values': values}, len(values)
+
+
+def append_cells_request(rows: list[dict], sheet_id: int, fields: Optional[set[str]] = None) -> dict:
+    """fields: paths present in rows if already known"""
+    if fields is None:
+        # appended rows are new, so only paths present in them need to be written
+        fields = fields_of(value for row in rows for value in row['values'])
+    return {
+        'appendCells': {
+            'sheetId': sheet_id,
+            'rows': rows,
+            'fields': ','.join(sorted(fields)) if fields else CELL_FIELDS,
+        }
+    }
+
+
+def append_chunks(cells: Iterable[Iterable[Cell]], sheet_id: int, chunk_size: Optional[int] = None,
+                  chunk_bytes: Optional[int] = None) -> list[tuple[list[dict], int]]:
+    """appendCells requests of append split by chunk_items, one request per chunk"""
+    rows = []
+    counts = []
+    for row in cells:
+        data, count = append_row(row)
+        rows.append(data)
+        counts.append(count)
+    return [([append_cells_request(chunk, sheet_id)], count)
+            for chunk, count in chunk_items(rows, counts, chunk_size, chunk_bytes)]
+
+
+def update_cells_chunks(cells: Iterable[Cell], sheet_id: int, chunk_size: Optional[int] = None,
+                        chunk_bytes: Optional[int] = None) -> list[tuple[list[dict], int]]:
+    """updateCells requests of update_cells, one per block of plan_blocks, split by chunk_items"""
+    return block_chunks(plan_blocks(cells, chunk_size, chunk_bytes), sheet_id, chunk_size, chunk_bytes)
+
+
+def block_chunks(blocks: list[tuple[list[dict], int, int, int, int]], sheet_id: int, chunk_size: Optional[int] = None,
+                 chunk_bytes: Optional[int] = None) -> list[tuple[list[dict], int]]:
+    """updateCells request per block of plan_blocks or stack_rows, split by chunk_items"""
+    requests = []
+    counts = []
+    sizes = []
+    for rows, row_idx, col_idx, count, size in blocks:
+        requests.append(update_cells_request(rows, sheet_id, row_idx, col_idx))
+        counts.append(count)
+        sizes.append(size)
+    return chunk_items(requests, counts, chunk_size, chunk_bytes, sizes if chunk_bytes is not None else None)
+
+
+def values_range(sheet_name: str, from_: Optional[str | Cell] = None, to: Optional[str | Cell] = None) \
+        -> tuple[str, str]:
+    """Range of get_values and its top left cell, missing from_ is A1 and missing to is ZZZ"""
+    if not from_:
+        from_ = 'A1'
+
+    if not to:
+        to = 'ZZZ'
+    if isinstance(from_, Cell):
+        from_ = from_.name
+    if isinstance(to, Cell):
+        to = to.name
+    return '{0}!{1}:{2}'.format(sheet_name, from_, to), from_
+
+
+def grid_fields(as_: str, values_only: bool, fields: Optional[str]) -> Optional[str]:
+    """fields mask of spreadsheets.get for get_values"""
+    if as_ not in ('cells', 'grid', 'view'):
+        raise ValueError('as_ can be only "cells", "grid" or "view"')
+    if fields is None and as_ == 'grid':
+        return GRID_FIELDS
+    if fields is None and values_only:
+        return VALUES_ONLY_FIELDS
+    return fields
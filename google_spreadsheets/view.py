@@ -0,0 +1,170 @@
+from typing import Any, Iterator, Optional
+
+from . import a1
+from .Dataclasses import Cell
+from .utils import cell_from_google_format
+
+
+class CellView:
+    """
+    Lazy view over the first grid of a spreadsheets.get response with grid data, nothing is converted upfront
+
+    view = sheets.get_values('Sheet1', as_='view')
+    view['B3'].bold, view.value(2, 1), view['A1:C10'].rows()
+
+    Positions are inside the view like in Grid, A1 names and ranges are of the sheet.
+    A Cell is built on the first access to its position and kept, value() takes the value straight from
+    the response without building one. Slices, by positions or by A1 range, are views over the same
+    response sharing the built Cells. Positions without data in the response give None
+    """
+
+    def __init__(self, rows: list, row_idx: int = 0, col_idx: int = 0, top: int = 0, left: int = 0,
+                 height: Optional[int] = None, width: Optional[int] = None, cells: Optional[dict] = None):
+        """rows: the values list of every rowData of the grid, row_idx, col_idx: sheet indexes of rows[0][0]
+        top, left, height, width: the part of rows the view covers"""
+        self._rows = rows
+        self._row_idx = row_idx
+        self._col_idx = col_idx
+        self._top = top
+        self._left = left
+        self.height = len(rows) - top if height is None else height
+        self.width = max((len(values) for values in rows), default=0) - left if width is None else width
+        self._cells = cells if cells is not None else {}
+
+    @classmethod
+    def from_response(cls, response: dict, from_: str) -> 'CellView':
+        """View of the first grid of the response, from_ is its origin if the response omits it"""
+        col, row = a1.to_indexes(from_)
+        grids = [grid for sheet in response.get('sheets', ()) for grid in sheet.get('data', ())]
+        if not grids:
+            return cls([], row, col)
+        grid = grids[0]
+        # row offset index: one list reference per row, the values of cells stay in the response
+        rows = [row_data.get('values', ()) for row_data in grid.get('rowData', ())]
+        return cls(rows, grid.get('startRow', row), grid.get('startColumn', col))
+
+    @property
+    def row_idx(self) -> int:
+        """Sheet index of the top row of the view"""
+        return self._row_idx + self._top
+
+    @property
+    def col_idx(self) -> int:
+        return self._col_idx + self._left
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.height, self.width
+
+    def __repr__(self):
+        return f'CellView(origin={self.name(0, 0)!r}, rows={self.height}, cols={self.width})'
+
+    def __len__(self):
+        return self.height
+
+    def name(self, row: int, col: int) -> str:
+        """A1 name of the position inside the view"""
+        return a1.to_name(self.col_idx + col, self.row_idx + row)
+
+    def _position(self, key: str | tuple[int, int]) -> tuple[int, int]:
+        if isinstance(key, str):
+            col, row = a1.to_indexes(key.upper())
+            if col is None or row is None:
+                raise KeyError(f'{key!r} is not a name of a cell')
+            row -= self.row_idx
+            col -= self.col_idx
+        else:
+            row, col = key
+            if row < 0:
+                row += self.height
+            if col < 0:
+                col += self.width
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            raise IndexError(f'{key!r} is outside of {self!r}')
+        return row, col
+
+    def _data(self, row: int, col: int) -> Optional[dict]:
+        values = self._rows[self._top + row]
+        col += self._left
+        return values[col] if col < len(values) else None
+
+    def cell(self, row: int, col: int) -> Optional[Cell]:
+        """Cell at the position inside the view, built on the first access"""
+        return self._cell(*self._position((row, col)))
+
+    def _cell(self, row: int, col: int) -> Optional[Cell]:
+        key = (self._top + row, self._left + col)
+        cell = self._cells.get(key)
+        if cell is None:
+            data = self._data(row, col)
+            if data is None:
+                return None
+            cell = self._cells[key] = cell_from_google_format(
+                data, self._col_idx + key[1], self._row_idx + key[0])
+        return cell
+
+    def value(self, row: int | str, col: Optional[int] = None) -> Any:
+        """Value of the cell by position or A1 name as Cell.value would hold it, without building the Cell"""
+        row, col = self._position(row if col is None else (row, col))
+        data = self._data(row, col)
+        value = data.get('userEnteredValue') if data else None
+        return (next(iter(value.values())) or None) if value else None
+
+    def __getitem__(self, key: str | tuple) -> 'Optional[Cell] | CellView':
+        """view['B3'] or view[row, col]: Cell or None, view['B2:D5'], view[1:4, 1:3] or view[row]: sub-view"""
+        if isinstance(key, str) and ':' in key:
+            col, row, end_col, end_row = a1.range_to_indexes(key)
+            # whole rows or columns like 'A:C' or '2:5' reach the edges of the view
+            top = row - self.row_idx if row is not None else 0
+            bottom = end_row + 1 - self.row_idx if end_row is not None else self.height
+            left = col - self.col_idx if col is not None else 0
+            right = end_col + 1 - self.col_idx if end_col is not None else self.width
+            return self._view(top, bottom, left, right)
+        if isinstance(key, tuple) and any(isinstance(item, slice) for item in key):
+            rows, cols = key
+            rows = rows if isinstance(rows, slice) else slice(rows, rows + 1 if rows != -1 else None)
+            cols = cols if isinstance(cols, slice) else slice(cols, cols + 1 if cols != -1 else None)
+            return self._slice(rows, cols)
+        if isinstance(key, int):
+            key = slice(key, key + 1 if key != -1 else None)
+        if isinstance(key, slice):
+            return self._slice(key, slice(None))
+        return self._cell(*self._position(key))
+
+    def _slice(self, rows: slice, cols: slice) -> 'CellView':
+        if rows.step not in (None, 1) or cols.step not in (None, 1):
+            raise ValueError('CellView slices can not have a step')
+        top, bottom, _ = rows.indices(self.height)
+        left, right, _ = cols.indices(self.width)
+        return self._view(top, bottom, left, right)
+
+    def _view(self, top: int, bottom: int, left: int, right: int) -> 'CellView':
+        top = max(0, top)
+        left = max(0, left)
+        bottom = min(self.height, bottom)
+        right = min(self.width, right)
+        return CellView(self._rows, self._row_idx, self._col_idx, self._top + top, self._left + left,
+                        max(0, bottom - top), max(0, right - left), self._cells)
+
+    def __iter__(self) -> Iterator[Cell]:
+        """Cells with data row by row, as get_values yields them"""
+        for row in range(self.height):
+            width = min(self.width, len(self._rows[self._top + row]) - self._left)
+            for col in range(width):
+                yield self._cell(row, col)
+
+    def row(self, idx: int) -> list:
+        """Values of the row inside the view, None where there are none"""
+        row = idx if idx >= 0 else self.height + idx
+        if not 0 <= row < self.height:
+            raise IndexError(f'row {idx} is outside of {self!r}')
+        values = self._rows[self._top + row]
+        result = [None] * self.width
+        for col in range(min(self.width, len(values) - self._left)):
+            value = values[self._left + col].get('userEnteredValue')
+            if value:
+                result[col] = next(iter(value.values())) or None
+        return result
+
+    def rows(self) -> Iterator[list]:
+        return (self.row(idx) for idx in range(self.height))
@@ -10,5 +10,11 @@ setup(
         'google-api-python-client==2.104.0',
         'httplib2==0.22.0',
         'pyasn1',
-    ]
+    ],
+    extras_require={
+        'numpy': ['numpy'],
+        'pandas': ['pandas'],
+        'async': ['aiohttp'],
+        'orjson': ['orjson'],
+    },
 )
@@ -0,0 +1,18 @@
+import pytest
+
+from google_spreadsheets.emulator import SheetsEmulator
+
+
+@pytest.fixture
+def emulator() -> SheetsEmulator:
+    return SheetsEmulator()
+
+
+@pytest.fixture
+def spreadsheet_id(emulator) -> str:
+    return emulator.create('Test', sheets=('Sheet1', 'Sheet2'), rows=100, columns=10)
+
+
+@pytest.fixture
+def sheets(emulator, spreadsheet_id):
+    return emulator.client(spreadsheet_id)
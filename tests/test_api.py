@@ -0,0 +1,201 @@
+import json
+
+import pytest
+
+from google_spreadsheets.Dataclasses import Cell
+from google_spreadsheets.batch import ChunkedResponse, PendingResponse
+from google_spreadsheets.cache import ReadCache
+
+
+def values(sheets, sheet_name='Sheet1', **kwargs) -> dict[str, object]:
+    return {cell.name: cell.value for cell in sheets.get_values(sheet_name, values_only=True, **kwargs)
+            if cell.value is not None}
+
+
+def test_update_cells_round_trip(sheets):
+    sheets.update_cells([
+        Cell('A1', 'name', note='header', bold=True, bg_color='#ff0000'),
+        Cell('B1', 1.5),
+        Cell('A2', True),
+        Cell('B2', '=B1*2'),
+    ])
+    cells = {cell.name: cell for cell in sheets.get_values('Sheet1')}
+    assert cells['A1'].value == 'name'
+    assert cells['A1'].note == 'header'
+    assert cells['A1'].bold is True
+    assert cells['A1'].bg_color == {'red': 1.0, 'green': 0.0, 'blue': 0.0}
+    assert cells['B1'].value == 1.5
+    assert cells['A2'].value is True
+    assert cells['B2'].value == '=B1*2'
+    assert cells['B1'].bold is False
+
+
+def test_get_values_as_grid_and_view(sheets):
+    sheets.update_cells([Cell(col_idx=col, row_idx=row, value=row * 10 + col) for row in range(3) for col in range(2)])
+    grid = sheets.get_values('Sheet1', from_='A1', to='B3', as_='grid')
+    assert grid.shape == (3, 2)
+    assert list(grid.columns[1]) == [1, 11, 21]
+    view = sheets.get_values('Sheet1', from_='A1', to='B3', as_='view')
+    assert view.value(2, 0) == 20
+    assert view['B2'].value == 11
+
+
+def test_chunked_update_cells_writes_every_chunk(sheets, emulator):
+    cells = [Cell(col_idx=col, row_idx=row, value=f'{row}:{col}') for row in range(50) for col in range(4)]
+    emulator.reset_stats()
+    # chunks hold whole rows of 4 cells, 10 of them
+    response = sheets.update_cells(cells, chunk_size=40)
+    assert emulator.routes['spreadsheets.batchUpdate'] == 5
+    assert len(response['replies']) == 5
+    assert values(sheets) == {cell.name: cell.value for cell in cells}
+
+
+def test_append_adds_rows_after_data(sheets):
+    sheets.update_cells([Cell('A1', 'first')])
+    sheets.append([[Cell(value='second'), Cell(value=2)], [Cell(value='third')]])
+    assert values(sheets) == {'A1': 'first', 'A2': 'second', 'B2': 2, 'A3': 'third'}
+
+
+def test_batch_coalesces_calls(sheets, emulator):
+    emulator.reset_stats()
+    with sheets.batch() as batch:
+        added = sheets.add_sheet('Added')
+        merged = sheets.merge_cells(Cell('A1'), Cell('B2'), 0)
+        assert isinstance(added, PendingResponse) and not added.done
+    assert emulator.routes['spreadsheets.batchUpdate'] == 1
+    assert batch.responses == [added.result(), merged.result()]
+    assert added.result()['replies'][0]['addSheet']['properties']['title'] == 'Added'
+    assert sheets.metadata.find(title='Added').id == added.result()['replies'][0]['addSheet']['properties']['sheetId']
+
+
+def test_batch_keeps_groups_within_max_bytes(sheets):
+    cells = [Cell(col_idx=col, row_idx=row, value='x' * 20) for row in range(100) for col in range(5)]
+    sizes = []
+    send = sheets._send_batch_update
+
+    def spy(requests, http=None):
+        sizes.append(len(json.dumps(requests, separators=(',', ':'))))
+        return send(requests, http)
+
+    sheets._send_batch_update = spy
+    with sheets.batch(max_bytes=10_000) as batch:
+        sheets.merge_cells(Cell('H1'), Cell('I2'), 0)
+        response = sheets.update_cells(cells, chunk_bytes=8_000)
+    assert isinstance(response, ChunkedResponse)
+    assert len(sizes) > 1 and max(sizes) <= 10_000
+    assert len(batch.responses) == 2
+    assert len(response.result()['replies']) == len(response.parts)
+    assert len(values(sheets)) == len(cells)
+
+
+def test_batch_keeps_responses_of_sent_groups(sheets, emulator):
+    send = sheets._send_batch_update
+
+    def send_failing_second(requests, http=None):
+        if requests[0]['addSheet']['properties']['title'] == 'Second':
+            emulator.inject(400)
+        return send(requests, http)
+
+    sheets._send_batch_update = send_failing_second
+    batch = sheets.batch(max_requests=1)
+    with pytest.raises(Exception):
+        with batch:
+            first = sheets.add_sheet('First')
+            second = sheets.add_sheet('Second')
+    assert batch.responses == [first.result()]
+    assert not second.done and len(batch) == 1
+    assert [sheet.title for sheet in sheets.get_all_sheets()] == ['Sheet1', 'Sheet2', 'First']
+
+
+def test_mirror_commits_only_changes(sheets, emulator):
+    sheets.update_cells([Cell(col_idx=col, row_idx=row, value=row + 1) for row in range(5) for col in range(3)])
+    mirror = sheets.mirror('Sheet1')
+    mirror['B2'].value = 'changed'
+    mirror['C3'].bold = True
+    assert mirror.changes() == {'B2': ('value',), 'C3': ('bold',)}
+    emulator.reset_stats()
+    mirror.commit()
+    assert emulator.routes['spreadsheets.batchUpdate'] == 1
+    assert mirror.changes() == {}
+    cells = {cell.name: cell for cell in sheets.get_values('Sheet1')}
+    assert cells['B2'].value == 'changed'
+    assert cells['C3'].bold is True and cells['C3'].value == 3
+    assert cells['A1'].value == 1
+
+
+def test_mirror_commit_is_chunked(sheets, emulator):
+    mirror = sheets.mirror('Sheet1', from_='A1', to='D50')
+    for row in range(50):
+        for col in range(4):
+            mirror[row, col].value = f'value {row}:{col}'
+    emulator.reset_stats()
+    mirror.commit(chunk_bytes=2_000)
+    assert emulator.routes['spreadsheets.batchUpdate'] > 1
+    assert len(values(sheets)) == 200
+
+
+def test_mirror_keeps_changes_when_flush_fails(sheets, emulator):
+    sheets.update_cells([Cell('A1', 'old'), Cell('A2', 'old')])
+    mirror = sheets.mirror('Sheet1', from_='A1', to='B2')
+    mirror['A1'].value = 'new'
+    with pytest.raises(Exception):
+        with sheets.batch():
+            mirror.commit()
+            emulator.inject(500, route='spreadsheets.batchUpdate')
+    assert mirror.changes() == {'A1': ('value',)}
+    with sheets.batch():
+        mirror.commit()
+        mirror['A2'].value = 'later'
+    assert mirror.changes() == {'A2': ('value',)}
+    assert values(sheets) == {'A1': 'new', 'A2': 'old'}
+
+
+def test_iter_rows_reads_every_window(sheets, emulator):
+    sheets.update_cells([Cell(col_idx=col, row_idx=row, value=row + 1) for row in range(23) for col in range(2)])
+    emulator.reset_stats()
+    rows = list(sheets.iter_rows('Sheet1', window=5))
+    assert [[cell.value for cell in row] for row in rows] == [[row + 1, row + 1] for row in range(23)]
+    # five windows with data and the empty one which ends the iteration
+    assert emulator.routes['spreadsheets.get'] == 1 + 6
+
+
+def test_iter_rows_sees_rows_added_by_other_writers(sheets, emulator, spreadsheet_id):
+    sheets.update_cells([Cell(col_idx=0, row_idx=row, value=row + 1) for row in range(100)])
+    assert len(list(sheets.iter_rows('Sheet1', window=40, prefetch=False))) == 100
+    other = emulator.client(spreadsheet_id)
+    other.append_dimension('ROWS', 0, 20)
+    other.update_cells([Cell(col_idx=0, row_idx=row, value=row + 1) for row in range(100, 120)])
+    assert len(list(sheets.iter_rows('Sheet1', window=40))) == 120
+
+
+def test_cache_serves_unchanged_spreadsheet(emulator, spreadsheet_id):
+    cache = ReadCache()
+    sheets = emulator.client(spreadsheet_id, cache=cache)
+    sheets.update_cells([Cell('A1', 'cached')])
+    assert values(sheets) == {'A1': 'cached'}
+    emulator.reset_stats()
+    assert values(sheets) == {'A1': 'cached'}
+    assert emulator.routes['spreadsheets.get'] == 0
+    assert cache.stats().hits == 1
+
+
+def test_cache_reads_again_after_other_writer(emulator, spreadsheet_id):
+    cache = ReadCache()
+    sheets = emulator.client(spreadsheet_id, cache=cache)
+    sheets.update_cells([Cell('A1', 'old')])
+    assert values(sheets) == {'A1': 'old'}
+    emulator.client(spreadsheet_id).update_cells([Cell('A1', 'new')])
+    assert values(sheets) == {'A1': 'new'}
+    assert cache.stats().stale == 1
+
+
+def test_frame_round_trip(sheets):
+    pd = pytest.importorskip('pandas')
+    frame = pd.DataFrame({'name': ['a', 'b', None], 'count': [1.0, 2.5, None], 'flag': [True, False, True]})
+    response = sheets.write_frame(frame, 'Sheet2', chunk_cells=4)
+    assert response['totalUpdatedCells'] == 12
+    read = sheets.read_frame('Sheet2')
+    assert list(read.columns) == ['name', 'count', 'flag']
+    assert read['name'].tolist()[:2] == ['a', 'b']
+    assert read['count'].tolist()[:2] == [1.0, 2.5]
+    assert read['flag'].tolist() == [True, False, True]
@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from google_spreadsheets.Dataclasses import Cell
+
+
+def test_append_buffer_appends_rows_of_every_producer(sheets, emulator):
+    producers, rows = 4, 50
+
+    def produce(producer: int):
+        for row in range(rows):
+            buffer.push([Cell(value=f'p{producer}'), Cell(value=row + 1)])
+
+    emulator.reset_stats()
+    with sheets.append_buffer(0, flush_rows=30, flush_interval=0.01) as buffer:
+        threads = [threading.Thread(target=produce, args=(producer,)) for producer in range(producers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    stats = buffer.stats()
+    assert stats.pushed == stats.sent == producers * rows
+    assert stats.failed == 0
+    assert emulator.routes['spreadsheets.batchUpdate'] == stats.flushes < producers * rows
+
+    appended = [[cell.value for cell in row] for row in sheets.iter_rows('Sheet1')]
+    assert len(appended) == producers * rows
+    for producer in range(producers):
+        # rows of one producer keep their push order
+        assert [row for name, row in appended if name == f'p{producer}'] == list(range(1, rows + 1))
+
+
+def test_append_buffer_raises_failed_flush(sheets, emulator):
+    buffer = sheets.append_buffer(0, flush_interval=0.01)
+    emulator.inject(400, route='spreadsheets.batchUpdate')
+    buffer.push([Cell(value='lost')])
+    with pytest.raises(Exception):
+        buffer.flush()
+    buffer.push([Cell(value='kept')])
+    buffer.close()
+    assert buffer.stats().failed == 1
+    assert [cell.value for cell in sheets.get_values('Sheet1', values_only=True) if cell.value] == ['kept']
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from google_spreadsheets.Dataclasses import Cell
+from google_spreadsheets.codec import JsonCodec
+from google_spreadsheets.encoder import ParallelEncoder
+from google_spreadsheets.utils import update_cells_chunks
+
+
+def make_cells(rows: int, columns: int = 5) -> list[Cell]:
+    return [
+        Cell(col_idx=col, row_idx=row, value=row * columns + col + 1 if col % 2 else f'text {row}:{col}',
+             bold=row % 3 == 0, bg_color='#00ff00' if col == 1 else None, note='note' if row == 7 else None)
+        for row in range(rows) for col in range(columns)
+    ]
+
+
+class TaggedCodec(JsonCodec):
+    name = 'tagged'
+
+    def dumps(self, obj):
+        obj = dict(obj, tag='tagged')
+        return super().dumps(obj)
+
+
+@pytest.fixture(scope='module')
+def encoder():
+    with ParallelEncoder(2, block_cells=100) as encoder:
+        yield encoder
+
+
+def test_encoded_requests_match_update_cells_chunks(encoder):
+    cells = make_cells(40)
+    chunks, total = encoder.encode(cells, 3)
+    encoded = [[json.loads(body)['requests'], count] for body, count in chunks]
+    assert total == len(cells)
+    # blocks of 100 cells are 20 whole rows, every block is planned as update_cells_chunks plans it
+    expected = update_cells_chunks(cells[:100], 3) + update_cells_chunks(cells[100:], 3)
+    assert encoded == json.loads(json.dumps(expected))
+
+
+def test_update_cells_with_encoder_writes_the_same_sheet(emulator, encoder):
+    cells = make_cells(60)
+    plain = emulator.client(emulator.create(rows=100))
+    parallel = emulator.client(emulator.create(rows=100))
+    plain.update_cells(cells, chunk_size=120)
+    response = parallel.update_cells(cells, chunk_size=120, encoder=encoder)
+    assert response['replies']
+    state = lambda sheets: [(cell.name, cell.value, cell.note, cell.bold, cell.bg_color)
+                            for cell in sheets.get_values('Sheet1')]
+    assert state(parallel) == state(plain)
+
+
+def test_encoder_uses_custom_codec():
+    with ParallelEncoder(1, codec=TaggedCodec()) as encoder:
+        chunks, _ = encoder.encode(make_cells(2))
+        assert [json.loads(body)['tag'] for body, _ in chunks] == ['tagged']
+
+
+def test_encoder_rejects_codec_not_picklable():
+    class LocalCodec(JsonCodec):
+        pass
+
+    with pytest.raises(ValueError):
+        ParallelEncoder(1, codec=LocalCodec())
@@ -0,0 +1,123 @@
+import pytest
+from googleapiclient.errors import HttpError
+
+from google_spreadsheets.Dataclasses import Cell
+from google_spreadsheets.emulator import UNLIMITED
+from google_spreadsheets.scheduler import RequestScheduler, TokenBucket
+
+
+class FakeTime:
+    """Clock and sleep of a scheduler, sleeping only moves the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_time() -> FakeTime:
+    return FakeTime()
+
+
+def scheduler(fake_time: FakeTime, **kwargs) -> RequestScheduler:
+    kwargs = {'reads_per_minute': UNLIMITED, 'writes_per_minute': UNLIMITED, **kwargs}
+    return RequestScheduler(clock=fake_time.clock, sleep=fake_time.sleep, **kwargs)
+
+
+def test_429_is_retried_with_exponential_backoff(emulator, spreadsheet_id, fake_time):
+    sheets = emulator.client(spreadsheet_id, scheduler(fake_time, base_delay=1.0))
+    emulator.inject(429, times=3)
+    assert sheets.get_all_sheets()[0].title == 'Sheet1'
+    assert sheets.scheduler.stats().retries == 3
+    assert emulator.stats['errors'] == 3
+    # base_delay * 2 ** attempt plus jitter below base_delay
+    assert [int(delay) for delay in fake_time.sleeps] == [1, 2, 4]
+
+
+def test_429_write_is_retried(emulator, spreadsheet_id, fake_time):
+    sheets = emulator.client(spreadsheet_id, scheduler(fake_time))
+    emulator.inject(429, times=2, route='spreadsheets.batchUpdate')
+    sheets.update_cells([Cell('A1', 'written')])
+    assert sheets.scheduler.stats().retries == 2
+    assert emulator.routes['spreadsheets.batchUpdate'] == 3
+    assert [cell.value for cell in sheets.get_values('Sheet1', from_='A1', to='A1')] == ['written']
+
+
+def test_retry_after_is_respected(emulator, spreadsheet_id, fake_time):
+    sheets = emulator.client(spreadsheet_id, scheduler(fake_time, base_delay=1.0))
+    emulator.inject(429, retry_after=7)
+    sheets.get_all_sheets()
+    assert fake_time.sleeps == [7.0]
+
+
+def test_retry_after_is_capped_by_max_delay(emulator, spreadsheet_id, fake_time):
+    sheets = emulator.client(spreadsheet_id, scheduler(fake_time, max_delay=10.0))
+    emulator.inject(429, retry_after=300)
+    sheets.get_all_sheets()
+    assert fake_time.sleeps == [10.0]
+
+
+def test_gives_up_after_max_retries(emulator, spreadsheet_id, fake_time):
+    sheets = emulator.client(spreadsheet_id, scheduler(fake_time, max_retries=2))
+    emulator.inject(429, times=5)
+    with pytest.raises(HttpError) as error:
+        sheets.get_all_sheets()
+    assert error.value.resp.status == 429
+    assert sheets.scheduler.stats().retries == 2
+    assert emulator.stats['requests'] == 3
+
+
+def test_5xx_read_is_retried(emulator, spreadsheet_id, fake_time):
+    sheets = emulator.client(spreadsheet_id, scheduler(fake_time))
+    emulator.inject(503)
+    sheets.get_all_sheets()
+    assert sheets.scheduler.stats().retries == 1
+
+
+def test_5xx_write_is_not_retried(emulator, spreadsheet_id, fake_time):
+    sheets = emulator.client(spreadsheet_id, scheduler(fake_time))
+    emulator.inject(503, route='spreadsheets.batchUpdate')
+    with pytest.raises(HttpError) as error:
+        sheets.append([[Cell(value='once')]])
+    assert error.value.resp.status == 503
+    assert sheets.scheduler.stats().retries == 0
+    assert emulator.routes['spreadsheets.batchUpdate'] == 1
+    assert fake_time.sleeps == []
+
+
+def test_5xx_write_is_retried_when_enabled(emulator, spreadsheet_id, fake_time):
+    sheets = emulator.client(spreadsheet_id, scheduler(fake_time, retry_writes_on_5xx=True))
+    emulator.inject(500, route='spreadsheets.batchUpdate')
+    sheets.update_cells([Cell('A1', 'written')])
+    assert sheets.scheduler.stats().retries == 1
+
+
+def test_client_errors_are_not_retried(emulator, spreadsheet_id, fake_time):
+    sheets = emulator.client(spreadsheet_id, scheduler(fake_time))
+    emulator.inject(400)
+    with pytest.raises(HttpError):
+        sheets.get_all_sheets()
+    assert sheets.scheduler.stats().retries == 0
+
+
+def test_requests_wait_for_tokens(emulator, spreadsheet_id, fake_time):
+    sheets = emulator.client(spreadsheet_id, scheduler(fake_time, reads_per_minute=20, burst=5))
+    for _ in range(20):
+        sheets.get_all_sheets()
+    # 5 requests of the burst at once, then the other 15 at 15 per minute
+    assert fake_time.now == pytest.approx(60.0)
+    assert sheets.scheduler.stats().retries == 0
+
+
+def test_bucket_of_one_request_per_minute(fake_time):
+    bucket = TokenBucket.per_minute(1, clock=fake_time.clock)
+    assert bucket.rate > 0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(60.0)